@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Type, Optional, TYPE_CHECKING
 from dcs.lua.serialize import dumps
+import dcs.lua as lua
 from dcs.translation import String, ResourceKey
 from enum import Enum, IntEnum
 import dcs.countries as countries
@@ -1624,7 +1625,7 @@ class AITaskPush(Action):
 
     @classmethod
     def create_from_dict(cls, d, mission):
-        values = list(d["ai_task"].values())
+        values = list(lua.table_values(d["ai_task"]))
         return cls(values[0], values[1])
 
     def dict(self):
@@ -1646,7 +1647,8 @@ class AITaskSet(Action):
     def create_from_dict(cls, d, mission):
         # Not sure if this used to be 0/1 in older missions, if
         # so this needs a conditional.
-        return cls(d["set_ai_task"][1], d["set_ai_task"][2])
+        values = list(lua.table_values(d["set_ai_task"]))
+        return cls(values[0], values[1])
 
     def dict(self):
         d = super(AITaskSet, self).dict()
@@ -1,6 +1,7 @@
 import sys
 from typing import Dict, Union, List, TYPE_CHECKING, Optional
 import dcs.countries as countries
+import dcs.lua as lua
 from dcs.mapping import Point
 import dcs.unitgroup as unitgroup
 import dcs.planes as planes
@@ -10,35 +11,30 @@ from dcs.unit import Vehicle, Static, Ship, FARP, SingleHeliPad, FarpSingle01
 from dcs.flyingunit import Plane, Helicopter
 from dcs.point import MovingPoint, StaticPoint
 from dcs.country import Country
+from dcs.registry import Tracked, TrackedDict
 from dcs.status_message import StatusMessage, MessageType, MessageSeverity
 from dcs.unitgroup import Group
 
 if TYPE_CHECKING:
     from . import Mission
+    from dcs.registry import Registry
 
 
 class Coalition:
+    # the registry of the mission the coalition belongs to, see dcs.registry
+    _registry: Optional["Registry"] = None
+    countries = Tracked[Dict[str, Country]](TrackedDict)
+
     def __init__(self, name, bullseye=None):
         self.name = name
-        self.countries: Dict[str, Country] = {}
+        self.countries = {}
+        self._countries_by_id: Dict[int, Country] = {}
         self.bullseye = bullseye
         self.nav_points = []  # TODO
 
-    @staticmethod
-    def _sort_keys(points):
-        keys = []
-        for imp_point_idx in points:
-            keys.append(int(imp_point_idx))
-
-        keys.sort()
-        return keys
-
     @staticmethod
     def _import_moving_point(mission, group: unitgroup.Group, imp_group) -> unitgroup.Group:
-        keys = Coalition._sort_keys(imp_group["route"]["points"])
-
-        for imp_point_idx in keys:
-            imp_point = imp_group["route"]["points"][imp_point_idx]
+        for imp_point in lua.table_values(imp_group["route"]["points"], sort=True):
             point = MovingPoint(Point(0, 0, mission.terrain))
             point.load_from_dict(imp_point, mission.translation)
             group.add_point(point)
@@ -46,10 +42,7 @@ class Coalition:
 
     @staticmethod
     def _import_static_point(mission, group: unitgroup.Group, imp_group) -> unitgroup.Group:
-        keys = Coalition._sort_keys(imp_group["route"]["points"])
-
-        for imp_point_idx in keys:
-            imp_point = imp_group["route"]["points"][imp_point_idx]
+        for imp_point in lua.table_values(imp_group["route"]["points"], sort=True):
             point = StaticPoint(Point(0, 0, mission.terrain))
             point.load_from_dict(imp_point, mission.translation)
             group.add_point(point)
@@ -86,6 +79,22 @@ class Coalition:
                     ret.append(StatusMessage(msg, MessageType.PARKING_SLOTS_FULL, MessageSeverity.ERROR))
         return ret
 
+    def _use_ids(self, mission: "Mission", group: unitgroup.Group) -> List[StatusMessage]:
+        """Marks the IDs of a loaded group and its units as used, reports the ones used before."""
+        ret: List[StatusMessage] = []
+        duplicates = []
+        if mission.group_ids.use(group.id):
+            duplicates.append("group '{g}' uses group id {i}".format(g=group.name, i=group.id))
+        for unit in group.units:
+            if mission.unit_ids.use(unit.id):
+                duplicates.append("unit '{u}' in group '{g}' uses unit id {i}".format(
+                    u=unit.name, g=group.name, i=unit.id))
+        for duplicate in duplicates:
+            msg = "{c} {d}, which is already in use".format(c=self.name.upper(), d=duplicate)
+            print("WARN:", msg, file=sys.stderr)
+            ret.append(StatusMessage(msg, MessageType.ID_DUPLICATE, MessageSeverity.WARN))
+        return ret
+
     @staticmethod
     def get_name(mission: "Mission", name: str) -> str:
         # Group, unit names are not localized for missions are created in 2.7.
@@ -94,74 +103,62 @@ class Coalition:
         else:
             return name
 
-    def load_from_dict(self, mission, d, countries_in_coalition: Dict[int, int]) -> List[StatusMessage]:
+    def load_from_dict(self, mission, d, countries_in_coalition: Union[Dict[int, int], List[int]]) -> List[StatusMessage]:
         status: List[StatusMessage] = []
-        for country_idx in d["country"]:
-            imp_country = d["country"][country_idx]
+        for imp_country in lua.table_values(d["country"]):
             _country = countries.get_by_id(imp_country["id"])
 
             if "vehicle" in imp_country:
-                for vgroup_idx in imp_country["vehicle"]["group"]:
-                    vgroup = imp_country["vehicle"]["group"][vgroup_idx]
+                for vgroup in lua.table_values(imp_country["vehicle"]["group"]):
                     vg = unitgroup.VehicleGroup(vgroup["groupId"], self.get_name(mission, vgroup["name"]),
                                                 vgroup["start_time"])
                     vg.load_from_dict(vgroup, mission.terrain)
-                    mission.current_group_id = max(mission.current_group_id, vg.id)
 
                     Coalition._import_moving_point(mission, vg, vgroup)
 
                     # units
-                    for imp_unit_idx in vgroup["units"]:
-                        imp_unit = vgroup["units"][imp_unit_idx]
+                    for imp_unit in lua.table_values(vgroup["units"]):
                         unit = Vehicle(
                             mission.terrain,
                             id=imp_unit["unitId"],
                             name=self.get_name(mission, imp_unit["name"]),
                             _type=imp_unit["type"])
                         unit.load_from_dict(imp_unit)
-
-                        mission.current_unit_id = max(mission.current_unit_id, unit.id)
                         vg.add_unit(unit)
+                    status += self._use_ids(mission, vg)
                     _country.add_vehicle_group(vg)
 
             if "ship" in imp_country:
-                for group_idx in imp_country["ship"]["group"]:
-                    imp_group = imp_country["ship"]["group"][group_idx]
+                for imp_group in lua.table_values(imp_country["ship"]["group"]):
                     ship_group = unitgroup.ShipGroup(imp_group["groupId"], self.get_name(mission, imp_group["name"]),
                                                      imp_group["start_time"])
                     ship_group.load_from_dict(imp_group, mission.terrain)
-                    mission.current_group_id = max(mission.current_group_id, ship_group.id)
 
                     Coalition._import_moving_point(mission, ship_group, imp_group)
 
                     # units
-                    for imp_unit_idx in imp_group["units"]:
-                        imp_unit = imp_group["units"][imp_unit_idx]
+                    for imp_unit in lua.table_values(imp_group["units"]):
                         ship = Ship(
                             mission.terrain,
                             id=imp_unit["unitId"],
                             name=self.get_name(mission, imp_unit["name"]),
                             _type=ships.ship_map[imp_unit["type"]])
                         ship.load_from_dict(imp_unit)
-
-                        mission.current_unit_id = max(mission.current_unit_id, ship.id)
                         ship_group.add_unit(ship)
+                    status += self._use_ids(mission, ship_group)
                     _country.add_ship_group(ship_group)
 
             if "plane" in imp_country:
-                for pgroup_idx in imp_country["plane"]["group"]:
-                    pgroup = imp_country["plane"]["group"][pgroup_idx]
+                for pgroup in lua.table_values(imp_country["plane"]["group"]):
                     plane_group = unitgroup.PlaneGroup(pgroup["groupId"],
                                                        self.get_name(mission, pgroup["name"]),
                                                        pgroup["start_time"])
                     plane_group.load_from_dict(pgroup, mission.terrain)
-                    mission.current_group_id = max(mission.current_group_id, plane_group.id)
 
                     Coalition._import_moving_point(mission, plane_group, pgroup)
 
                     # units
-                    for imp_unit_idx in pgroup["units"]:
-                        imp_unit = pgroup["units"][imp_unit_idx]
+                    for imp_unit in lua.table_values(pgroup["units"]):
                         plane = Plane(
                             mission.terrain,
                             _id=imp_unit["unitId"],
@@ -176,31 +173,27 @@ class Coalition:
                             status.append(StatusMessage(msg, MessageType.ONBOARD_NUM_DUPLICATE, MessageSeverity.WARN))
                             print("WARN:", msg, file=sys.stderr)
                         status += self._park_unit_on_airport(mission, plane_group, plane)
-
-                        mission.current_unit_id = max(mission.current_unit_id, plane.id)
                         plane_group.add_unit(plane)
 
                     # check runway start
                     # if plane_group.points[0].airdrome_id is not None and plane_group.units[0].parking is None:
                     #     airport = mission.terrain.airport_by_id(plane_group.points[0].airdrome_id)
                     #     airport.occupy_runway(plane_group)
+                    status += self._use_ids(mission, plane_group)
                     _country.add_plane_group(plane_group)
 
             if "helicopter" in imp_country:
-                for pgroup_idx in imp_country["helicopter"]["group"]:
-                    pgroup = imp_country["helicopter"]["group"][pgroup_idx]
+                for pgroup in lua.table_values(imp_country["helicopter"]["group"]):
                     helicopter_group = unitgroup.HelicopterGroup(
                         pgroup["groupId"],
                         self.get_name(mission, pgroup["name"]),
                         pgroup["start_time"])
                     helicopter_group.load_from_dict(pgroup, mission.terrain)
-                    mission.current_group_id = max(mission.current_group_id, helicopter_group.id)
 
                     Coalition._import_moving_point(mission, helicopter_group, pgroup)
 
                     # units
-                    for imp_unit_idx in pgroup["units"]:
-                        imp_unit = pgroup["units"][imp_unit_idx]
+                    for imp_unit in lua.table_values(pgroup["units"]):
                         heli = Helicopter(
                             mission.terrain,
                             _id=imp_unit["unitId"],
@@ -215,29 +208,25 @@ class Coalition:
                             status.append(StatusMessage(msg, MessageType.ONBOARD_NUM_DUPLICATE, MessageSeverity.WARN))
                             print("WARN:", msg, file=sys.stderr)
                         status += self._park_unit_on_airport(mission, helicopter_group, heli)
-
-                        mission.current_unit_id = max(mission.current_unit_id, heli.id)
                         helicopter_group.add_unit(heli)
 
                     # check runway start
                     # if helicopter_group.points[0].airdrome_id is not None and helicopter_group.units[0].parking is None:
                     #     airport = mission.terrain.airport_by_id(helicopter_group.points[0].airdrome_id)
                     #     airport.occupy_runway(helicopter_group)
+                    status += self._use_ids(mission, helicopter_group)
                     _country.add_helicopter_group(helicopter_group)
 
             if "static" in imp_country:
-                for sgroup_idx in imp_country["static"]["group"]:
-                    sgroup = imp_country["static"]["group"][sgroup_idx]
+                for sgroup in lua.table_values(imp_country["static"]["group"]):
                     static_group = unitgroup.StaticGroup(sgroup["groupId"],
                                                          self.get_name(mission, sgroup["name"]))
                     static_group.load_from_dict(sgroup, mission.terrain)
-                    mission.current_group_id = max(mission.current_group_id, static_group.id)
 
                     Coalition._import_static_point(mission, static_group, sgroup)
 
                     # units
-                    for imp_unit_idx in sgroup["units"]:
-                        imp_unit = sgroup["units"][imp_unit_idx]
+                    for imp_unit in lua.table_values(sgroup["units"]):
                         static: Static
                         if imp_unit["type"] == "FARP":
                             static = FARP(
@@ -261,15 +250,14 @@ class Coalition:
                                 _type=imp_unit["type"],
                                 terrain=mission.terrain)
                         static.load_from_dict(imp_unit)
-
-                        mission.current_unit_id = max(mission.current_unit_id, static.id)
                         static_group.add_unit(static)
+                    status += self._use_ids(mission, static_group)
                     _country.add_static_group(static_group)
             self.add_country(_country)
 
         # iterate over all .miz countries in coalition, even without any units
         # on the map, and add them to the respective coalition
-        for country_id in countries_in_coalition.values():
+        for country_id in lua.table_values(countries_in_coalition):
             if self.country_by_id(country_id) is None:
                 self.add_country(countries.get_by_id(country_id))
 
@@ -279,11 +267,22 @@ class Coalition:
         self.bullseye = bulls
 
     def add_country(self, country):
+        previous = self.countries.get(country.name)
+        if previous is not None and previous is not country:
+            self.remove_country(country.name)
         self.countries[country.name] = country
+        self._countries_by_id[country.id] = country
+        if self._registry is not None:
+            self._registry.add_country(country, self.countries)
         return country
 
     def remove_country(self, name):
-        return self.countries.pop(name)
+        country = self.countries.pop(name)
+        if self._countries_by_id.get(country.id) is country:
+            del self._countries_by_id[country.id]
+        if self._registry is not None:
+            self._registry.remove_country(country, self.countries)
+        return country
 
     def swap_country(self, coalition, name):
         return coalition.add_country(self.remove_country(name))
@@ -292,13 +291,34 @@ class Coalition:
         return self.countries.get(country_name, None)
 
     def country_by_id(self, _id: int):
+        c = self._countries_by_id.get(_id)
+        if c is not None and self.countries.get(c.name) is c:
+            return c
         for cn in self.countries:
             c = self.countries[cn]
             if c.id == _id:
                 return c
         return None
 
+    def _indexed(self, key, by_id: bool, search: str = "exact") -> Optional[List[Group]]:
+        """The groups of the countries with an ID or name, from the registry.
+
+        :return: the groups, None if the coalition is not registered
+        """
+        registry = self._registry
+        if registry is None:
+            return None
+
+        def accept(country: Country, groups) -> bool:
+            return self.countries.get(country.name) is country
+
+        found = registry.groups_by_id(key, accept) if by_id else registry.groups_by_name(key, search, accept)
+        return found if self._registry is registry else None
+
     def find_group(self, group_name, search="exact"):
+        found = self._indexed(group_name, False, search)
+        if found is not None and self._registry is not None:
+            return self._registry.first(found)
         for c in self.countries:
             g = self.countries[c].find_group(group_name, search)
             if g:
@@ -307,6 +327,9 @@ class Coalition:
         return None
 
     def find_group_by_id(self, group_id: int) -> Optional[Group]:
+        found = self._indexed(group_id, True)
+        if found is not None and self._registry is not None:
+            return self._registry.first(found)
         for c in self.countries:
             g = self.countries[c].find_group_by_id(group_id)
             if g is not None:
@@ -314,14 +337,19 @@ class Coalition:
 
         return None
 
-    def dict(self):
+    def dict(self, deferred=False):
+        """
+        :param deferred: leave the countries as they are, they and their groups
+            write their tables while the coalition is serialized
+        """
         d = {"name": self.name}
         if self.bullseye:
             d["bullseye"] = self.bullseye
         d["country"] = {}
         i = 1
         for country in sorted(self.countries.keys()):
-            d["country"][i] = self.country(country).dict()
+            c = self.country(country)
+            d["country"][i] = c if deferred else c.dict()
             i += 1
         d["nav_points"] = {}
         return d
@@ -1,5 +1,6 @@
 from typing import Dict, Type
 from dcs.lua.serialize import dumps
+import dcs.lua as lua
 from dcs.translation import String
 
 
@@ -187,7 +188,7 @@ class BombInZone(Condition):
     def __init__(self, typebomb, numbombs, zone):
         super(BombInZone, self).__init__(BombInZone.predicate)
         self.typebomb = typebomb
-        self.params.append('.'.join(str(x) for x in self.typebomb.values()))
+        self.params.append('.'.join(str(x) for x in lua.table_values(self.typebomb)))
         self.numbombs = numbombs
         self.params.append(self.numbombs)
         self.zone = zone
@@ -601,7 +602,7 @@ class MissileInZone(Condition):
     def __init__(self, typemissile, nummissiles, zone):
         super(MissileInZone, self).__init__(MissileInZone.predicate)
         self.typemissile = typemissile
-        self.params.append('.'.join(str(x) for x in self.typemissile.values()))
+        self.params.append('.'.join(str(x) for x in lua.table_values(self.typemissile)))
         self.nummissiles = nummissiles
         self.params.append(self.nummissiles)
         self.zone = zone
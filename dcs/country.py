@@ -1,12 +1,19 @@
 from __future__ import annotations
 
 import random
-from typing import List, Dict, Set, Type, Tuple, Sequence, Optional
+import re
+from typing import TYPE_CHECKING, Any, List, Dict, Set, Type, Tuple, Sequence, Optional
 
+import dcs.lua as lua
 from dcs.helicopters import HelicopterType
+from dcs.ids import FreePool
 from dcs.planes import PlaneType
+from dcs.registry import Tracked, TrackedList
 from dcs.unitgroup import VehicleGroup, ShipGroup, PlaneGroup, StaticGroup, HelicopterGroup, FlyingGroup, Group
 
+if TYPE_CHECKING:
+    from dcs.registry import Registry
+
 
 def find_exact(group_name, find_name):
     return group_name == find_name
@@ -16,9 +23,25 @@ def find_match(group_name, find_name):
     return find_name in group_name
 
 
+def find_prefix(group_name, find_name):
+    return group_name.startswith(find_name)
+
+
+def find_regex(group_name, find_name):
+    return re.search(find_name, group_name) is not None
+
+
+# the tail numbers handed out to new flying units
+ONBOARD_NUMBERS = tuple("{:03}".format(x) for x in range(10, 1000))
+CALLSIGN_NUMBERS = tuple(range(1, 10))
+# random picks of a callsign before the free ones are looked for
+_CALLSIGN_TRIES = 8
+
 find_map = {
     "exact": find_exact,
-    "match": find_match
+    "match": find_match,
+    "prefix": find_prefix,
+    "regex": find_regex
 }
 
 
@@ -26,69 +49,134 @@ class Country:
     callsign: Dict[str, List[str]] = {}
     planes: List[Type[PlaneType]] = []
     helicopters: List[Type[HelicopterType]] = []
+    # the registry of the mission the country belongs to, see dcs.registry
+    _registry: Optional[Registry] = None
+    vehicle_group = Tracked[List[VehicleGroup]](TrackedList)
+    ship_group = Tracked[List[ShipGroup]](TrackedList)
+    plane_group = Tracked[List[PlaneGroup]](TrackedList)
+    helicopter_group = Tracked[List[HelicopterGroup]](TrackedList)
+    static_group = Tracked[List[StaticGroup]](TrackedList)
+    rng: Optional[random.Random] = None
+    """Random source of tail numbers and callsigns, set a seeded :py:class:`random.Random`
+    for the same numbers on every run, the :py:mod:`random` module is used if None"""
 
     def __init__(self, _id, name, short_name):
         self.id = _id
         self.name = name
         self.shortname = short_name
-        self.vehicle_group: List[VehicleGroup] = []
-        self.ship_group: List[ShipGroup] = []
-        self.plane_group: List[PlaneGroup] = []
-        self.helicopter_group: List[HelicopterGroup] = []
-        self.static_group: List[StaticGroup] = []
+        self.vehicle_group = []
+        self.ship_group = []
+        self.plane_group = []
+        self.helicopter_group = []
+        self.static_group = []
         self.current_callsign_id = 99
         self.callsign_numbers: Dict[str, Set[int]] = {}
         self._tail_numbers: Set[str] = set()
+        # the free tail numbers and callsign numbers, built when they are first needed
+        self._onboard_pool: Optional[FreePool] = None
+        # the sorted tail numbers, to pick from when all are taken
+        self._taken_onboard_numbers: Optional[List[str]] = None
+        self._callsign_pools: Dict[str, FreePool] = {}
+
+    def group_lists(self) -> List[Sequence[Group]]:
+        """The group lists of all categories, in the order they are searched."""
+        return [self.vehicle_group,
+                self.ship_group,
+                self.plane_group,
+                self.helicopter_group,
+                self.static_group]
+
+    def _registered(self, group: Group, groups: Sequence[Group]) -> None:
+        if self._registry is not None:
+            self._registry.add_group(self, group, groups)
 
     def add_vehicle_group(self, vgroup) -> None:
         self.vehicle_group.append(vgroup)
+        self._registered(vgroup, self.vehicle_group)
 
     def add_ship_group(self, sgroup):
         self.ship_group.append(sgroup)
+        self._registered(sgroup, self.ship_group)
 
     def add_plane_group(self, pgroup):
         self.plane_group.append(pgroup)
+        self._registered(pgroup, self.plane_group)
 
     def add_helicopter_group(self, hgroup):
         self.helicopter_group.append(hgroup)
+        self._registered(hgroup, self.helicopter_group)
 
     def add_aircraft_group(self, group: FlyingGroup) -> None:
         if group.units[0].unit_type.helicopter:
             assert isinstance(group, HelicopterGroup)
             self.helicopter_group.append(group)
+            self._registered(group, self.helicopter_group)
         else:
             assert isinstance(group, PlaneGroup)
             self.plane_group.append(group)
+            self._registered(group, self.plane_group)
 
     def add_static_group(self, sgroup):
         self.static_group.append(sgroup)
+        self._registered(sgroup, self.static_group)
+
+    def remove_group(self, group: Group) -> bool:
+        """Removes a group of any category.
+
+        :return: if the group was found
+        """
+        for groups in self.group_lists():
+            for i, g in enumerate(groups):
+                if g is group:
+                    assert isinstance(groups, list)
+                    del groups[i]
+                    if self._registry is not None:
+                        self._registry.remove_group(group)
+                    return True
+        return False
 
     def remove_static_group(self, sgroup):
         for i in range(0, len(self.static_group)):
             if sgroup.id == self.static_group[i].id:
-                del self.static_group[i]
-                return True
+                return self.remove_group(self.static_group[i])
 
         return False
 
-    def find_group(self, group_name, search="exact"):
-        groups = [self.vehicle_group,
-                  self.ship_group,
-                  self.plane_group,
-                  self.helicopter_group,
-                  self.static_group]
+    def _indexed(self, key: Any, by_id: bool, groups: Sequence[Sequence[Group]],
+                 search: str = "exact") -> Optional[List[Group]]:
+        """The groups in groups with an ID or name, from the registry.
+
+        :return: the groups, None if the country is not registered
+        """
+        registry = self._registry
+        if registry is None:
+            return None
+
+        def accept(country: Country, owner: Sequence[Group]) -> bool:
+            return any(owner is x for x in groups)
+
+        found = registry.groups_by_id(key, accept) if by_id else registry.groups_by_name(key, search, accept)
+        # a rebuild can drop the country, if it was removed from its coalition directly
+        return found if self._registry is registry else None
+
+    def _find(self, name: str, search: str, groups: Sequence[Sequence[Group]]) -> Optional[Group]:
+        found = self._indexed(name, False, groups, search)
+        if found is not None and self._registry is not None:
+            return self._registry.first(found)
         for search_group in groups:
             for group in search_group:
-                if find_map[search](group.name, group_name):
+                if find_map[search](group.name, name):
                     return group
         return None
 
+    def find_group(self, group_name, search="exact"):
+        return self._find(group_name, search, self.group_lists())
+
     def find_group_by_id(self, group_id: int) -> Optional[Group]:
-        groups: List[Sequence[Group]] = [self.vehicle_group,
-                                         self.ship_group,
-                                         self.plane_group,
-                                         self.helicopter_group,
-                                         self.static_group]
+        groups = self.group_lists()
+        found = self._indexed(group_id, True, groups)
+        if found is not None and self._registry is not None:
+            return self._registry.first(found)
         for search_group in groups:
             for group in search_group:
                 if group.id == group_id:
@@ -97,32 +185,19 @@ class Country:
         return None
 
     def find_vehicle_group(self, name: str, search="exact"):
-        for group in self.vehicle_group:
-            if find_map[search](group.name, name):
-                return group
-        return None
+        return self._find(name, search, [self.vehicle_group])
 
     def find_ship_group(self, name: str, search="exact"):
-        for group in self.ship_group:
-            if find_map[search](group.name, name):
-                return group
-        return None
+        return self._find(name, search, [self.ship_group])
 
     def find_plane_group(self, name: str, search="exact"):
-        for group in self.plane_group:
-            if find_map[search](group.name, name):
-                return group
+        return self._find(name, search, [self.plane_group])
 
     def find_helicopter_group(self, name: str, search="exact"):
-        for group in self.helicopter_group:
-            if find_map[search](group.name, name):
-                return group
+        return self._find(name, search, [self.helicopter_group])
 
     def find_static_group(self, name: str, search="exact"):
-        for group in self.static_group:
-            if find_map[search](group.name, name):
-                return group
-        return None
+        return self._find(name, search, [self.static_group])
 
     def vehicle_group_within(self, point, distance) -> List[Group]:
         """Return all vehicle groups within the radius of a given point.
@@ -152,38 +227,75 @@ class Country:
         self.current_callsign_id += 1
         return self.current_callsign_id
 
-    def next_callsign_category(self, category, callnames) -> Tuple[str, int]:
-        callsigns = [
-            callsign
-            for callsign in self.callsign[category] + callnames
-            if not self.callsign_numbers.get(callsign) or len(self.callsign_numbers[callsign]) < 9
-        ]
-        if not callsigns:
-            # Everything's fully booked, start from scratch...
-            self.callsign_numbers = {}
-            return self.next_callsign_category(category, callnames)
-        callsign = random.choice(callsigns)
-        taken = self.callsign_numbers.get(callsign)
-        numbers = set(range(1, 10))
-        if taken:
-            numbers -= taken
-        else:
-            self.callsign_numbers[callsign] = set()
+    def _random(self) -> Any:
+        return self.rng if self.rng is not None else random
 
-        number = random.choice(tuple(numbers))
+    def _callsign_pool(self, callsign: str) -> FreePool:
+        taken = self.callsign_numbers.setdefault(callsign, set())
+        pool = self._callsign_pools.get(callsign)
+        if pool is None or pool.rng is not self.rng or len(pool) + len(taken) != len(CALLSIGN_NUMBERS):
+            # new, or callsign_numbers was changed directly
+            pool = self._callsign_pools[callsign] = FreePool(CALLSIGN_NUMBERS, self.rng)
+            for number in taken:
+                pool.take(number)
+        return pool
+
+    def next_callsign_category(self, category, callnames) -> Tuple[str, int]:
+        callsigns = self.callsign[category] + callnames
+        rnd = self._random()
+
+        def full(callsign) -> bool:
+            taken = self.callsign_numbers.get(callsign)
+            return taken is not None and len(taken) >= len(CALLSIGN_NUMBERS)
+
+        # a random one of the callsigns with free numbers, mostly found by the first pick
+        callsign = rnd.choice(callsigns) if callsigns else None
+        tries = 1
+        while callsign is not None and full(callsign):
+            if tries < _CALLSIGN_TRIES:
+                callsign = rnd.choice(callsigns)
+                tries += 1
+                continue
+            free = [x for x in callsigns if not full(x)]
+            if not free:
+                # Everything's fully booked, start from scratch...
+                self.callsign_numbers = {}
+                self._callsign_pools = {}
+            callsign = rnd.choice(free or callsigns)
+        if callsign is None:
+            raise IndexError("Cannot choose from an empty sequence")
+
+        number = self._callsign_pool(callsign).allocate()
         self.callsign_numbers[callsign].add(number)
         return str(callsign), number
 
+    def release_callsign(self, callsign: str, number: int) -> None:
+        """Makes a callsign number that was handed out by :py:meth:`next_callsign_category` free again."""
+        taken = self.callsign_numbers.get(callsign)
+        if taken is not None and number in taken:
+            self._callsign_pool(callsign).release(number)
+            taken.discard(number)
+
     @property
     def unused_onboard_numbers(self) -> Set[str]:
         return {"{:03}".format(x) for x in range(10, 1000)} - self._tail_numbers
 
+    def _onboard_numbers(self) -> FreePool:
+        if self._onboard_pool is None or self._onboard_pool.rng is not self.rng:
+            self._onboard_pool = FreePool(ONBOARD_NUMBERS, self.rng)
+            for number in self._tail_numbers:
+                self._onboard_pool.take(number)
+        return self._onboard_pool
+
     def reset_onboard_numbers(self):
         """
         Resets/clears reserved onboard numbers for this country.
         :return:
         """
         self._tail_numbers = set()
+        self._taken_onboard_numbers = None
+        if self._onboard_pool is not None:
+            self._onboard_pool.reset()
 
     def reserve_onboard_num(self, number: str) -> bool:
         """
@@ -192,57 +304,53 @@ class Country:
         :return: True if number is already in use, else False
         """
         is_in = number in self._tail_numbers
-        self._tail_numbers.add(number)
+        if not is_in:
+            self._tail_numbers.add(number)
+            self._taken_onboard_numbers = None
+            if self._onboard_pool is not None:
+                self._onboard_pool.take(number)
         return is_in
 
+    def release_onboard_num(self, number: str) -> None:
+        """
+        Makes a reserved onboard_num (tail number) free again.
+        :param str number: onboard num
+        """
+        if number in self._tail_numbers:
+            self._tail_numbers.discard(number)
+            self._taken_onboard_numbers = None
+            if self._onboard_pool is not None:
+                self._onboard_pool.release(number)
+
     def next_onboard_num(self) -> str:
-        free_set = self.unused_onboard_numbers
-        if free_set:
-            tailnum = free_set.pop()
-            self.reserve_onboard_num(tailnum)
+        tailnum = self._onboard_numbers().allocate()
+        if tailnum is not None:
+            self._tail_numbers.add(tailnum)
+            self._taken_onboard_numbers = None
             return tailnum
-        return random.choice(sorted(self._tail_numbers))
+        if self._taken_onboard_numbers is None:
+            self._taken_onboard_numbers = sorted(self._tail_numbers)
+        return self._random().choice(self._taken_onboard_numbers)
 
     def dict(self):
-        d = {
+        return self._table(False)
+
+    def __lua_emit__(self, writer: lua.Writer) -> None:
+        # the groups build their tables only when the serializer reaches them, one at a time
+        writer.write(self._table(True))
+
+    def _table(self, emit: bool) -> Dict[str, Any]:
+        d: Dict[str, Any] = {
             "name": self.name,
             "id": self.id
         }
 
-        if self.vehicle_group:
-            d["vehicle"] = {"group": {}}
-            i = 1
-            for vgroup in self.vehicle_group:
-                d["vehicle"]["group"][i] = vgroup.dict()
-                i += 1
-
-        if self.ship_group:
-            d["ship"] = {"group": {}}
-            i = 1
-            for group in self.ship_group:
-                d["ship"]["group"][i] = group.dict()
-                i += 1
-
-        if self.plane_group:
-            d["plane"] = {"group": {}}
-            i = 1
-            for plane_group in self.plane_group:
-                d["plane"]["group"][i] = plane_group.dict()
-                i += 1
-
-        if self.helicopter_group:
-            d["helicopter"] = {"group": {}}
-            i = 1
-            for group in self.helicopter_group:
-                d["helicopter"]["group"][i] = group.dict()
-                i += 1
-
-        if self.static_group:
-            d["static"] = {"group": {}}
-            i = 1
-            for static_group in self.static_group:
-                d["static"]["group"][i] = static_group.dict()
-                i += 1
+        categories: List[Tuple[str, Sequence[Group]]] = [
+            ("vehicle", self.vehicle_group), ("ship", self.ship_group), ("plane", self.plane_group),
+            ("helicopter", self.helicopter_group), ("static", self.static_group)]
+        for category, groups in categories:
+            if groups:
+                d[category] = {"group": {i: group if emit else group.dict() for i, group in enumerate(groups, 1)}}
         return d
 
     def __eq__(self, other: object) -> bool:
@@ -58,6 +58,14 @@ class Drawing:
         d["layerName"] = self.layer_name
         return d
 
+    def __setattr__(self, key, value):
+        if key == "name":
+            # keep the name index of the drawings up to date, see Drawings.find_drawings
+            names = self.__dict__.get("_names")
+            if names is not None:
+                names.rename(self, self.name, value)
+        super().__setattr__(key, value)
+
     def points_to_dict(self, points):
         d = {}
         i = 1
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import TYPE_CHECKING, Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, List, Pattern, Tuple, Union
 
+import dcs.lua as lua
+from dcs.drawing.drawing import Drawing
 from dcs.drawing.layer import Layer
 from dcs.drawing.options import Options
+from dcs.search import NameIndex
 
 if TYPE_CHECKING:
     from dcs.terrain import Terrain
@@ -29,12 +32,14 @@ class Drawings:
             Layer(True, StandardLayer.Common.value, [], terrain),
             Layer(True, StandardLayer.Author.value, [], terrain),
         ]
+        self._names = NameIndex()
+        # the object lists of the layers, how many of their objects are indexed and the last one
+        self._indexed: List[Tuple[Layer, List[Drawing], int, Any]] = []
 
     def load_from_dict(self, data: Dict[str, Any]) -> None:
         self.options.load_from_dict(data["options"])
         self.layers = []
-        for layer_index in sorted(data["layers"].keys()):
-            layer_data = data["layers"][layer_index]
+        for layer_data in lua.table_values(data["layers"], sort=True):
             layer = Layer(True, "", [], self._terrain)
             layer.load_from_dict(layer_data)
             self.layers.append(layer)
@@ -58,3 +63,35 @@ class Drawings:
 
     def get_layer(self, layer: StandardLayer):
         return self.get_layer_by_name(layer.value)
+
+    def _index_names(self) -> None:
+        """Indexes the objects that were added to the layers since the last search."""
+        def unchanged(layer: Layer, indexed: Tuple[Layer, List[Drawing], int, Any]) -> bool:
+            # the last indexed object must still be where it was
+            x, objects, count, last = indexed
+            return (layer is x and layer.objects is objects and len(objects) >= count
+                    and (count == 0 or objects[count - 1] is last))
+
+        if len(self._indexed) != len(self.layers) or not all(map(unchanged, self.layers, self._indexed)):
+            self._names = NameIndex()
+            self._indexed = [(x, x.objects, 0, None) for x in self.layers]
+        for i, (layer, objects, count, last) in enumerate(self._indexed):
+            for drawing in objects[count:]:
+                self._names.add(drawing.name, drawing)
+                drawing.__dict__["_names"] = self._names
+            if len(objects) > count:
+                self._indexed[i] = (layer, objects, len(objects), objects[-1])
+
+    def find_drawings(self, query: Union[str, Pattern[str]], search: str = "match") -> List[Drawing]:
+        """Searches the drawing objects of all layers by name.
+
+        Objects appended to the layers are indexed with the next search,
+        the index is rebuilt if objects were removed or layers changed.
+
+        :param query: text to search, or regular expression
+        :param search: search mode, 'exact', 'match', 'prefix' or 'regex',
+            see :py:meth:`dcs.search.NameIndex.search`
+        :return: the drawings found, in layer order
+        """
+        self._index_names()
+        return self._names.search(query, search)
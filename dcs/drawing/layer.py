@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from typing import Any, Dict, List, Union
 
+import dcs.lua as lua
 from dcs.terrain import Terrain
 from dcs.drawing.drawing import Drawing, LineStyle, Rgba
 from dcs.drawing.icon import Icon, StandardIcon
@@ -28,8 +29,7 @@ class Layer:
         self.visible = data["visible"]
         self.name = data["name"]
 
-        for object_index in sorted(data["objects"].keys()):
-            object_data = data["objects"][object_index]
+        for object_data in lua.table_values(data["objects"], sort=True):
             object = self.load_drawing_from_data(object_data)
             self.objects.append(object)
 
@@ -188,10 +188,8 @@ class Layer:
 
     def load_points_from_data(self, points_data) -> List[Point]:
         points: List[Point] = []
-        for point_index in sorted(points_data.keys()):
-            x = points_data[point_index]["x"]
-            y = points_data[point_index]["y"]
-            points.append(Point(x, y, self._terrain))
+        for point_data in lua.table_values(points_data, sort=True):
+            points.append(Point(point_data["x"], point_data["y"], self._terrain))
         return points
 
     def add_drawing(self, drawing: Drawing):
@@ -5,6 +5,7 @@ import json
 import logging
 from typing import TYPE_CHECKING, Dict, Optional, Type
 
+import dcs.lua as lua
 from dcs.helicopters import HelicopterType, Ka_50
 from dcs.planes import PlaneType, A_10C
 from dcs.terrain import ParkingSlot
@@ -58,7 +59,7 @@ class FlyingUnit(Unit):
         self.flare = d["payload"]["flare"]
         self.chaff = d["payload"]["chaff"]
         self.ammo_type = d["payload"].get("ammo_type")
-        self.pylons = d["payload"]["pylons"]
+        self.pylons = lua.table_dict(d["payload"]["pylons"])
         self.onboard_num = d["onboard_num"]
         if isinstance(d["callsign"], int):
             self.callsign = d["callsign"]
@@ -68,7 +69,8 @@ class FlyingUnit(Unit):
         self.parking_id = d.get("parking_id", None)
         if self.parking:
             self.parking = int(self.parking)
-        self.radio = d.get("Radio")
+        radio = d.get("Radio")
+        self.radio = lua.table_dict(radio) if radio is not None else None
         self.hardpoint_racks = d.get("hardpoint_racks", None)
         self.addpropaircraft = d.get("AddPropAircraft")
         return True
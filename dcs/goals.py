@@ -1,5 +1,6 @@
 from typing import List
 import dcs.condition as condition
+import dcs.lua as lua
 
 
 class Goal:
@@ -16,9 +17,8 @@ class Goal:
         self.predicate = data["predicate"]
         self.comment = data["comment"]
         self.rules = []
-        rules = data["rules"]
-        for x in rules:
-            gr = condition.condition_map[rules[x]["predicate"]].create_from_dict(rules[x], mission)
+        for rule in lua.table_values(data["rules"]):
+            gr = condition.condition_map[rule["predicate"]].create_from_dict(rule, mission)
             self.rules.append(gr)
 
     def dict(self):
@@ -40,10 +40,10 @@ class Goals:
         }
 
     def load_from_dict(self, data, mission):
-        for x in data:
+        for goal in lua.table_values(data):
             g = Goal()
-            g.load_from_dict(data[x], mission)
-            self.goals[data[x]["side"].lower()].append(g)
+            g.load_from_dict(goal, mission)
+            self.goals[goal["side"].lower()].append(g)
 
     def add_red(self, g: Goal):
         g.side = "RED"
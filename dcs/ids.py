@@ -0,0 +1,201 @@
+"""Allocation of unit, group, dictionary and trigger zone IDs, EPLRS and tail numbers."""
+import random
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+
+class IdAllocator:
+    """Hands out free IDs and keeps track of the used ones.
+
+    Used IDs are kept as sorted, disjoint ranges, so the mostly consecutive IDs
+    of a mission take a couple of ranges, however many there are. Finding the
+    next free ID looks at the range it falls in, not at the used IDs.
+
+    By default IDs are counted up from the highest one used so far, like the
+    mission always did, IDs below that are not handed out again. With lowest
+    the lowest free ID is handed out, for numbers that are taken from a small
+    pool like EPLRS.
+
+    Args:
+        first: the lowest ID
+        lowest: hand out the lowest free ID instead of the one after the highest
+    """
+    def __init__(self, first: int = 1, lowest: bool = False) -> None:
+        self.first = first
+        self.lowest = lowest
+        # the highest ID used, new IDs are counted up from it
+        self.current = first - 1
+        # start and end, exclusive, of the used ranges
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+
+    def _free_from(self, id_: int) -> int:
+        """The lowest free ID that is not below id_."""
+        i = bisect_right(self._starts, id_) - 1
+        # ranges don't touch, the end of one is free
+        return self._ends[i] if i >= 0 and id_ < self._ends[i] else id_
+
+    def _add(self, start: int, end: int) -> None:
+        if not self._starts or start > self._ends[-1]:
+            self._starts.append(start)
+            self._ends.append(end)
+            return
+        # all ranges that overlap or touch start:end are merged with it
+        lo = bisect_left(self._ends, start)
+        hi = bisect_right(self._starts, end)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def next(self) -> int:
+        """Hands out a free ID.
+
+        :return: the new ID
+        """
+        id_ = self._free_from(self.first if self.lowest else max(self.current + 1, self.first))
+        self._add(id_, id_ + 1)
+        self.current = max(self.current, id_)
+        return id_
+
+    def reserve(self, count: int) -> range:
+        """Hands out count consecutive free IDs at once.
+
+        :param count: number of IDs
+        :return: the new IDs
+        """
+        if count <= 0:
+            return range(0)
+        start = self._free_from(self.first if self.lowest else max(self.current + 1, self.first))
+        while True:
+            # the next used range must not start before the reserved IDs end
+            i = bisect_right(self._starts, start)
+            if i == len(self._starts) or self._starts[i] >= start + count:
+                break
+            start = self._ends[i]
+        self._add(start, start + count)
+        self.current = max(self.current, start + count - 1)
+        return range(start, start + count)
+
+    def use(self, id_: int) -> bool:
+        """Marks an ID as used, e.g. the ID of a loaded unit.
+
+        :param id_: the used ID
+        :return: True if it was used already
+        """
+        used = id_ in self
+        if not used:
+            self._add(id_, id_ + 1)
+        self.current = max(self.current, id_)
+        return used
+
+    def release(self, id_: int) -> bool:
+        """Marks an ID as free again, so it can be handed out again.
+
+        Without lowest only IDs above the highest one handed out are, see above.
+
+        :param id_: the ID no object uses anymore
+        :return: True if it was used
+        """
+        i = bisect_right(self._starts, id_) - 1
+        if i < 0 or id_ >= self._ends[i]:
+            return False
+        start, end = self._starts[i], self._ends[i]
+        # the range is split around the ID, empty parts are dropped
+        parts = [(a, b) for a, b in ((start, id_), (id_ + 1, end)) if a < b]
+        self._starts[i:i + 1] = [a for a, _ in parts]
+        self._ends[i:i + 1] = [b for _, b in parts]
+        return True
+
+    def clear(self) -> None:
+        self.current = self.first - 1
+        self._starts = []
+        self._ends = []
+
+    def __contains__(self, id_: object) -> bool:
+        if not isinstance(id_, int):
+            return False
+        i = bisect_right(self._starts, id_) - 1
+        return i >= 0 and id_ < self._ends[i]
+
+    def __len__(self) -> int:
+        return sum(end - start for start, end in zip(self._starts, self._ends))
+
+    def __repr__(self) -> str:
+        return "IdAllocator(current={}, {} used in {} ranges)".format(self.current, len(self), len(self._starts))
+
+
+class FreePool:
+    """A fixed set of values, handed out in random order until they are released again.
+
+    The free values are kept shuffled together with the position of each, so
+    handing out one, taking a given one and releasing one take constant time.
+
+    Args:
+        values: all values of the pool, their order and the random source
+            decide the order they are handed out in
+        rng: random source, the :py:mod:`random` module if None
+    """
+    def __init__(self, values: Iterable[Hashable], rng: Optional[random.Random] = None) -> None:
+        self.values = list(values)
+        self.rng = rng
+        self._all = set(self.values)
+        self._free: List[Any] = []
+        self._positions: Dict[Any, int] = {}
+        self.reset()
+
+    def _random(self) -> Any:
+        return self.rng if self.rng is not None else random
+
+    def reset(self) -> None:
+        """Makes all values free again, in a new order."""
+        self._free = list(self.values)
+        self._random().shuffle(self._free)
+        self._positions = {x: i for i, x in enumerate(self._free)}
+
+    def allocate(self) -> Any:
+        """Hands out a free value.
+
+        :return: the value, None if all are taken
+        """
+        if not self._free:
+            return None
+        value = self._free.pop()
+        del self._positions[value]
+        return value
+
+    def take(self, value: Hashable) -> bool:
+        """Takes a given value out of the pool, e.g. one that was loaded.
+
+        :return: True if it was free
+        """
+        i = self._positions.pop(value, None)
+        if i is None:
+            return False
+        last = self._free.pop()
+        if i < len(self._free):
+            self._free[i] = last
+            self._positions[last] = i
+        return True
+
+    def release(self, value: Hashable) -> None:
+        """Puts a taken value back at a random place, values that don't belong to the pool are ignored."""
+        if value not in self._all or value in self._positions:
+            return
+        i = self._random().randint(0, len(self._free))
+        self._free.append(value)
+        if i < len(self._free) - 1:
+            self._free[i], self._free[-1] = value, self._free[i]
+            self._positions[self._free[-1]] = len(self._free) - 1
+        self._positions[value] = i
+
+    def __contains__(self, value: object) -> bool:
+        """If value is free."""
+        return value in self._positions
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def __repr__(self) -> str:
+        return "FreePool({} of {} free)".format(len(self._free), len(self.values))
@@ -4,7 +4,9 @@ import logging
 import os.path
 import re
 from typing import Optional, Set
-from zipfile import ZipFile, BadZipFile
+from zipfile import BadZipFile
+
+from dcs.miz import MappedZipFile
 
 
 def _attempt_read_from_filestream(filestream: bytes) -> Optional[str]:
@@ -151,10 +153,9 @@ class Livery:
         """
         if not os.path.exists(path):
             return None
-        with ZipFile(path, "r") as zf:
+        with MappedZipFile(path) as zf:
             try:
-                with zf.open("description.lua", "r") as file:
-                    code = _attempt_read_from_filestream(file.read())
+                code = _attempt_read_from_filestream(zf.read("description.lua"))
             except KeyError:
                 return None
 
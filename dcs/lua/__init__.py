@@ -1,4 +1,6 @@
 # lua table serialization
 
-from dcs.lua.parse import loads
-from dcs.lua.serialize import dumps
+from dcs.lua.parse import loads, load, iterload, LazyTable, table_items, table_values, table_dict
+from dcs.lua.serialize import dumps, dump, Deferred, Raw, Writer
+from dcs.lua.cache import ParseCache
+from dcs.lua.source import SourceTables, FragmentCache, fingerprint
@@ -0,0 +1,180 @@
+import hashlib
+import marshal
+import mmap
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
+
+from dcs.lua import parse
+
+
+class ParseCache:
+    """On disk cache of parsed lua sources.
+
+    Entries are keyed by a hash of the source, the predefined variables and the
+    parser version and hold the parse result in :py:mod:`marshal` format, so loading
+    an unchanged file again skips the lua parser entirely. Once the cache directory
+    grows beyond ``max_size`` bytes the least recently used entries are removed.
+
+    Sources that rely on an ``unknown_variable_lookup`` can't be cached, the lookup
+    result is not part of the key.
+
+    Args:
+        directory: where the entries are stored, created if missing
+        max_size: size limit of all entries in bytes
+    """
+    SUFFIX = ".luac"
+
+    def __init__(self, directory: Union[str, Path], max_size: int = 64 << 20) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source: Union[bytes, memoryview, mmap.mmap], _globals: Optional[Dict[str, Any]] = None,
+            compact: bool = False) -> str:
+        h = hashlib.sha256()
+        # marshal output is only guaranteed to be readable by the same python version
+        h.update("{}:{}:{}:{}:".format(parse.VERSION, marshal.version, sys.version_info[:2], compact).encode())
+        h.update(repr(sorted(_globals.items()) if _globals else None).encode())
+        h.update(b"\0")
+        h.update(source)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            variables = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return variables
+
+    def put(self, key: str, variables: Dict[str, Any]) -> None:
+        try:
+            data = marshal.dumps(variables)
+        except ValueError:
+            # not a plain lua value, e.g. something returned by a _globals entry
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=str(self.directory))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, str(path))
+        except OSError:
+            self._remove(Path(tmp))
+            return
+        self._size = self.size() + len(data)
+        if self._size > self.max_size:
+            self.evict()
+
+    def loads(self, source: Union[str, bytes, memoryview, mmap.mmap], _globals: Optional[Dict[str, Any]] = None,
+              compact: bool = False) -> Dict[str, Any]:
+        """Like :py:func:`dcs.lua.loads`, but returns the cached result if there is one.
+
+        :param source: lua source, bytes like objects are utf-8
+        :param _globals: predefined variables
+        :param compact: see :py:func:`dcs.lua.loads`
+        :return: all variables
+        """
+        data = source.encode("utf-8") if isinstance(source, str) else source
+        key = self.key(data, _globals, compact)
+        variables = self.get(key)
+        if variables is not None:
+            self.hits += 1
+            return variables
+        self.misses += 1
+        variables = parse.loads(source, _globals, compact=compact)
+        self.put(key, variables)
+        return variables
+
+    def load(self, fp: IO[Any], _globals: Optional[Dict[str, Any]] = None, compact: bool = False) -> Dict[str, Any]:
+        """Like :py:meth:`loads` for a binary or text file object.
+
+        :param fp: file object, bytes are decoded as utf-8
+        :param _globals: predefined variables
+        :param compact: see :py:func:`dcs.lua.loads`
+        :return: all variables
+        """
+        return self.loads(fp.read(), _globals, compact)
+
+    def load_file(self, path: Union[str, Path], _globals: Optional[Dict[str, Any]] = None,
+                  compact: bool = False) -> Dict[str, Any]:
+        """Like :py:meth:`loads` for a lua file.
+
+        The file is mapped into memory instead of being read.
+
+        :param path: path of the lua file
+        :param _globals: predefined variables
+        :param compact: see :py:func:`dcs.lua.loads`
+        :return: all variables
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # empty files can't be mapped
+                return self.loads(b"", _globals, compact)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.loads(data, _globals, compact)
+
+    def entries(self) -> List[Path]:
+        try:
+            return [p for p in self.directory.iterdir() if p.suffix == self.SUFFIX]
+        except OSError:
+            return []
+
+    def size(self) -> int:
+        """Total size of all entries in bytes."""
+        if self._size is None:
+            self._size = sum(self._stat(p)[1] for p in self.entries())
+        return self._size
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in ``max_size``."""
+        stats = sorted((self._stat(p), p) for p in self.entries())
+        size = sum(s[1] for s, _ in stats)
+        for (_, entry_size), path in stats:
+            if size <= self.max_size:
+                break
+            self._remove(path)
+            size -= entry_size
+        self._size = size
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        for path in self.entries():
+            self._remove(path)
+        self._size = 0
+
+    @staticmethod
+    def _stat(path: Path) -> Tuple[float, int]:
+        try:
+            st = path.stat()
+        except OSError:
+            return 0.0, 0
+        return st.st_mtime, st.st_size
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def __repr__(self):
+        return "ParseCache({!r}, max_size={})".format(str(self.directory), self.max_size)
@@ -1,421 +1,1093 @@
-from typing import Dict, Any, Callable, Optional, List, Union
-
-
-def loads(
-        tablestr,
-        _globals: Optional[Dict[str, Any]] = None,
-        unknown_variable_lookup: Optional[Callable[[str], Any]] = None,
-) -> Dict[str, Any]:
-
-    class Parser:
-        def __init__(
-                self,
-                buffer: str,
-                _globals: Optional[Dict[str, Any]] = None,
-                unknown_variable_lookup: Optional[Callable[[str], Any]] = None,
-        ) -> None:
-            self.buffer: str = buffer
-            if _globals:
-                self.variables = _globals.copy()
-            else:
-                self.variables = {}
-            self.unknown_variable_lookup = unknown_variable_lookup
-
-            self._variable_assignment_queue: List[str] = []
-
-            self.buflen: int = len(buffer)
-            self.pos: int = 0
-            self.lineno: int = 1
-
-            # Tracks whether we are at the global scope or in an object. The parser
-            # doesn't currently handle function declarations. Variable declarations are
-            # only allowed when object_depth is zero.
-            self.object_depth = 0
-
-        def parse(self):
+import codecs
+import re
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import MutableMapping
+from mmap import mmap
+from sys import intern
+from typing import (
+    IO, Any, Callable, Dict, Iterator, List, Match, Optional, Sequence, Tuple, TypeVar, Union, cast
+)
+
+T = TypeVar("T")
+
+# Version of the parsed output, bump it whenever the same source parses to a different
+# result so that entries of a :py:class:`dcs.lua.cache.ParseCache` are invalidated.
+VERSION = 1
+
+
+# Whitespace, line comments and block comments. A block comment ends at the first
+# "]]", an unterminated block comment swallows the rest of the buffer.
+# _WS and _NAME match the empty string, so they never return None.
+_WS = cast(Callable[[str, int], Match[str]], re.compile(r'(?:\s+|--\[\[.*?(?:\]\]|\Z)|--[^\n]*)*', re.S).match)
+
+_DQ_STRING = re.compile(r'"([^"\\]*(?:\\.[^"\\]*)*)"', re.S).match
+_SQ_STRING = re.compile(r"'([^'\\]*(?:\\.[^'\\]*)*)'", re.S).match
+_ESCAPE = re.compile(r'\\(.)', re.S).sub
+
+# Lua numerals: decimal integers, decimal floats and hexadecimal integers or floats
+# with a binary exponent. Group 1 is only set for hexadecimal numerals, group 2 and 3
+# only for decimal floats.
+_NUMBER = re.compile(
+    r'-?(?:0[xX]([0-9a-fA-F]*\.?[0-9a-fA-F]*(?:[pP][-+]?\d+)?)'
+    r'|(?:\d+|(?=\.\d))(\.\d*)?([eE][-+]?\d+)?)').match
+# Fast path for a decimal table value and the separator after it in one match.
+# Group 2 and 3 are only set for floats, group 4 is the separator.
+_NUMBER_SEPARATOR = re.compile(r'(-?\d+(\.\d*)?([eE][-+]?\d+)?)\s*([,;}])\s*').match
+_NAME = cast(Callable[[str, int], Match[str]], re.compile(r'\w*').match)
+
+# Fast path for the `["key"] =` and `[1] =` table keys written by DCS and dumps().
+# Anything else, like comments between the brackets, goes through Parser.key().
+_KEY = re.compile(r'\[\s*(?:"([^"\\]*(?:\\.[^"\\]*)*)"|(-?\d+))\s*\]\s*=\s*', re.S).match
+_SEPARATOR = re.compile(r'\s*([,;}])\s*').match
+
+# Everything between two braces when skipping over a table: plain text, strings and
+# comments. Strings and comments are only consumed if they end before the buffer does.
+_SCAN_RUN = cast(Callable[[str, int], Match[str]], re.compile(
+    r'(?:[^{}"\'-]+'
+    r'|"[^"\\]*(?:\\.[^"\\]*)*"'
+    r"|'[^'\\]*(?:\\.[^'\\]*)*'"
+    r'|--\[\[.*?\]\]'
+    r'|--(?!\[\[)[^\n]*\n'
+    r'|-(?!-|\Z))*', re.S).match)
+
+_STRING_MATCHERS = {'"': _DQ_STRING, "'": _SQ_STRING}
+_DIGITS = frozenset('0123456789')
+_NUMBER_START = frozenset('0123456789-.')
+# characters of names and numbers, a token ends before the first other one
+_WORD = frozenset('0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_.')
+_LITERALS = {'true': True, 'false': False, 'nil': None}
+
+
+def _compacted(d: Dict[Union[int, str], Any]) -> Union[Dict[Union[int, str], Any], List[Any]]:
+    """Returns the values of d as a list if its keys are 1..n in order, else d."""
+    i = 0
+    for i, key in enumerate(d, 1):
+        if key != i:
+            return d
+    return list(d.values()) if i else d
+
+
+def table_items(table: Union[Dict[Any, Any], List[Any]]) -> Iterator[Tuple[Any, Any]]:
+    """Returns the (key, value) pairs of a parsed table.
+
+    Works for dicts as well as for the lists returned for sequences in compact mode,
+    whose keys start at 1 like in lua.
+    """
+    if isinstance(table, list):
+        return enumerate(table, 1)
+    return iter(table.items())
+
+
+def table_values(table: Union[Dict[Any, Any], List[Any]], sort: bool = False) -> Iterator[Any]:
+    """Returns the values of a parsed table, see :py:func:`table_items`.
+
+    :param table: parsed table
+    :param sort: return the values of a dict sorted by their key, lists are already in order
+    """
+    if isinstance(table, list):
+        return iter(table)
+    if sort:
+        return (table[k] for k in sorted(table))
+    return iter(table.values())
+
+
+def table_dict(table: Union[Dict[Any, Any], List[Any]]) -> Dict[Any, Any]:
+    """Turns the lists of a compact parse result back into dicts with the keys 1..n.
+
+    Nested tables are converted in place, for tables that are kept and modified by key.
+    """
+    if isinstance(table, list):
+        table = dict(enumerate(table, 1))
+    for key, value in table.items():
+        if isinstance(value, (dict, list)):
+            table[key] = table_dict(value)
+    return table
+
+
+def _utf8(s: str) -> str:
+    """Decodes a string literal of a source that was read as latin-1 as utf-8."""
+    if s.isascii():
+        return s
+    return s.encode('latin-1').decode('utf-8')
+
+
+def _float_or_int(n: str) -> Union[int, float]:
+    num = float(n)
+    if num.is_integer():
+        return int(num)
+    return num
+
+
+class Parser:
+    """Parses the lua subset used by DCS data files.
+
+    The scanner consumes whole tokens with compiled regular expressions instead of
+    walking the buffer character by character, which keeps large mission files fast.
+
+    Bytes like sources, e.g. ``bytes``, ``memoryview`` or ``mmap``, are read as
+    latin-1, which maps each byte to one character without checking anything.
+    All syntax is ascii, so only string literals with other characters have to
+    be decoded as utf-8, and the text never takes more than one byte per
+    character. Error offsets are then byte offsets.
+
+    Args:
+        buffer: lua source to parse, bytes like objects are utf-8
+        _globals: predefined variables
+        unknown_variable_lookup: called for variables that are neither defined in
+            the source nor in _globals, otherwise they raise a SyntaxError
+        lazy: return tables as :py:class:`LazyTable` that are parsed on first access
+        compact: return tables with the keys 1..n as lists and intern string keys
+    """
+    def __init__(
+            self,
+            buffer: Union[str, bytes, bytearray, memoryview, mmap],
+            _globals: Optional[Dict[str, Any]] = None,
+            unknown_variable_lookup: Optional[Callable[[str], Any]] = None,
+            lazy: bool = False,
+            compact: bool = False,
+    ) -> None:
+        if lazy and compact:
+            raise ValueError("lazy and compact mode can't be combined")
+        # string literals of a latin-1 read buffer are utf-8
+        self.utf8 = not isinstance(buffer, str)
+        self.buffer: str = buffer if isinstance(buffer, str) else codecs.latin_1_decode(buffer)[0]
+        if _globals:
+            self.variables = _globals.copy()
+        else:
+            self.variables = {}
+        self.unknown_variable_lookup = unknown_variable_lookup
+        self.lazy = lazy
+        self.compact = compact
+
+        self.buflen: int = len(buffer)
+        self.pos: int = 0
+
+    @property
+    def lineno(self) -> int:
+        return self.buffer.count('\n', 0, self.pos) + 1
+
+    def parse(self) -> None:
+        """Parses the top level statements of the buffer.
+
+        Assigned variables are collected in :py:attr:`variables`.
+        """
+        names = self.statement()
+        while names is not None:
+            self.assignment(names)
+            names = self.statement()
+
+    def statement(self) -> Optional[List[str]]:
+        """Parses the head of the next top level statement up to and including the '='.
+
+        :return: the names assigned by the statement, None if there are no more
+            statements to parse. A `return` or a bare value ends the statement list.
+        """
+        while True:
             self.eat_ws()
-
             if self.eob():
-                return
-
+                return None
             c = self.char()
-            if c == '{':
-                return self.object()
-            elif c in ('"', "'"):
-                return self.string()
-            elif c.isnumeric() or c in ('-', '.'):
-                return self.number()
-            elif c == '_':
-                return self.str_function()
-            elif c == ';':
-                self.advance()
-                return self.parse()
-            else:  # varname
-                self.eat_ws()
-
-                varname = self.eatvarname()
-                if varname == 'false' or varname == 'true':
-                    return varname == 'true'
-                elif varname == 'nil':
-                    return None
-                elif varname == 'local':
-                    self.eat_ws()
-                    # push names for assignment into queue
-                    self.push_assigned_variable_names(self.eatvarnamelist())
-
-                elif varname == 'return':
-                    self.eat_ws()
-
-                    name = self.eatvarname()
-                    return {name: self.variables[name]}
-                elif varname in self.variables:
-                    # substitute value from variables
-                    return self.variables[varname]
-                elif not self.object_depth:
-                    # shortcut syntax without `local`
-                    self.push_assigned_variable_names([varname])
-                else:
-                    if self.unknown_variable_lookup is None:
-                        se = SyntaxError()
-                        se.text = "Use of undefined variable {}".format(varname)
-                        se.lineno = self.lineno
-                        se.offset = self.pos
-                        raise se
-                    return self.unknown_variable_lookup(varname)
-
-                self.eat_ws()
-                if not self.eob() and self.char() == '=':
-                    while True:
-                        # skip comma or whitespace
-                        self.advance()
-
-                        self.eat_ws()
-                        self.assign_local_variable(self.parse())
-
-                        if self.eob():
-                            return None
-
-                        self.eat_ws()
-
-                        if self.eob():
-                            # file ended on variable declaration
-                            return None
-                        elif self.char() != ',':
-                            # value list ended
-                            break
-
-                    return self.parse()
-                else:
-                    se = SyntaxError()
-                    se.text = varname + " '" + self.char() + "'"
-                    se.lineno = self.lineno
-                    se.offset = self.pos
-                    raise se
-
-        def str_function(self) -> str:
-            if self.char() != '_':
-                se = SyntaxError()
-                se.lineno = self.lineno
-                se.offset = self.pos
-                se.text = "Expected character '_', got '{char}'".format(char=self.char())
-                raise se
-
-            if self.advance():
-                raise self.eob_exception()
-
-            self.eat_ws()
+            if c != ';':
+                break
+            self.pos += 1
 
-            if self.char() != '(':
-                se = SyntaxError()
-                se.lineno = self.lineno
-                se.offset = self.pos
-                se.text = "Expected character '(', got '{char}'".format(char=self.char())
-                raise se
+        if not (c.isalpha() or c == '_'):
+            self.value()
+            return None
 
-            self.advance()
+        start = self.pos
+        varname = self.eatvarname()
+        if varname in _LITERALS:
+            return None
+        elif varname == 'return':
             self.eat_ws()
-
-            s = self.string()
-
+            name = self.eatvarname()
+            if name and name not in self.variables and name not in _LITERALS:
+                raise self.syntax_error("Use of undefined variable {}".format(name))
+            return None
+        elif varname == '_':
+            self.pos = start
+            self.str_function()
+            return None
+        elif varname == 'local':
             self.eat_ws()
-
-            if self.char() != ')':
-                se = SyntaxError()
-                se.lineno = self.lineno
-                se.offset = self.pos
-                se.text = "Expected character ')', got '{char}'".format(char=self.char())
-                raise se
-
+            names = self.eatvarnamelist()
+        else:
+            self.eat_ws()
+            names = [varname]
+            if not self.eob() and self.char() == ',':
+                self.pos += 1
+                names += self.eatvarnamelist()
+
+        self.eat_ws()
+        if self.eob() or self.char() != '=':
+            if len(names) == 1 and names[0] in self.variables:
+                # a bare variable, like a bare value, ends the statement list
+                return None
+            raise self.syntax_error(varname + " '" + self.buffer[self.pos:self.pos + 1] + "'")
+        self.pos += 1
+        return names
+
+    def assignment(self, names: List[str]) -> None:
+        """Parses the value list of an assignment and assigns the values to names."""
+        values = []
+        while True:
+            self.eat_ws()
+            if self.char() == '{':
+                # in lazy mode only nested tables are deferred, the top level table
+                # has to be scanned anyway to find the next statement
+                values.append(self.object())
+            else:
+                values.append(self.value())
+            if not self.next_value(len(values) < len(names)):
+                break
+
+        for name, value in zip(names, values):
+            self.variables[name] = value
+
+    def next_value(self, expected: bool) -> bool:
+        """Checks what follows a value of an assignment, and skips a ',' after it.
+
+        :param expected: if there are names left for another value
+        :return: if another value follows, else the value is followed by the end
+            of the input, a ';' or the name that starts the next statement
+        """
+        end = self.pos
+        self.eat_ws()
+        if self.eob():
+            return False
+        c = self.char()
+        if c == ',':
+            if not expected:
+                raise self.syntax_error("More values than names in assignment")
             self.pos += 1
-            return s
-
-        def string(self) -> str:
-            if self.char() not in ('"', "'"):
-                se = SyntaxError()
-                se.lineno = self.lineno
-                se.offset = self.pos
-                se.text = "Expected character '\"' or \"'\", got '{char}'".format(char=self.char())
-                raise se
-
-            terminator = self.char()
-
-            state = 0
-            s = ''
-            while state != 1:
-                if self.advance():
-                    raise self.eob_exception()
-
-                c = self.char()
-                if state == 0:
-                    if c == terminator:
-                        state = 1
-                        self.pos += 1
-                    elif c == '\\':
-                        state = 2
+            return True
+        # a name right after a number would have been part of it
+        if c == ';' or ((c.isalpha() or c == '_') and (self.pos > end or self.buffer[end - 1] not in _WORD)):
+            return False
+        raise self.syntax_error("Unexpected character '{char}' after value".format(char=c))
+
+    def value(self) -> Any:
+        """Parses the value at the current position.
+
+        :return: the parsed value
+        """
+        self.eat_ws()
+        c = self.char()
+        if c == '{':
+            if self.lazy:
+                return self.lazy_object()
+            return self.object()
+        elif c == '"' or c == "'":
+            return self.string()
+        elif c in _NUMBER_START or c.isdigit():
+            return self.number()
+        elif c == '_':
+            return self.str_function()
+
+        varname = self.eatvarname()
+        if not varname:
+            raise self.syntax_error("Unexpected character '{char}'".format(char=c))
+        if varname in _LITERALS:
+            return _LITERALS[varname]
+        elif varname in self.variables:
+            return self.variables[varname]
+        elif self.unknown_variable_lookup is None:
+            raise self.syntax_error("Use of undefined variable {}".format(varname))
+        return self.unknown_variable_lookup(varname)
+
+    def str_function(self) -> str:
+        self.expect('_')
+        self.eat_ws()
+        self.expect('(')
+        self.eat_ws()
+        s = self.string()
+        self.eat_ws()
+        self.expect(')')
+        return s
+
+    def string(self) -> str:
+        c = self.char()
+        match = _STRING_MATCHERS.get(c)
+        if match is None:
+            raise self.syntax_error("Expected character '\"' or \"'\", got '{char}'".format(char=c))
+        m = match(self.buffer, self.pos)
+        if m is None:
+            self.pos = self.buflen
+            raise self.eob_exception()
+        self.pos = m.end()
+        s = m.group(1)
+        if '\\' in s:
+            s = _ESCAPE(r'\1', s)
+        if self.utf8:
+            return _utf8(s)
+        return s
+
+    def number(self) -> Union[int, float]:
+        """Parses a numeral, integral literals convert exactly however big they are."""
+        m = _NUMBER(self.buffer, self.pos)
+        if m is None:
+            raise self.syntax_error("Invalid number literal")
+        n = m.group()
+        if m.lastindex is None:
+            self.pos = m.end()
+            return int(n)
+        try:
+            if m.group(1) is None:
+                num = float(n)
+            elif '.' in n or 'p' in n or 'P' in n:
+                num = float.fromhex(n)
+            else:
+                self.pos = m.end()
+                return int(n, 16)
+        except ValueError:
+            raise self.syntax_error("Invalid number literal '{n}'".format(n=n))
+        self.pos = m.end()
+        if num.is_integer():
+            return int(num)
+        return num
+
+    def key(self) -> Union[int, str]:
+        """Parses a bracketed table key including the following '='."""
+        self.expect('[')
+        self.eat_ws()
+        key: Union[int, str]
+        if self.char() in _STRING_MATCHERS:
+            key = self.string()
+        else:
+            number = self.number()
+            if isinstance(number, float):
+                raise self.syntax_error(f"Found illegal floating point index {number}")
+            key = number
+        self.eat_ws()
+        self.expect(']')
+        self.eat_ws()
+        self.expect('=')
+        return key
+
+    def object(self) -> Any:
+        """Parses the table at the current position.
+
+        :return: a dict, or a list in compact mode if the table is a sequence
+        """
+        buf = self.buffer
+        buflen = self.buflen
+        ws = _WS
+        compact = self.compact
+        utf8 = self.utf8
+        self.expect('{')
+        pos = ws(buf, self.pos).end()
+
+        d: Dict[Union[int, str], Any] = {}
+        inc_key = 1
+        while True:
+            if pos >= buflen:
+                self.pos = pos
+                raise self.eob_exception()
+            c = buf[pos]
+            if c == '}':
+                break
+
+            key: Union[int, str]
+            if c == '[':
+                m = _KEY(buf, pos)
+                if m is not None:
+                    key = m.group(1)
+                    if key is None:
+                        key = int(m.group(2))
                     else:
-                        s += c
-                elif state == 2:
-                    s += c
-                    state = 0
-            return s
-
-        def number(self) -> Union[int, float]:
-            n = ''
-            sign = 1
-            if self.char() == '-':
-                sign = -1
-                if self.advance():
+                        if '\\' in key:
+                            key = _ESCAPE(r'\1', key)
+                        if utf8:
+                            key = _utf8(key)
+                    pos = m.end()
+                else:
+                    self.pos = pos
+                    key = self.key()
+                    pos = self.pos
+            else:
+                key = inc_key
+                inc_key += 1
+            if compact and key.__class__ is str:
+                key = intern(key)
+
+            # inline the common value types, everything else takes the generic path
+            c = buf[pos] if pos < buflen else ''
+            if c == '"':
+                m = _DQ_STRING(buf, pos)
+                if m is None:
+                    self.pos = buflen
                     raise self.eob_exception()
-
-            found_exponent, found_exponent_sign, found_separator = False, False, False
-            while not self.eob():
-                if self.char().isnumeric():
-                    pass
-                elif self.char() == '.':
-                    if not found_separator:
-                        found_separator = True
-                    else:
-                        raise SyntaxError()
-                elif self.char().lower() == 'e':
-                    if not found_exponent:
-                        found_exponent = True
-                    else:
-                        raise SyntaxError()
-                elif self.char() == '-':
-                    if not found_exponent_sign:
-                        found_exponent_sign = True
-                    else:
-                        raise SyntaxError()
+                val = m.group(1)
+                if '\\' in val:
+                    val = _ESCAPE(r'\1', val)
+                if utf8:
+                    val = _utf8(val)
+                pos = m.end()
+            elif c == '{':
+                self.pos = pos
+                val = self.lazy_object() if self.lazy else self.object()
+                pos = self.pos
+            elif c in _NUMBER_START and (nm := _NUMBER_SEPARATOR(buf, pos)) is not None:
+                # the number and the separator after it, the bulk of point and route tables
+                n, frac, exp, sep = nm.groups()
+                if frac is None and exp is None:
+                    d[key] = int(n)
                 else:
+                    num = float(n)
+                    d[key] = int(num) if num.is_integer() else num
+                if sep == '}':
+                    pos = nm.start(4)
                     break
+                pos = nm.end()
+                if pos < buflen and buf[pos] == '-':
+                    pos = ws(buf, pos).end()
+                continue
+            else:
+                self.pos = pos
+                val = self.value()
+                pos = self.pos
 
-                n += self.char()
-                self.pos += 1
-
-            num = float(n) * sign
-            if num.is_integer():
-                return int(num)
-            return num
-
-        def object(self) -> Dict[Union[int, str], Any]:
-            self.object_depth += 1
-            try:
-                return self._object()
-            finally:
-                self.object_depth -= 1
-
-        def _object(self) -> Dict[Union[int, str], Any]:
-            d = {}
-            if self.char() != '{':
-                se = SyntaxError()
-                se.lineno = self.lineno
-                se.offset = self.pos
-                se.text = "Expected character '{{', got '{char}'".format(char=self.char())
-                raise se
-
-            if self.advance():
-                raise self.eob_exception()
-
-            self.eat_ws()
-
-            inc_key = 1
-            while self.char() != '}':
-                self.eat_ws()
-
-                if self.char() == '[':
-                    # key given
-                    if self.advance():
-                        raise self.eob_exception()
-
-                    self.eat_ws()
-                    key: Union[int, str]
-                    if self.char() == '"':
-                        key = self.string()
-                    else:
-                        number = self.number()
-                        if isinstance(number, float):
-                            se = SyntaxError()
-                            se.lineno = self.lineno
-                            se.offset = self.pos
-                            se.text = f"Found illegal floating point index {number}"
-                            raise se
-                        key = number
-
-                    if self.eob():
-                        raise self.eob_exception()
-
-                    self.eat_ws()
-
-                    if self.char() != ']':
-                        se = SyntaxError()
-                        se.lineno = self.lineno
-                        se.offset = self.pos
-                        se.text = "Expected character ']', got '{char}'".format(char=self.char())
-                        raise se
-
-                    if self.advance():
-                        raise self.eob_exception()
-
-                    self.eat_ws()
-
-                    if self.char() != '=':
-                        se = SyntaxError()
-                        se.lineno = self.lineno
-                        se.offset = self.pos
-                        se.text = "Expected character '=', got '{char}'".format(char=self.char())
-                        raise se
-
-                    if self.advance():
-                        raise self.eob_exception()
-                else:
-                    key = inc_key
-                    inc_key += 1
-
-                val = self.parse()
-
-                self.eat_ws()
-
-                d[key] = val
-                # print(key, ':', val)
+            d[key] = val
 
-                if self.eob():
+            sm = _SEPARATOR(buf, pos)
+            if sm is None:
+                pos = ws(buf, pos).end()
+                if pos >= buflen:
+                    self.pos = pos
                     raise self.eob_exception()
-
-                c = self.char()
+                c = buf[pos]
                 if c == '}':
                     break
-                elif c in {',', ';'}:
-                    if self.advance():
-                        raise self.eob_exception()
-                    self.eat_ws()
-                else:
-                    se = SyntaxError()
-                    se.lineno = self.lineno
-                    se.offset = self.pos
-                    se.text = "Unexpected character '{char}'".format(char=self.char())
-                    raise se
+                if c != ',' and c != ';':
+                    self.pos = pos
+                    raise self.syntax_error("Unexpected character '{char}'".format(char=c))
+                pos = ws(buf, pos + 1).end()
+            elif sm.group(1) == '}':
+                pos = sm.start(1)
+                break
+            else:
+                pos = sm.end()
+                if pos < buflen and buf[pos] == '-':
+                    pos = ws(buf, pos).end()
+
+        self.pos = pos + 1
+        return _compacted(d) if compact else d
+
+    def lazy_object(self) -> 'LazyTable':
+        """Skips over the table at the current position and returns a proxy parsing it on first access."""
+        start = self.pos
+        end, depth = _scan_table(self.buffer, start)
+        if depth:
+            self.pos = end
+            raise self.eob_exception()
+        self.pos = end
+        return LazyTable(self, start)
+
+    def eatvarname(self) -> str:
+        m = _NAME(self.buffer, self.pos)
+        self.pos = m.end()
+        return m.group()
+
+    def eatvarnamelist(self) -> List[str]:
+        varnames = []
+        while not self.eob():
+            self.eat_ws()
+            name = self.eatvarname()
+            if len(name) > 0:
+                varnames.append(name)
+            self.eat_ws()
 
-            self.pos += 1
+            if not self.eob() and self.char() == ',':
+                self.pos += 1
+            else:
+                break
+
+        return varnames
+
+    def eat_ws(self) -> None:
+        """
+        Advances the internal buffer until it reaches a non comment or whitespace.
+        :return: None
+        """
+        self.pos = _WS(self.buffer, self.pos).end()
+
+    def expect(self, c: str) -> None:
+        if self.char() != c:
+            raise self.syntax_error("Expected character '{c}', got '{char}'".format(c=c, char=self.char()))
+        self.pos += 1
+
+    def eob(self) -> bool:
+        """
+        Checks if we are at the end of buffer.
+
+        :return: True if end of buffer is reached, else False.
+        """
+        return self.pos >= self.buflen
+
+    def syntax_error(self, text: str) -> SyntaxError:
+        se = SyntaxError()
+        se.lineno = self.lineno
+        se.offset = self.pos
+        se.text = text
+        return se
+
+    def eob_exception(self, lookahead: int = 0) -> SyntaxError:
+        offset = self.pos + lookahead
+        se = SyntaxError()
+        se.lineno = self.lineno
+        se.offset = offset
+        se.text = "Unexpected end of buffer. Previous 20 characters: {}".format(
+            self.buffer[offset - 20:offset]
+        )
+        return se
+
+    def char(self, lookahead: int = 0) -> str:
+        try:
+            return self.buffer[self.pos + lookahead]
+        except IndexError as ex:
+            raise self.eob_exception(lookahead) from ex
+
+
+class _Span:
+    """Placeholder for a table parsed by a worker process."""
+    __slots__ = ('index',)
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+
+def _table_ends(buf: str) -> Dict[int, int]:
+    """Finds the end of every table in a single pass.
+
+    :return: position after the closing brace by the position of the opening brace,
+        tables that are not closed are left out
+    """
+    ends: Dict[int, int] = {}
+    opened: List[int] = []
+    pos = 0
+    buflen = len(buf)
+    while True:
+        pos = _SCAN_RUN(buf, pos).end()
+        if pos >= buflen:
+            return ends
+        c = buf[pos]
+        if c == '{':
+            opened.append(pos)
+        elif c == '}':
+            if opened:
+                ends[opened.pop()] = pos + 1
+        else:
+            # a string or comment that doesn't end
+            return ends
+        pos += 1
+
+
+class _SplitParser(Parser):
+    """Parses the skeleton of big tables for :py:func:`loads` with workers.
+
+    Tables of at most chunk_size characters are skipped and left as
+    :py:class:`_Span` placeholders, bigger ones are parsed down to their
+    subtrees of that size.
+    """
+    def __init__(
+            self,
+            buffer: Union[str, bytes, bytearray, memoryview, mmap],
+            _globals: Optional[Dict[str, Any]],
+            unknown_variable_lookup: Optional[Callable[[str], Any]],
+            compact: bool,
+            chunk_size: int,
+    ) -> None:
+        super().__init__(buffer, _globals, unknown_variable_lookup, compact=compact)
+        self.chunk_size = chunk_size
+        self.ends = _table_ends(self.buffer)
+        self.spans: List[Tuple[int, int]] = []
+        # the tables holding placeholders
+        self.skeleton: List[Union[Dict[Union[int, str], Any], List[Any]]] = []
+
+    def object(self) -> Any:
+        start = self.pos
+        end = self.ends.get(start, self.buflen)
+        if end - start <= self.chunk_size:
+            self.pos = end
+            self.spans.append((start, end))
+            return _Span(len(self.spans) - 1)
+        table = super().object()
+        self.skeleton.append(table)
+        return table
+
+
+class _SpanParser(Parser):
+    """Records where each table is in the source for :py:func:`loads` with spans."""
+    def __init__(
+            self,
+            buffer: Union[str, bytes, bytearray, memoryview, mmap],
+            _globals: Optional[Dict[str, Any]],
+            unknown_variable_lookup: Optional[Callable[[str], Any]],
+            compact: bool,
+            spans: Dict[int, Tuple[int, int]],
+    ) -> None:
+        super().__init__(buffer, _globals, unknown_variable_lookup, compact=compact)
+        self.spans = spans
+
+    def object(self) -> Any:
+        start = self.pos
+        table = super().object()
+        self.spans[id(table)] = (start, self.pos)
+        return table
+
+
+def _parse_spans(
+        text: str,
+        offsets: List[int],
+        _globals: Optional[Dict[str, Any]],
+        compact: bool,
+        utf8: bool,
+) -> List[Any]:
+    """Parses the tables starting at offsets of text, runs in a worker process."""
+    p = Parser(text, _globals, compact=compact)
+    p.utf8 = utf8
+    tables = []
+    for offset in offsets:
+        p.pos = offset
+        tables.append(p.object())
+    return tables
+
+
+def _parallel_loads(
+        tablestr: Union[str, bytes, bytearray, memoryview, mmap],
+        _globals: Optional[Dict[str, Any]],
+        unknown_variable_lookup: Optional[Callable[[str], Any]],
+        compact: bool,
+        workers: int,
+) -> Dict[str, Any]:
+    chunk_size = max(len(tablestr) // (workers * 4), 1 << 16)
+    p = _SplitParser(tablestr, _globals, unknown_variable_lookup, compact, chunk_size)
+    p.parse()
+    text = p.buffer
+
+    # consecutive spans are sent to the workers in batches of about chunk_size characters
+    batches: List[List[int]] = []
+    size = chunk_size
+    for index, (start, end) in enumerate(p.spans):
+        if size >= chunk_size:
+            batches.append([])
+            size = 0
+        batches[-1].append(index)
+        size += end - start
+
+    results: List[Any] = [None] * len(p.spans)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for batch in batches:
+            base = p.spans[batch[0]][0]
+            offsets = [p.spans[i][0] - base for i in batch]
+            futures.append(executor.submit(
+                _parse_spans, text[base:p.spans[batch[-1]][1]], offsets, _globals, compact, p.utf8))
+        for batch, future in zip(batches, futures):
+            try:
+                tables = future.result()
+            except SyntaxError:
+                # undefined variables or an actual syntax error, the main process
+                # knows all variables and reports the error at its real position
+                fallback = Parser(text, unknown_variable_lookup=unknown_variable_lookup, compact=compact)
+                fallback.utf8 = p.utf8
+                fallback.variables = p.variables
+                tables = []
+                for index in batch:
+                    fallback.pos = p.spans[index][0]
+                    tables.append(fallback.object())
+            for index, table in zip(batch, tables):
+                results[index] = table
+
+    for table in p.skeleton:
+        for key, value in table_items(table):
+            if value.__class__ is _Span:
+                table[key - 1 if isinstance(table, list) else key] = results[value.index]
+    for name, value in p.variables.items():
+        if value.__class__ is _Span:
+            p.variables[name] = results[value.index]
+    return p.variables
 
-            return d
 
-        def push_assigned_variable_names(self, variable_names: List[str]):
-            self._variable_assignment_queue += variable_names
+def loads(
+        tablestr,
+        _globals: Optional[Dict[str, Any]] = None,
+        unknown_variable_lookup: Optional[Callable[[str], Any]] = None,
+        lazy: bool = False,
+        compact: bool = False,
+        workers: Optional[int] = None,
+        spans: Optional[Dict[int, Tuple[int, int]]] = None,
+) -> Dict[str, Any]:
+    """Parses lua source and returns all variables it assigns.
+
+    :param tablestr: lua source, or utf-8 encoded lua source as ``bytes``,
+        ``memoryview`` or ``mmap``, see :py:class:`Parser`
+    :param _globals: predefined variables
+    :param unknown_variable_lookup: called for undefined variables
+    :param lazy: return tables as :py:class:`LazyTable` proxies that are parsed on
+        first access, for reading a few values out of big files
+    :param compact: return tables whose keys are 1..n as lists and intern all string
+        keys, to save memory on big files. Iterate such tables with
+        :py:func:`table_items` or :py:func:`table_values`.
+    :param workers: parse big sources in this many processes. The source is split
+        into subtrees that are parsed in a :py:class:`ProcessPoolExecutor` and put
+        back together, this only pays off for sources of several megabytes.
+        _globals have to be picklable.
+    :param spans: gets the (start, end) offsets of the source text of every table by
+        the id() of the parsed table, byte offsets for bytes like sources. The ids
+        are only valid while the tables are alive.
+    :return: all variables
+    """
+    if spans is not None:
+        if lazy or (workers is not None and workers > 1):
+            raise ValueError("spans can't be combined with lazy mode or workers")
+        sp = _SpanParser(tablestr, _globals, unknown_variable_lookup, compact, spans)
+        sp.parse()
+        return sp.variables
+    if workers is not None and workers > 1 and len(tablestr) > 1 << 17:
+        if lazy:
+            raise ValueError("lazy mode can't be combined with workers")
+        return _parallel_loads(tablestr, _globals, unknown_variable_lookup, compact, workers)
+    p = Parser(tablestr, _globals, unknown_variable_lookup, lazy, compact)
+    p.parse()
+    return p.variables
 
-        def assign_local_variable(self, value):
-            self.variables[self._variable_assignment_queue.pop(0)] = value
 
-        def eatvarname(self) -> str:
-            varname = ''
-            while (not self.eob()) and (self.char().isalnum() or self.char() == '_'):
-                varname += self.char()
+class LazyTable(MutableMapping):
+    """A lua table that is only parsed when it is accessed for the first time.
+
+    Returned by ``loads(..., lazy=True)``. Nested tables are again LazyTable
+    instances, so reading a few keys of a big file only parses the tables along
+    the way, everything else is skipped over. Syntax errors inside a table are
+    raised when it is first accessed.
+    """
+    __slots__ = ('_parser', '_start', '_dict')
+
+    def __init__(self, parser: Parser, start: int) -> None:
+        self._parser: Optional[Parser] = parser
+        self._start = start
+        self._dict: Optional[Dict[Union[int, str], Any]] = None
+
+    def _load(self) -> Dict[Union[int, str], Any]:
+        if self._dict is None:
+            assert self._parser is not None
+            parent = self._parser
+            p = Parser(parent.buffer, unknown_variable_lookup=parent.unknown_variable_lookup, lazy=True)
+            p.utf8 = parent.utf8
+            p.variables = parent.variables
+            p.pos = self._start
+            self._dict = p.object()
+            self._parser = None
+        return self._dict
+
+    @property
+    def loaded(self) -> bool:
+        return self._dict is not None
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value) -> None:
+        self._load()[key] = value
+
+    def __delitem__(self, key) -> None:
+        del self._load()[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._load()
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __repr__(self) -> str:
+        return repr(self._load())
+
+    def __reduce__(self):
+        return dict, (self._load(),)
+
+
+def _scan_table(buf: str, pos: int, depth: int = 0) -> Tuple[int, int]:
+    """Skips over a table without parsing it.
+
+    :param buf: buffer to scan
+    :param pos: position of the opening brace, or where a previous scan stopped
+    :param depth: brace depth at pos
+    :return: (pos, depth) with a depth of 0 if pos is just after the closing brace.
+        Otherwise the buffer ended and the scan can be resumed at pos with the
+        returned depth once more data is available.
+    """
+    buflen = len(buf)
+    while True:
+        pos = _SCAN_RUN(buf, pos).end()
+        if pos >= buflen:
+            return buflen, depth
+        c = buf[pos]
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return pos + 1, 0
+        else:
+            # a string or comment that doesn't end before the buffer does
+            return pos, depth
+        pos += 1
+
+
+class _StreamReader:
+    """Parses lua from a file object while only keeping a window of its text in memory.
+
+    Small tokens are parsed with a :py:class:`Parser` on the current window and
+    reparsed with a bigger window if they run into its end. Tables are first
+    skipped with :py:func:`_scan_table` to find their end, so they are parsed only
+    once, or dropped chunk by chunk if they are not needed.
+    """
+    def __init__(
+            self,
+            fp: IO[Any],
+            chunk_size: int,
+            _globals: Optional[Dict[str, Any]] = None,
+            unknown_variable_lookup: Optional[Callable[[str], Any]] = None,
+            compact: bool = False,
+    ) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder: Optional[codecs.IncrementalDecoder] = None
+        self.variables: Dict[str, Any] = _globals.copy() if _globals else {}
+        self.unknown_variable_lookup = unknown_variable_lookup
+        self.compact = compact
+
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        # offset and line count of the text dropped in front of the buffer
+        self.offset = 0
+        self.lines = 0
+
+    def fill(self) -> int:
+        """Drops the text before pos and appends the next chunk to the buffer.
+
+        :return: the number of characters dropped
+        """
+        dropped = self.pos
+        self.lines += self.buffer.count('\n', 0, dropped)
+        self.offset += dropped
+
+        # grow geometrically, a table being collected should not be copied once per chunk
+        data = self.fp.read(max(self.chunk_size, len(self.buffer) - dropped))
+        if isinstance(data, bytes):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder('utf-8')()
+            text = self.decoder.decode(data, final=not data)
+        else:
+            text = data
+        if not data:
+            self.eof = True
+
+        self.buffer = self.buffer[dropped:] + text
+        self.pos = 0
+        return dropped
+
+    def relocate(self, se: SyntaxError) -> SyntaxError:
+        if se.lineno is not None:
+            se.lineno += self.lines
+        if se.offset is not None:
+            se.offset += self.offset
+        return se
+
+    def parser(self) -> Parser:
+        p = Parser(self.buffer, unknown_variable_lookup=self.unknown_variable_lookup, compact=self.compact)
+        p.variables = self.variables
+        p.pos = self.pos
+        return p
+
+    def attempt(self, parse: Callable[[Parser], T]) -> T:
+        """Runs parse on the window, growing it until parse doesn't run into its end.
+
+        Stopping on the last character of the window counts as running into its end,
+        as that character might be the first half of a comment start. So does stopping
+        between two characters of a name or number, e.g. on the e of a ``1.5e-05`` the
+        window cut after ``1.5e-``.
+        """
+        while True:
+            p = self.parser()
+            try:
+                result = parse(p)
+            except SyntaxError as se:
+                if p.pos + 1 < len(self.buffer) or self.eof:
+                    raise self.relocate(se)
+            else:
+                if self.eof or (p.pos + 1 < len(self.buffer) and not self.splits_token(p.pos)):
+                    self.pos = p.pos
+                    return result
+            self.fill()
+
+    def splits_token(self, pos: int) -> bool:
+        """If pos is inside a name or number, which can continue after the window."""
+        return pos > self.pos and self.buffer[pos - 1] in _WORD and self.buffer[pos] in _WORD
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, an empty string at the end."""
+        self.attempt(Parser.eat_ws)
+        return self.buffer[self.pos:self.pos + 1]
+
+    def error(self, text: str) -> SyntaxError:
+        return self.relocate(self.parser().syntax_error(text))
+
+    def scan_table(self, keep: bool) -> int:
+        """Finds the end of the table at pos.
+
+        :param keep: keep the table text in the buffer, else it is dropped while scanning
+        :return: position after the closing brace
+        """
+        scan, depth = self.pos, 0
+        while True:
+            scan, depth = _scan_table(self.buffer, scan, depth)
+            if depth == 0:
+                return scan
+            if self.eof:
+                self.pos = scan
+                raise self.relocate(self.parser().eob_exception())
+            if not keep:
+                self.pos = scan
+            scan -= self.fill()
+
+    def value(self) -> Any:
+        if self.peek() == '{':
+            self.scan_table(keep=True)
+            return self.attempt(Parser.object)
+        return self.attempt(Parser.value)
+
+    def skip_value(self) -> None:
+        if self.peek() == '{':
+            self.pos = self.scan_table(keep=False)
+        else:
+            self.attempt(Parser.value)
+
+    def table(self, path: Sequence[Union[str, int]]) -> Iterator[Tuple[Union[str, int], Any]]:
+        """Yields the entries of the table at pos, or of the nested table at path."""
+        if self.peek() != '{':
+            raise self.error("Expected character '{{', got '{char}'".format(char=self.peek()))
+        self.pos += 1
+
+        inc_key = 1
+        while True:
+            c = self.peek()
+            if c == '}':
                 self.pos += 1
+                return
 
-            return varname
-
-        def eatvarnamelist(self) -> List[str]:
-            varnames = []
-            while not self.eob():
-                self.eat_ws()
-                name = self.eatvarname()
-                if len(name) > 0:
-                    varnames.append(name)
-                self.eat_ws()
-
-                if self.char() == ',':
-                    self.advance()
-                else:
-                    break
+            key: Union[str, int]
+            if c == '[':
+                key = self.attempt(Parser.key)
+                if self.compact and isinstance(key, str):
+                    key = intern(key)
+            else:
+                key = inc_key
+                inc_key += 1
 
-            return varnames
+            if not path:
+                yield key, self.value()
+            elif key == path[0] and self.peek() == '{':
+                yield from self.table(path[1:])
+            else:
+                self.skip_value()
 
-        def eat_line(self) -> None:
-            while not self.eob() and self.char() != '\n':
+            c = self.peek()
+            if c == ',' or c == ';':
                 self.pos += 1
+            elif c != '}':
+                if not c:
+                    raise self.relocate(self.parser().eob_exception())
+                raise self.error("Unexpected character '{char}'".format(char=c))
+
+    def statements(self, path: Sequence[Union[str, int]], keep_tables: bool) -> Iterator[Tuple[Union[str, int], Any]]:
+        """Yields the top level assignments, or the entries of the table at path.
+
+        :param path: variable name followed by the keys of nested tables
+        :param keep_tables: also keep assigned tables in :py:attr:`variables`,
+            scalars are always kept as later statements might refer to them.
+        """
+        while True:
+            names = self.attempt(Parser.statement)
+            if names is None:
+                return
 
-        def eat_block_comment(self) -> None:
-            while not self.eob() and self.next_n_chars(2) != "]]":
-                self.pos += 1
-            if not self.eob():
-                self.pos += 2
-
-        def eat_ws(self):
-            """
-            Advances the internal buffer until it reaches a non comment or whitespace.
-            :return: None
-            """
+            index = 0
             while True:
-                if self.pos >= self.buflen:
-                    return
-                c: str = self.char()
-                if c == '\n':
-                    self.lineno += 1
-                if self.next_n_chars(4) == "--[[":
-                    self.eat_block_comment()
-                    continue
-                if self.next_n_chars(2) == "--":
-                    self.eat_line()
-                    continue
-                if not c.isspace():
-                    return
-
-                self.pos += 1
+                name = names[index] if index < len(names) else None
+                if path and name == path[0] and self.peek() == '{':
+                    yield from self.table(path[1:])
+                elif path and self.peek() == '{':
+                    self.skip_value()
+                else:
+                    if not path and self.peek() == '{':
+                        # collect the entries one by one, so only the largest entry
+                        # has to be buffered as a whole
+                        table = dict(self.table(()))
+                        value = _compacted(table) if self.compact else table
+                    else:
+                        value = self.value()
+                    if name is not None and (keep_tables or not isinstance(value, (dict, list))):
+                        self.variables[name] = value
+                    if name is not None and not path:
+                        yield name, value
+
+                index += 1
+                if not self.attempt(lambda p: p.next_value(index < len(names))):
+                    break
 
-        def eob(self) -> bool:
-            """
-            Checks if we are at the end of buffer.
-
-            :return: True if end of buffer is reached, else False.
-            """
-            return self.pos >= self.buflen
-
-        def eob_exception(self, lookahead: int = 0) -> SyntaxError:
-            offset = self.pos + lookahead
-            se = SyntaxError()
-            se.lineno = self.lineno
-            se.offset = offset
-            se.text = "Unexpected end of buffer. Previous 20 characters: {}".format(
-                self.buffer[offset - 20:offset]
-            )
-            return se
-
-        def char(self, lookahead: int = 0) -> str:
-            try:
-                return self.buffer[self.pos + lookahead]
-            except IndexError as ex:
-                raise self.eob_exception(lookahead) from ex
-
-        def next_n_chars(self, n: int) -> str:
-            return self.buffer[self.pos:self.pos + n]
-
-        def advance(self) -> bool:
-            """
-            Advances the internal buffer position by 1 and checks if we are at the end of buffer.
-            :return: True if end of buffer is reached, else False.
-            """
-            self.pos += 1
-            return self.eob()
 
-    p = Parser(tablestr, _globals, unknown_variable_lookup)
-    p.parse()
-    return p.variables
+def load(
+        fp: IO[Any],
+        _globals: Optional[Dict[str, Any]] = None,
+        unknown_variable_lookup: Optional[Callable[[str], Any]] = None,
+        chunk_size: int = 1 << 16,
+        compact: bool = False,
+) -> Dict[str, Any]:
+    """Parses lua from a binary or text file object like :py:func:`loads`.
+
+    The file is read in chunks, the whole text is never held in memory.
+
+    :param fp: file object, bytes are decoded as utf-8
+    :param _globals: predefined variables
+    :param unknown_variable_lookup: called for undefined variables
+    :param chunk_size: number of bytes or characters read at once
+    :param compact: see :py:func:`loads`
+    :return: all variables
+    """
+    reader = _StreamReader(fp, chunk_size, _globals, unknown_variable_lookup, compact)
+    for _ in reader.statements((), keep_tables=True):
+        pass
+    return reader.variables
+
+
+def iterload(
+        fp: IO[Any],
+        path: Sequence[Union[str, int]] = (),
+        _globals: Optional[Dict[str, Any]] = None,
+        unknown_variable_lookup: Optional[Callable[[str], Any]] = None,
+        chunk_size: int = 1 << 16,
+        compact: bool = False,
+) -> Iterator[Tuple[Union[str, int], Any]]:
+    """Incrementally parses lua from a binary or text file object.
+
+    Yields top level variable assignments as (name, value) pairs as soon as they
+    are parsed. If a path is given, the entries of the table at that path are
+    yielded instead and everything else is skipped without being parsed, e.g.
+    ``iterload(fp, ("mission", "coalition"))`` yields the coalitions of a mission
+    one by one. Memory use is bounded by the largest yielded value.
+
+    :param fp: file object, bytes are decoded as utf-8
+    :param path: variable name followed by keys of nested tables
+    :param _globals: predefined variables
+    :param unknown_variable_lookup: called for undefined variables
+    :param chunk_size: number of bytes or characters read at once
+    :param compact: see :py:func:`loads`
+    """
+    reader = _StreamReader(fp, chunk_size, _globals, unknown_variable_lookup, compact)
+    yield from reader.statements(path, keep_tables=False)
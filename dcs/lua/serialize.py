@@ -1,48 +1,288 @@
-def dumps(value, varname=None, indent=None):
-    nl = "\n" if indent else ""
-    s = varname + '=' + nl if varname else ''
-    indentcount = 0 if indent is None else indent
-
-    if isinstance(value, dict):
-        e = []
-        areAllKeysInts = all(isinstance(k, int) for k in value.keys())
-        dictionaryKeys = value.keys() if areAllKeysInts else sorted(value.keys(), key=str)
-        for key in dictionaryKeys:
-            child = value[key]
-            KNL = "\n" if indent and isinstance(child, (dict, list)) else ""
-            selem = '\t' * indentcount
-            skey = key if isinstance(key, int) else '"{key}"'.format(key=key)
-            selem += '[{key}]={nl}'.format(key=skey, nl=KNL)
-            selem += dumps(value[key], indent=indent + 1 if indent else None)
-            e.append(selem)
-        s += '\t' * (indent - 1) if nl else ""
-        s += "{"
-        if e:
-            s += nl + ",{nl}".format(nl=nl).join(e)
-        s += nl + '\t' * (indentcount - 1) + "}"
-    elif isinstance(value, list):
-        e = []
-        i = 1
-        for v in value:
-            selem = '\t' * indentcount + "[{i}]=".format(i=i)
-            selem += dumps(v, indent=indent + 1 if indent else None)
-            e.append(selem)
-            i += 1
-        s += '\t' * (indent - 1) if nl else ""
-        s += "{"
-        if e:
-            s += nl + ",{nl}".format(nl=nl).join(e)
-        s += nl + '\t' * (indentcount - 1) + "}"
-    elif isinstance(value, str):
-        v = value.replace('\\', '\\\\')
-        v = v.replace('"', '\\"')
-        v = v.replace('\n', '\\\n')
-        s += '"{val}"'.format(val=v)
+import io
+from collections.abc import Mapping
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# dump() collects this many pieces of output before writing them to the file object
+_CHUNK_PIECES = 1 << 13
+
+
+def _escape(value: str) -> str:
+    if '\\' in value or '"' in value or '\n' in value:
+        value = value.replace('\\', '\\\\')
+        value = value.replace('"', '\\"')
+        value = value.replace('\n', '\\\n')
+    return '"' + value + '"'
+
+
+# Serializers of the common value types by their exact type, subclasses like enums
+# take the slow path.
+_SCALARS: Dict[type, Callable[[Any], str]] = {
+    str: _escape,
+    int: int.__repr__,
+    float: float.__repr__,
+    bool: lambda v: "true" if v else "false",
+    type(None): lambda v: "nil",
+}
+
+
+def _scalar(value) -> str:
+    if isinstance(value, str):
+        return _escape(value)
     elif isinstance(value, bool):
-        s += "true" if value else "false"
+        return "true" if value else "false"
     elif value is None:
-        s += "nil"
-    else:
-        s += str(value)
+        return "nil"
+    return str(value)
+
+
+class Deferred:
+    """A value that is only built when the serializer reaches it.
+
+    The result is not kept, so :py:func:`dump` can stream a big structure made of
+    deferred parts while holding only one of them in memory at a time.
+
+    Args:
+        build: returns the value
+    """
+    __slots__ = ('build',)
+
+    def __init__(self, build: Callable[[], Any]) -> None:
+        self.build = build
+
+    def __repr__(self) -> str:
+        return "Deferred({!r})".format(self.build)
+
+
+class Raw:
+    """Lua source the serializer writes as it is, e.g. a table copied from a loaded file.
+
+    Args:
+        text: lua source of a single value
+    """
+    __slots__ = ('text',)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def __repr__(self) -> str:
+        return "Raw({!r})".format(self.text)
+
+
+_NOTHING = object()
+
+
+class Writer:
+    """Passed to the ``__lua_emit__(writer)`` method of objects the serializer reaches.
+
+    Any object with that method can be put in a table as it is, e.g. a group of
+    a mission. The serializer lets it write its value once it gets to it and
+    drops the value once it is serialized. The object still builds its whole
+    value, e.g. a group its dict(), only not before it is needed, so a mission
+    holds the table of one group at a time instead of all of them. Tables in
+    the value may hold such objects again.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value: Any = _NOTHING
+
+    def write(self, value: Any) -> None:
+        """Writes the value of the object, call it exactly once."""
+        if self.value is not _NOTHING:
+            raise ValueError("A value was already written")
+        self.value = value
+
+
+def _emitted(value):
+    """The value of value, with :py:class:`Deferred` values built and objects with
+    ``__lua_emit__`` emitted."""
+    while True:
+        if value.__class__ is Deferred:
+            value = value.build()
+        elif value.__class__ is not dict and hasattr(value.__class__, '__lua_emit__'):
+            writer = Writer()
+            value.__lua_emit__(writer)
+            if writer.value is _NOTHING:
+                raise ValueError("{!r} did not write a value".format(value))
+            value = writer.value
+        else:
+            return value
+
+
+def _is_table(value) -> bool:
+    return isinstance(value, (dict, list, Mapping))
+
+
+def _entries(table) -> Iterator[Tuple[Any, Any]]:
+    if isinstance(table, list):
+        return enumerate(table, 1)
+    # int keys keep their order, anything else is sorted by its string
+    for key in table:
+        if not isinstance(key, int):
+            keys = sorted(table, key=str)
+            return zip(keys, map(table.__getitem__, keys))
+    if isinstance(table, dict):
+        return iter(table.items())
+    return zip(table, map(table.__getitem__, table))
+
+
+class _Level:
+    """Strings of a table at one indentation level, computed once.
+
+    The key strings start with the separator to the previous entry, the first
+    entry of a table leaves out the comma.
+    """
+    __slots__ = ('opener', 'closer', 'sep', 'key_nl', 'keys')
+
+    def __init__(self, level: int, pretty: bool) -> None:
+        if pretty:
+            self.opener = '\t' * (level - 1) + '{'
+            self.closer = '\n' + '\t' * (level - 1) + '}'
+            self.sep = ',\n' + '\t' * level
+            self.key_nl = '\n'
+        else:
+            self.opener = '{'
+            self.closer = '}'
+            self.sep = ','
+            self.key_nl = ''
+        # separator and key by key, for the exact types int and str only as True == 1
+        self.keys: Dict[Any, str] = {}
+
+    def key(self, key) -> str:
+        ks = self.keys.get(key) if key.__class__ is str or key.__class__ is int else None
+        if ks is None:
+            skey = key if isinstance(key, int) else '"{key}"'.format(key=key)
+            ks = self.sep + '[{key}]='.format(key=skey)
+            if key.__class__ is str or key.__class__ is int:
+                self.keys[key] = ks
+        return ks
+
+
+def _serialize(value, indent: Optional[int], out: List[str], flush: Optional[Callable[[], None]] = None,
+               levels: Optional[List[_Level]] = None) -> None:
+    """Appends the serialized value to out.
+
+    Tables are walked with an explicit stack, the separators of each indentation
+    level and the key strings are computed only once.
+
+    :param value: value to serialize
+    :param indent: indentation level of value, None or 0 for no whitespace
+    :param out: list of output pieces
+    :param flush: called when out holds enough pieces to be written
+    :param levels: levels to reuse from a previous call with the same whitespace
+    """
+    append = out.append
+    scalars = _SCALARS
+    value = _emitted(value)
+    scalar = scalars.get(value.__class__)
+    if scalar is not None:
+        append(scalar(value))
+        return
+    if value.__class__ is Raw:
+        append(value.text)
+        return
+    if not _is_table(value):
+        append(_scalar(value))
+        return
+
+    pretty = bool(indent)
+    if levels is None:
+        levels = []
+    level = indent if indent else 0
+    while len(levels) <= level:
+        levels.append(_Level(len(levels), pretty))
+
+    append(levels[level].opener)
+    stack = [(_entries(value), level)]
+    first = True
+    while stack:
+        it, level = stack[-1]
+        lvl = levels[level]
+        keys = lvl.keys
+        for key, child in it:
+            ks = keys.get(key)
+            if ks is None or (key.__class__ is not str and key.__class__ is not int):
+                ks = lvl.key(key)
+            if first:
+                # no comma in front of the first entry
+                ks = ks[1:]
+                first = False
+
+            scalar = scalars.get(child.__class__)
+            if scalar is None and child.__class__ is not dict:
+                child = _emitted(child)
+                scalar = scalars.get(child.__class__)
+            if scalar is not None:
+                append(ks + scalar(child))
+                if flush is not None and len(out) >= _CHUNK_PIECES:
+                    flush()
+            elif child.__class__ is Raw:
+                if child.text.startswith('{'):
+                    # indent a table like the serializer does up to its opening brace
+                    child_level = level + 1 if pretty else 0
+                    if child_level == len(levels):
+                        levels.append(_Level(child_level, pretty))
+                    append(ks + lvl.key_nl + levels[child_level].opener[:-1] + child.text)
+                else:
+                    append(ks + child.text)
+                if flush is not None and len(out) >= _CHUNK_PIECES:
+                    flush()
+            elif _is_table(child):
+                child_level = level + 1 if pretty else 0
+                if child_level == len(levels):
+                    levels.append(_Level(child_level, pretty))
+                append(ks + lvl.key_nl + levels[child_level].opener)
+                stack.append((_entries(child), child_level))
+                first = True
+                break
+            else:
+                append(ks + _scalar(child))
+        else:
+            append(lvl.closer)
+            stack.pop()
+            first = False
+
+
+def dumps(value, varname=None, indent=None):
+    """Serializes value to lua.
+
+    :param value: value to serialize, dicts and lists become tables,
+        :py:class:`Deferred` values are built and objects with a ``__lua_emit__``
+        method write their value (see :py:class:`Writer`) on the way,
+        :py:class:`Raw` values are written as they are
+    :param varname: assign the value to this variable
+    :param indent: indentation level to start with, None or 0 for a single line
+        without any whitespace
+    :return: lua source
+    """
+    out: List[str] = []
+    if varname:
+        out.append(varname + '=' + ("\n" if indent else ""))
+    _serialize(value, indent, out)
+    return ''.join(out)
+
+
+def dump(value, fp: IO[Any], varname: Optional[str] = None, indent: Optional[int] = None) -> None:
+    """Serializes value like :py:func:`dumps`, but writes it to a file object.
+
+    The output is written in chunks while it is generated, so it is never held in
+    memory as a whole.
+
+    :param value: value to serialize
+    :param fp: text or binary file object, e.g. from ``ZipFile.open(name, "w")``.
+        Binary streams get utf-8.
+    :param varname: assign the value to this variable
+    :param indent: indentation level to start with, None for a single line
+    """
+    binary = isinstance(fp, (io.RawIOBase, io.BufferedIOBase)) or 'b' in str(getattr(fp, 'mode', ''))
+    out: List[str] = []
+
+    def flush() -> None:
+        text = ''.join(out)
+        fp.write(text.encode('utf-8') if binary else text)
+        out.clear()
 
-    return s
+    if varname:
+        out.append(varname + '=' + ("\n" if indent else ""))
+    _serialize(value, indent, out, flush)
+    flush()
@@ -0,0 +1,160 @@
+import hashlib
+import marshal
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple, Union
+
+from dcs.lua.serialize import Deferred, Raw, _Level, _scalar, _serialize
+
+
+# marks values that are not plain lua values in the input of a fingerprint
+_WRITTEN_AS = "\0written as"
+_KEYS = _Level(1, False)
+
+
+def _plain(value: Any) -> Any:
+    """value with everything the serializer writes by its string replaced by that string."""
+    cls = value.__class__
+    if cls is str or cls is int or cls is float or cls is bool or value is None:
+        return value
+    if cls is list:
+        return [_plain(x) for x in value]
+    if cls is dict or isinstance(value, Mapping):
+        return {k if k.__class__ is str or k.__class__ is int else (_WRITTEN_AS, _KEYS.key(k)): _plain(x)
+                for k, x in value.items()}
+    if cls is Raw:
+        return (_WRITTEN_AS, value.text)
+    if cls is Deferred or hasattr(cls, '__lua_emit__'):
+        raise ValueError("values that are built while they are serialized have no fingerprint")
+    return (_WRITTEN_AS, _scalar(value))
+
+
+def fingerprint(value: Any) -> Optional[bytes]:
+    """A hash of a lua value, values that serialize the same with the same key order have the same one.
+
+    :param value: dicts, lists and values :py:func:`dumps` writes
+    :return: the hash, None if value holds a :py:class:`Deferred` value or an object
+        with ``__lua_emit__``
+    """
+    try:
+        # version 2 writes no references, so the result does not depend on which
+        # objects are shared
+        data = marshal.dumps(value, 2)
+    except ValueError:
+        # e.g. enums and the task target types, which are written by their string
+        try:
+            data = marshal.dumps(_plain(value), 2)
+        except ValueError:
+            return None
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class SourceTables:
+    """Source text of the tables of a loaded lua file, to write unchanged parts back as they were.
+
+    Each part is registered with the value the model turned it into right after
+    loading. On save the model passes what it would write now, if that is still
+    the same the source text of the part is written instead, byte for byte. The
+    model does not have to track its changes, an object is unchanged as long as
+    it serializes to the same value.
+
+    Args:
+        source: the parsed lua source, utf-8 if bytes
+    """
+    def __init__(self, source: Union[str, bytes]) -> None:
+        self.source = source
+        self.tables: Dict[Hashable, Tuple[bytes, int, int]] = {}
+
+    def add(self, key: Hashable, span: Optional[Tuple[int, int]], value: Any) -> bool:
+        """Registers the source of a part.
+
+        :param key: identifies the part, e.g. its path in the file
+        :param span: (start, end) of the table in the source, as recorded by
+            ``loads(..., spans=...)``
+        :param value: what the part serializes to after loading
+        :return: if the part was registered, only plain values can be compared
+        """
+        fp = fingerprint(value)
+        if span is None or fp is None:
+            return False
+        self.tables[key] = (fp, span[0], span[1])
+        return True
+
+    def get(self, key: Hashable, value: Any) -> Any:
+        """The source text of a part as :py:class:`Raw` value if value did not change.
+
+        :param key: identifies the part
+        :param value: what the part serializes to now
+        :return: the source text, or value if it changed or the part is not known
+        """
+        entry = self.tables.get(key)
+        if entry is None or fingerprint(value) != entry[0]:
+            return value
+        text = self.source[entry[1]:entry[2]]
+        return Raw(text.decode('utf-8') if isinstance(text, bytes) else text)
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def __repr__(self) -> str:
+        return "SourceTables({} tables)".format(len(self.tables))
+
+
+class FragmentCache:
+    """Serialized lua text of tables, to reuse it when the same table is serialized again.
+
+    Entries are keyed by the :py:func:`fingerprint` of the table and its indentation
+    level, so a table that was changed, or a new object that happens to serialize
+    to the same table, is looked up just the same. Entries that were not used since
+    the last :py:meth:`sweep` are dropped by it, :py:meth:`dcs.mission.Mission.save`
+    sweeps after each save, so the cache holds the parts of the last one.
+    """
+    def __init__(self) -> None:
+        self.fragments: Dict[Tuple[bytes, int], str] = {}
+        self._used: Set[Tuple[bytes, int]] = set()
+        self.hits = 0
+        self.misses = 0
+        # the serializer levels with and without whitespace, they cache the key strings
+        self._levels: Dict[bool, List[_Level]] = {False: [], True: []}
+
+    def get(self, value: Any, indent: Optional[int] = None) -> Any:
+        """The serialized value as :py:class:`Raw` value, serialized now if it is not cached.
+
+        :param value: table to serialize
+        :param indent: indentation level of the table, like for :py:func:`dumps`
+        :return: the serialized value, or value itself if it holds anything but
+            plain values
+        """
+        fp = fingerprint(value) if value.__class__ is not Raw else None
+        if fp is None:
+            return value
+        level = indent if indent else 0
+        key = (fp, level)
+        text = self.fragments.get(key)
+        if text is None:
+            self.misses += 1
+            out: List[str] = []
+            _serialize(value, level, out, levels=self._levels[level > 0])
+            # the serializer indents the opening brace itself
+            text = ''.join(out)
+            self.fragments[key] = text = text[level - 1:] if level else text
+        else:
+            self.hits += 1
+        self._used.add(key)
+        return Raw(text)
+
+    def sweep(self) -> int:
+        """Drops the entries that were not used since the last sweep.
+
+        :return: number of dropped entries
+        """
+        unused = self.fragments.keys() - self._used
+        for key in unused:
+            del self.fragments[key]
+        self._used = set()
+        return len(unused)
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+    def __repr__(self) -> str:
+        return "FragmentCache({} fragments, {} hits, {} misses)".format(len(self.fragments), self.hits, self.misses)
@@ -1,6 +1,12 @@
+import io
+import mmap
+import tempfile
 import textwrap
 import unittest
-from dcs.lua.parse import loads
+from typing import Dict, Tuple
+from dcs.lua.cache import ParseCache
+from dcs.lua.parse import loads, load, iterload, LazyTable, table_dict, table_items, table_values
+from dcs.lua.serialize import dumps
 
 
 class TestLuaParse(unittest.TestCase):
@@ -26,6 +32,22 @@ class TestLuaParse(unittest.TestCase):
         r = loads("dec = 666.6e-10")
         self.assertEqual(r, {"dec": 666.6e-10})
 
+    def test_big_integer(self):
+        r = loads("a = {9007199254740993, [2] = -12345678901234567890}; b = 9007199254740993")
+        self.assertEqual(r, {"a": {1: 9007199254740993, 2: -12345678901234567890}, "b": 9007199254740993})
+
+    def test_hex(self):
+        r = loads("a = {0x1F, -0Xff, 0x1p4, 0xA.8, 0x.8P1}")
+        self.assertEqual(r["a"], {1: 31, 2: -255, 3: 16, 4: 10.5, 5: 1})
+
+        with self.assertRaises(SyntaxError):
+            loads("a = 0x")
+
+    def test_number_values(self):
+        r = loads("a = {1, -2.5, 3e2, .5, -7 , 8.25 ; -1E-2}")
+        self.assertEqual(r["a"], {1: 1, 2: -2.5, 3: 300, 4: 0.5, 5: -7, 6: 8.25, 7: -0.01})
+        self.assertIsInstance(r["a"][3], int)
+
     def test_string(self):
         s = """
 mission =
@@ -118,6 +140,15 @@ o =
             }
             """)
 
+    def test_invalid_statements(self):
+        # expressions, extra values and undefined returns were cut short instead of rejected
+        for luas in ["a = 3-2", "a = 3 -2", "a=1,2", "a = 1,", "a = 1b = 2", "a = {1, 2} 3", "return undefined"]:
+            for lazy in (False, True):
+                with self.assertRaises(SyntaxError, msg=luas):
+                    loads(luas, lazy=lazy)
+        self.assertEqual(loads('a = 1 b = "x"c = {};d = 2\nreturn a'), {"a": 1, "b": "x", "c": {}, "d": 2})
+        self.assertEqual(loads("a, b = 1, 2"), {"a": 1, "b": 2})
+
     def test_object_without_keys(self):
         luas = """
 local unitPayloads = {
@@ -341,6 +372,289 @@ return unitPayloads
         r = loads("num = .1")
         self.assertEqual(r["num"], 0.1)
 
+    def test_syntax_error_line_number(self) -> None:
+        with self.assertRaises(SyntaxError) as cm:
+            loads(textwrap.dedent(
+                """\
+                m = {
+                    ["a"] = 1,
+                    ["b"] 2,
+                }
+                """
+            ))
+        self.assertEqual(cm.exception.lineno, 3)
+
+    def test_comments_inside_table(self) -> None:
+        r = loads(textwrap.dedent(
+            """\
+            t = {
+                [ -- key follows
+                "a" ] = -- value follows
+                    -1, -- end of ["a"]
+                [2] = --[[ block ]] "x";
+            } -- end of t
+            """
+        ))
+        self.assertEqual(r["t"], {"a": -1, 2: "x"})
+
+    def test_escaped_key(self) -> None:
+        r = loads('t = {["a\\"b"] = 1}')
+        self.assertEqual(r["t"], {'a"b': 1})
+
+    def test_multiple_assignment(self) -> None:
+        r = loads("local a, b, c = 1, 'x'\nd = a\na = 3")
+        self.assertEqual(r, {"a": 3, "b": "x", "d": 1})
+
+
+class TestLuaLazyParse(unittest.TestCase):
+    LUAS = textwrap.dedent(
+        """\
+        mission = {
+            ["theatre"] = "Caucasus",
+            ["coalition"] = {
+                ["blue"] = {["country"] = {{["name"] = "USA"}, {["name"] = "UK", ["text"] = "}"}}},
+            }, -- end of ["coalition"]
+            ["triggers"] = {["zones"] = {}},
+        }
+        """
+    )
+
+    def test_lazy_equals_eager(self) -> None:
+        self.assertEqual(loads(self.LUAS, lazy=True), loads(self.LUAS))
+        self.assertEqual(dumps(loads(self.LUAS, lazy=True)["mission"], "mission", 1),
+                         dumps(loads(self.LUAS)["mission"], "mission", 1))
+
+    def test_lazy_parses_on_access(self) -> None:
+        mission = loads(self.LUAS, lazy=True)["mission"]
+        self.assertEqual(mission["theatre"], "Caucasus")
+        coalition = mission["coalition"]
+        self.assertIsInstance(coalition, LazyTable)
+        self.assertFalse(coalition.loaded)
+        self.assertEqual(coalition["blue"]["country"][2]["name"], "UK")
+        self.assertTrue(coalition.loaded)
+        self.assertFalse(mission["triggers"].loaded)
+
+    def test_lazy_defers_syntax_errors(self) -> None:
+        r = loads('t = {["a"] = 1, ["b"] = {["c"] 2}}', lazy=True)
+        self.assertEqual(r["t"]["a"], 1)
+        with self.assertRaises(SyntaxError):
+            r["t"]["b"]["c"]
+
+    def test_lazy_unterminated_table(self) -> None:
+        with self.assertRaises(SyntaxError):
+            loads('t = {["a"] = {1, "}"}', lazy=True)
+
+
+class TestLuaStreamParse(unittest.TestCase):
+    LUAS = textwrap.dedent(
+        """\
+        local a, b = 1, "x" -- end of locals
+        mission =
+        {
+            ["coalition"] =
+            {
+                ["blue"] = {
+                    [1] = {["name"] = "USA", ["units"] = {"a", "b;}"}},
+                    [2] = {["name"] = "UK", ["id"] = a},
+                }, -- end of ["blue"]
+                ["red"] = {--[[ nothing { here ]]},
+            },
+            ["date"] = {["Year"] = 2011},
+            ["text"] = "{ not a table \\\" }",
+        } -- end of mission
+        """
+    )
+
+    def test_load_matches_loads(self) -> None:
+        ref = loads(self.LUAS)
+        for chunk_size in (1, 2, 3, 7, 64, 1 << 16):
+            self.assertEqual(load(io.BytesIO(self.LUAS.encode()), chunk_size=chunk_size), ref)
+            self.assertEqual(load(io.StringIO(self.LUAS), chunk_size=chunk_size), ref)
+
+    def test_load_tokens_across_chunks(self) -> None:
+        # every chunk size cuts the number, the strings and the keywords somewhere
+        luas = 'n = 1.5e-05\ns = "say \\"hi\\""\nt = true\nm = {["x"] = 1.5e-05, ["y"] = "a b", ["z"] = false, 12.25}\n'
+        ref = loads(luas)
+        self.assertEqual(ref["n"], 1.5e-05)
+        for chunk_size in range(1, len(luas) + 2):
+            self.assertEqual(load(io.BytesIO(luas.encode()), chunk_size=chunk_size), ref, chunk_size)
+            self.assertEqual(list(iterload(io.StringIO(luas), ("m",), chunk_size=chunk_size)),
+                             list(ref["m"].items()), chunk_size)
+
+    def test_iterload_top_level(self) -> None:
+        r = list(iterload(io.BytesIO(self.LUAS.encode()), chunk_size=5))
+        self.assertEqual([k for k, _ in r], ["a", "b", "mission"])
+        self.assertEqual(r[2][1]["date"], {"Year": 2011})
+
+    def test_iterload_path(self) -> None:
+        r = list(iterload(io.BytesIO(self.LUAS.encode()), ("mission", "coalition", "blue"), chunk_size=3))
+        self.assertEqual(r, [(1, {"name": "USA", "units": {1: "a", 2: "b;}"}}), (2, {"name": "UK", "id": 1})])
+
+        r = list(iterload(io.BytesIO(self.LUAS.encode()), ("mission", "missing")))
+        self.assertEqual(r, [])
+
+    def test_load_multibyte_characters(self) -> None:
+        luas = 'name = "Überflug ✈"'
+        self.assertEqual(load(io.BytesIO(luas.encode()), chunk_size=1), {"name": "Überflug ✈"})
+
+    def test_load_error_position(self) -> None:
+        with self.assertRaises(SyntaxError) as cm:
+            load(io.BytesIO(b'm = {\n["a"] = 1,\n["b"] 2,\n}'), chunk_size=4)
+        self.assertEqual(cm.exception.lineno, 3)
+
+    def test_load_unexpected_end(self) -> None:
+        with self.assertRaises(SyntaxError):
+            load(io.BytesIO(b'm = {["a"] = {1, 2}'), chunk_size=4)
+
+    def test_load_invalid_statements(self) -> None:
+        for luas in [b"a = 3-2", b"a=1,2", b"a = 1b = 2", b"return undefined"]:
+            for chunk_size in range(1, len(luas) + 1):
+                with self.assertRaises(SyntaxError, msg=luas):
+                    load(io.BytesIO(luas), chunk_size=chunk_size)
+
+
+class TestLuaCompactParse(unittest.TestCase):
+
+    def test_sequences(self) -> None:
+        luas = 'm = {[1] = {["x"] = 1}, [2] = {"a", "b"}, [3] = {}, [4] = {[2] = 1, [1] = 2}, [5] = {1, ["n"] = 2}}'
+        r = loads(luas, compact=True)["m"]
+        self.assertEqual(r, [{"x": 1}, ["a", "b"], {}, {2: 1, 1: 2}, {1: 1, "n": 2}])
+        self.assertEqual(dumps(r, "m", 1), dumps(loads(luas)["m"], "m", 1))
+
+        for chunk_size in (1, 7, 1 << 16):
+            self.assertEqual(load(io.StringIO(luas), compact=True, chunk_size=chunk_size)["m"], r)
+        self.assertEqual(list(iterload(io.StringIO(luas), ("m", 2), compact=True)), [(1, "a"), (2, "b")])
+
+    def test_interned_keys(self) -> None:
+        r = loads('m = {{["alt"] = 1}, {["alt"] = 2}}', compact=True)["m"]
+        k1, k2 = (next(iter(x)) for x in r)
+        self.assertIs(k1, k2)
+
+    def test_lazy(self) -> None:
+        with self.assertRaises(ValueError):
+            loads("a = {}", lazy=True, compact=True)
+
+    def test_table_helpers(self) -> None:
+        for table in ([5, 6], {1: 5, 2: 6}):
+            self.assertEqual(list(table_items(table)), [(1, 5), (2, 6)])
+            self.assertEqual(list(table_values(table)), [5, 6])
+        self.assertEqual(list(table_values({2: "b", 1: "a"}, sort=True)), ["a", "b"])
+        self.assertEqual(table_dict([{"a": [1]}, 2]), {1: {"a": {1: 1}}, 2: 2})
+
+
+class TestLuaBytesParse(unittest.TestCase):
+
+    luas = 'm = {["Übung"] = "Привет", [2] = _("日本"), ["n"] = {"a\\"ä"}} -- ü'
+
+    def test_bytes(self) -> None:
+        data = self.luas.encode("utf-8")
+        expected = loads(self.luas)
+        self.assertEqual(loads(data), expected)
+        self.assertEqual(loads(memoryview(data)), expected)
+        self.assertEqual(loads(bytearray(data), compact=True), loads(self.luas, compact=True))
+        self.assertEqual(dict(loads(data, lazy=True)["m"]), expected["m"])
+
+    def test_mmap(self) -> None:
+        with tempfile.TemporaryFile() as f:
+            f.write(self.luas.encode("utf-8"))
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self.assertEqual(loads(data), loads(self.luas))
+
+    def test_error_offset(self) -> None:
+        with self.assertRaises(SyntaxError) as cm:
+            loads('m = {"ä" 1}'.encode("utf-8"))
+        self.assertEqual(cm.exception.offset, 10)
+
+
+class TestLuaSpans(unittest.TestCase):
+
+    def test_spans(self) -> None:
+        luas = 'm = {["a"] = {1, {"ä"}}, ["b"] = { },\n["c"] = 3}'
+        for source in [luas, luas.encode("utf-8")]:
+            spans: Dict[int, Tuple[int, int]] = {}
+            r = loads(source, spans=spans)
+            self.assertEqual(r, loads(luas))
+            for table, text in [(r["m"], luas[4:]), (r["m"]["a"], '{1, {"ä"}}'), (r["m"]["a"][2], '{"ä"}'),
+                                (r["m"]["b"], '{ }')]:
+                start, end = spans[id(table)]
+                self.assertEqual(source[start:end], text if isinstance(source, str) else text.encode("utf-8"))
+
+    def test_spans_lazy(self) -> None:
+        with self.assertRaises(ValueError):
+            loads("m = {}", spans={}, lazy=True)
+
+
+class TestLuaParallelParse(unittest.TestCase):
+
+    def setUp(self) -> None:
+        entries = ",".join('{["a"] = %d, ["b"] = "x%d", ["c"] = {1, 2, 3}}' % (i, i) for i in range(10000))
+        self.luas = 'v = 5\nm = {["units"] = {' + entries + '}, ["v"] = {v}, ["n"] = 1}\n'
+
+    def test_workers(self) -> None:
+        for compact in (False, True):
+            self.assertEqual(loads(self.luas, workers=2, compact=compact), loads(self.luas, compact=compact))
+
+    def test_syntax_error(self) -> None:
+        head, _, tail = self.luas.rpartition('{1, 2, 3}')
+        luas = head + '{1 2}' + tail
+        with self.assertRaises(SyntaxError) as serial:
+            loads(luas)
+        with self.assertRaises(SyntaxError) as parallel:
+            loads(luas, workers=2)
+        self.assertEqual(parallel.exception.offset, serial.exception.offset)
+
+    def test_lazy(self) -> None:
+        with self.assertRaises(ValueError):
+            loads(self.luas, lazy=True, workers=2)
+
+
+class TestLuaParseCache(unittest.TestCase):
+
+    LUAS = 'mission = {["date"] = {["Year"] = 2011}, [1] = {1.5, true, "x"}}\nversion = 3'
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_hit(self) -> None:
+        cache = ParseCache(self.tmpdir.name)
+        r = cache.loads(self.LUAS)
+        self.assertEqual(r, loads(self.LUAS))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        cache = ParseCache(self.tmpdir.name)
+        self.assertEqual(cache.loads(self.LUAS.encode()), r)
+        self.assertEqual(cache.load(io.StringIO(self.LUAS)), r)
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+    def test_key(self) -> None:
+        cache = ParseCache(self.tmpdir.name)
+        self.assertEqual(cache.loads("a = b", _globals={"b": 1}), {"a": 1, "b": 1})
+        self.assertEqual(cache.loads("a = b", _globals={"b": 2}), {"a": 2, "b": 2})
+        self.assertEqual(cache.loads("a = 3"), {"a": 3})
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+        self.assertEqual(len(cache.entries()), 3)
+
+    def test_corrupt_entry(self) -> None:
+        cache = ParseCache(self.tmpdir.name)
+        cache.loads(self.LUAS)
+        cache.entries()[0].write_bytes(b"\xff")
+        self.assertEqual(cache.loads(self.LUAS), loads(self.LUAS))
+        self.assertEqual(cache.misses, 2)
+
+    def test_eviction(self) -> None:
+        cache = ParseCache(self.tmpdir.name, max_size=40)
+        for i in range(10):
+            cache.loads("a = {}".format(i))
+        self.assertLessEqual(cache.size(), 40)
+        self.assertLess(len(cache.entries()), 10)
+        self.assertEqual(cache.loads("a = 9"), {"a": 9})
+        self.assertEqual(cache.hits, 1)
+
+        cache.clear()
+        self.assertEqual(cache.entries(), [])
+
 
 if __name__ == '__main__':
     unittest.main()
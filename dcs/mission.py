@@ -1,18 +1,26 @@
 """
 The mission module is the entry point to all pydcs functions.
 """
+import contextlib
 import copy
+import gc
 import itertools
 import os
+import pickle
+import struct
 import sys
 import tempfile
+import time
+import uuid
 import zipfile
 import random
+import shutil
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from enum import Enum
 from pathlib import Path
-from typing import Any, List, Dict, Sequence, Union, Optional, Type
+from typing import Any, Callable, Iterable, List, Dict, Pattern, Sequence, Tuple, Union, Optional, Type
 
 from dcs.coalition import Coalition
 from dcs.drawing.drawings import Drawings
@@ -22,6 +30,7 @@ import dcs.countries as countries
 import dcs.helicopters as helicopters
 import dcs.lua as lua
 import dcs.mapping as mapping
+import dcs.miz as miz
 import dcs.planes as planes
 import dcs.task as task
 import dcs.unitgroup as unitgroup
@@ -36,6 +45,8 @@ from dcs.country import Country
 from dcs.forcedoptions import ForcedOptions
 from dcs.goals import Goals
 from dcs.groundcontrol import GroundControl
+from dcs.ids import IdAllocator
+from dcs.registry import Registry
 from dcs.point import StaticPoint, MovingPoint, PointAction, PointProperties
 from dcs.translation import Translation, String, ResourceKey
 from dcs.unit import Unit, Ship, Vehicle, Static
@@ -98,14 +109,35 @@ class Mission:
     _COUNTRY_IDS = {x for x in range(0, 13)} | {x for x in range(15, 47)}
 
     _CURRENT_MIZ_VERSION: int = 20  # on save this version number will be written
+    # lua entries of a .miz bigger than this many bytes are parsed in multiple processes
+    PARALLEL_PARSE_SIZE: int = 8 << 20
+
+    # snapshot files start with the magic and the format version, which changes
+    # whenever the object model does
+    _SNAPSHOT_MAGIC = b"pydcs-snapshot\0"
+    SNAPSHOT_VERSION: int = 10
+
+    _GROUP_CATEGORIES = ("vehicle", "ship", "plane", "helicopter", "static")
+
+    # the parts load_file() can leave out
+    SECTIONS = ("options", "warehouses", "coalitions", "triggers", "goals", "drawings", "weather")
+    # the mission table entries kept as they are for a section that is not loaded
+    _SECTION_KEYS = {
+        "coalitions": ("coalition", "coalitions"),
+        "goals": ("goals", "result"),
+        "drawings": ("drawings",),
+        "weather": ("weather",),
+    }
 
     def __init__(self, terrain: Optional[Terrain] = None) -> None:
         if terrain is None:
             terrain = terrain_.Caucasus()
 
-        self.current_unit_id = 0
-        self.current_group_id = 0
-        self.current_dict_id = 0
+        self.unit_ids = IdAllocator()
+        self.group_ids = IdAllocator()
+        self.dict_ids = IdAllocator()
+        # the EPLRS numbers of each group type and the group lists they were taken from
+        self._eplrs: Dict[str, Tuple[IdAllocator, Dict[int, int], List[_EplrsScan]]] = {}
         self.filename: Optional[str] = None
         self.tmpdir: Optional[str] = None
 
@@ -130,6 +162,16 @@ class Mission:
         self.bypassed_triggers = None
         self.bypassed_trigrules = None
         self.bypassed_trig = None
+        # mission table entries and .miz files of sections that were not loaded
+        self.bypassed_sections: Dict[str, Any] = {}
+        self.bypassed_files: Dict[str, bytes] = {}
+        # source of the mission table parts, see load_file(keep_source=True)
+        self.source_tables: Optional[lua.SourceTables] = None
+        self.fragment_cache: Optional[lua.FragmentCache] = None
+        """Set to a :py:class:`dcs.lua.FragmentCache` to reuse the lua text of unchanged
+        groups, trigger rules and drawing layers on the next save"""
+        self.registry = Registry()
+        """The groups and units of the coalitions by ID and name, built on the first lookup"""
         self.init_script_file = None
         self.init_script = None
         self.options = Options()
@@ -223,48 +265,108 @@ class Mission:
 
         self.aircraft_kneeboards: Dict[Type[unittype.FlyingType], List[Path]] = defaultdict(list)
 
-    def load_file(self, filename: str, bypass_triggers: bool = False) -> List[StatusMessage]:
+    def load_file(self, filename: str, bypass_triggers: bool = False,
+                  parse_cache: Optional[lua.ParseCache] = None, compact: bool = False,
+                  workers: Optional[int] = None, sections: Optional[Iterable[str]] = None,
+                  keep_source: bool = False) -> List[StatusMessage]:
         """
         Load a mission file (.miz) file, replacing all current data.
 
+        Parts that are not needed can be left out with ``sections``, the mission
+        then keeps them as they are and writes them back on save. Changes to the
+        objects of a section that was not loaded are not saved.
+
         :param filename: path to the mission(.miz) file.
         :param bypass_triggers: do not parse triggers, if a mission is loaded this way
             the same triggers will be exported on save.
+        :param parse_cache: reuse the parsed lua entries of unchanged files from this cache
+        :param compact: parse the lua entries in compact mode, see :py:func:`dcs.lua.loads`.
+            Lowers the peak memory use, data kept unparsed like failures or bypassed
+            triggers then holds lists for lua sequences.
+        :param workers: number of processes parsing lua entries bigger than
+            :py:attr:`PARALLEL_PARSE_SIZE`, all cpus by default, 1 to never parse in parallel
+        :param sections: the parts of :py:attr:`SECTIONS` to load, all by default.
+            The dictionary, map resources and base values like the description are
+            always loaded. Trigger actions refer to groups, so triggers load the
+            coalitions as well.
+        :param keep_source: keep the source text of the groups and the other mission
+            table entries, on save the ones that did not change are written as they
+            were loaded, see :py:attr:`source_tables`. Ignores parse_cache and workers
+            for the mission entry. Missions older than version 19 are always written
+            from the model.
         :return: List of LoadStatus objects, might be empty if everything was fine
         :raises RuntimeError: if an unknown value is encountered
-        """
+        :raises ValueError: for an unknown section
+        """
+        load = set(self.SECTIONS if sections is None else sections)
+        unknown = load.difference(self.SECTIONS)
+        if unknown:
+            raise ValueError("Unknown sections: {}".format(", ".join(sorted(unknown))))
+        if "triggers" in load:
+            load.add("coalitions")
+        if bypass_triggers:
+            load.discard("triggers")
+
         self.filename = filename
-        self.current_unit_id = 0
-        self.current_group_id = 0
-        self.current_dict_id = 0
-        self.tmpdir = tempfile.mkdtemp()
+        self.unit_ids.clear()
+        self.group_ids.clear()
+        self.dict_ids.clear()
+        self._eplrs = {}
+        # created by MapResource.extract_dir when the first file is extracted
+        self.tmpdir = os.path.join(tempfile.gettempdir(), "tmp" + uuid.uuid4().hex)
+        self.bypassed_sections = {}
+        self.bypassed_files = {}
+        self.source_tables = None
+        source = b""
+        spans: Dict[int, Tuple[int, int]] = {}
         status = []
 
-        def loaddict(fname: str, mizfile: zipfile.ZipFile, reserved_files: List[str]) -> Dict[str, Any]:
+        def loaddict(fname: str, mizfile: miz.MappedZipFile, reserved_files: List[str]) -> Dict[str, Any]:
+            nonlocal source
             reserved_files.append(fname)
+            if fname == 'mission' and keep_source:
+                source = mizfile.read(fname)
+                return lua.loads(source, compact=compact, spans=spans)
+            if parse_cache is not None:
+                with mizfile.view(fname) as data:
+                    return parse_cache.loads(data, compact=compact)
+            if fname == 'mission' and "coalitions" not in load and not compact:
+                # the coalitions are the bulk of a mission, without them most of
+                # the tables are only skipped over
+                with mizfile.view(fname) as data:
+                    return lua.loads(data, lazy=True)
+            if workers != 1 and mizfile.getinfo(fname).file_size > self.PARALLEL_PARSE_SIZE:
+                with mizfile.view(fname) as data:
+                    return lua.loads(data, compact=compact, workers=workers or os.cpu_count())
             with mizfile.open(fname) as mfile:
-                data = mfile.read().decode()
-                return lua.loads(data)
+                return lua.load(mfile, compact=compact)
 
-        with zipfile.ZipFile(filename, 'r') as miz:
+        with miz.MappedZipFile(filename) as mizf:
             reserved_files: List[str] = []
-            mission_dict = loaddict('mission', miz, reserved_files)
+            mission_dict = loaddict('mission', mizf, reserved_files)
 
             if mission_dict["mission"]["version"] < 16:
                 msg = "Mission file is using an old format, be aware!"
                 print(msg, file=sys.stderr)
                 status.append(StatusMessage(msg, MessageType.MISSION_FORMAT_OLD, MessageSeverity.WARN))
-            options_dict = loaddict('options', miz, reserved_files)
-            warehouse_dict = loaddict('warehouses', miz, reserved_files)
-            dictionary_dict = loaddict('l10n/DEFAULT/dictionary', miz, reserved_files)
+            for fname in ['options', 'warehouses']:
+                if fname not in load:
+                    reserved_files.append(fname)
+                    self.bypassed_files[fname] = mizf.read(fname)
+            options_dict = loaddict('options', mizf, reserved_files) if "options" in load else None
+            warehouse_dict = loaddict('warehouses', mizf, reserved_files) if "warehouses" in load else None
+            dictionary_dict = loaddict('l10n/DEFAULT/dictionary', mizf, reserved_files)
 
-            if 'l10n/DEFAULT/mapResource' in miz.namelist():
-                mapresource_dict = loaddict('l10n/DEFAULT/mapResource', miz, reserved_files)
-                self.map_resource.load_from_dict(mapresource_dict, miz)
+            if 'l10n/DEFAULT/mapResource' in mizf.namelist():
+                mapresource_dict = loaddict('l10n/DEFAULT/mapResource', mizf, reserved_files)
+                self.map_resource.load_from_dict(mapresource_dict, mizf)
 
-            self.map_resource.load_binary_files(miz, reserved_files)
+            self.map_resource.load_binary_files(mizf, reserved_files)
 
         imp_mission = mission_dict["mission"]
+        if imp_mission["version"] < 19:
+            # group and unit names of older missions are dictionary keys, saving converts them
+            load.add("coalitions")
 
         # required modules
         self.required_modules = imp_mission.get("requiredModules", {})
@@ -303,24 +405,28 @@ class Mission:
 
         # import options
         self.options = Options()
-        self.options.load_from_dict(options_dict["options"])
+        if options_dict is not None:
+            self.options.load_from_dict(options_dict["options"])
 
         # import warehouses
         self.warehouses = Warehouses(self.terrain)
-        self.warehouses.load_dict(warehouse_dict["warehouses"])
+        if warehouse_dict is not None:
+            self.warehouses.load_dict(warehouse_dict["warehouses"])
+
+        # sections that are not loaded are saved as they are
+        for section, keys in self._SECTION_KEYS.items():
+            if section not in load:
+                self.bypassed_sections.update((key, imp_mission[key]) for key in keys if key in imp_mission)
 
         # import base values
         self._description_text = self.translation.get_string(imp_mission["descriptionText"])
         self._description_bluetask = self.translation.get_string(imp_mission["descriptionBlueTask"])
         self._description_redtask = self.translation.get_string(imp_mission["descriptionRedTask"])
         self._sortie = self.translation.get_string(imp_mission["sortie"])
-        for pic in sorted(imp_mission["pictureFileNameR"]):
-            self.pictureFileNameR.append(imp_mission["pictureFileNameR"][pic])
-        for pic in sorted(imp_mission["pictureFileNameB"]):
-            self.pictureFileNameB.append(imp_mission["pictureFileNameB"][pic])
+        self.pictureFileNameR.extend(lua.table_values(imp_mission["pictureFileNameR"], sort=True))
+        self.pictureFileNameB.extend(lua.table_values(imp_mission["pictureFileNameB"], sort=True))
         if "pictureFileNameN" in imp_mission:
-            for pic in sorted(imp_mission["pictureFileNameN"]):
-                self.pictureFileNameN.append(imp_mission["pictureFileNameN"][pic])
+            self.pictureFileNameN.extend(lua.table_values(imp_mission["pictureFileNameN"], sort=True))
         self.version = imp_mission["version"]
         self.currentKey = imp_mission["currentKey"]
         imp_date = imp_mission.get("date", {"Year": 2011, "Month": 6, "Day": 1})
@@ -346,10 +452,11 @@ class Mission:
 
         # goals
         self.goals = Goals()
-        self.goals.load_from_dict(imp_mission["goals"], self)
+        if "goals" in load:
+            self.goals.load_from_dict(imp_mission["goals"], self)
 
         self.drawings = Drawings(self.terrain)
-        if imp_mission.get("drawings") is not None:
+        if "drawings" in load and imp_mission.get("drawings") is not None:
             self.drawings.load_from_dict(imp_mission["drawings"])
 
         self.init_script_file = imp_mission.get("initScriptFile")
@@ -357,7 +464,7 @@ class Mission:
 
         # import coalition with countries and units
         for col_name in ["blue", "red", "neutrals"]:
-            if col_name in imp_mission["coalition"]:
+            if "coalitions" in load and col_name in imp_mission["coalition"]:
                 self.coalition[col_name] = Coalition(col_name, imp_mission["coalition"][col_name]["bullseye"])
                 status += self.coalition[col_name].load_from_dict(
                     self,
@@ -372,12 +479,12 @@ class Mission:
         self.bypassed_trig = None
         self.triggers = Triggers(self.terrain)
         self.triggerrules = triggers.Rules()
-        if bypass_triggers:
+        if "triggers" not in load:
             self.bypassed_triggers = imp_mission["triggers"]
             self.bypassed_trigrules = imp_mission["trigrules"]
             self.bypassed_trig = imp_mission["trig"]
         else:
-            self.triggers.load_from_dict(imp_mission["triggers"])
+            status += self.triggers.load_from_dict(imp_mission["triggers"])
             # this will import trigrules and trig
             self.triggerrules.load_from_dict(self, imp_mission["trigrules"])
 
@@ -388,16 +495,123 @@ class Mission:
         self.forced_options.load_from_dict(imp_mission["forcedOptions"])
 
         # map
+        self.map = self.terrain.map_view_default
         self.map.load_from_dict(imp_mission["map"])
 
         # weather
         self.random_weather = False
         imp_weather = imp_mission["weather"]
         self.weather = weather.Weather(self.terrain)
-        self.weather.load_from_dict(imp_weather)
+        if "weather" in load:
+            self.weather.load_from_dict(imp_weather)
+
+        if keep_source and imp_mission["version"] >= 19:
+            self.source_tables = self._source_tables(source, spans, imp_mission)
 
         return status
 
+    def _source_tables(self, source: bytes, spans: Dict[int, Tuple[int, int]],
+                       imp_mission: Dict[str, Any]) -> lua.SourceTables:
+        """Registers the source of the groups and the other mission table entries right after loading."""
+        tables = lua.SourceTables(source)
+        m = self.dict()
+        for key, value in m.items():
+            if key != "coalition" and key in imp_mission:
+                tables.add(key, spans.get(id(imp_mission[key])), value)
+
+        imp_groups = {}
+        for imp_coalition in lua.table_values(imp_mission["coalition"]):
+            for imp_country in lua.table_values(imp_coalition.get("country", {})):
+                for category in self._GROUP_CATEGORIES:
+                    if category in imp_country:
+                        for imp_group in lua.table_values(imp_country[category]["group"]):
+                            imp_groups[imp_group["groupId"]] = imp_group
+        for coalition in m["coalition"].values():
+            for country in coalition["country"].values():
+                for category in self._GROUP_CATEGORIES:
+                    for group in country.get(category, {}).get("group", {}).values():
+                        imp_group = imp_groups.get(group["groupId"])
+                        if imp_group is not None:
+                            tables.add(("group", group["groupId"]), spans.get(id(imp_group)), group)
+        return tables
+
+    def _save_table(self, indent: Optional[int]) -> Dict[str, Any]:
+        """The mission table as it is written, the countries are only built while they are written.
+
+        Unlike :py:meth:`dict` it holds :py:class:`dcs.lua.Raw` source text for the unchanged
+        parts of a mission loaded with keep_source and cached text with a fragment cache.
+        """
+        mission = self.dict(deferred=True)
+        if self.source_tables is not None:
+            # parts that did not change since loading are written as they were
+            self._with_source(mission)
+        if self.fragment_cache is not None:
+            self._with_fragments(mission, indent)
+        return mission
+
+    def _with_source(self, m: Dict[str, Any]) -> None:
+        """Replaces the parts of the mission table that did not change since loading with their source."""
+        source_tables = self.source_tables
+        assert source_tables is not None
+
+        def group_with_source(group: Dict[str, Any]) -> Any:
+            return source_tables.get(("group", group["groupId"]), group)
+
+        for key, value in m.items():
+            m[key] = source_tables.get(key, value)
+        self._map_groups(m, group_with_source)
+
+    def _with_fragments(self, m: Dict[str, Any], indent: Optional[int]) -> None:
+        """Replaces the groups, trigger rules and drawing layers of the mission table with cached lua text."""
+        cache = self.fragment_cache
+        assert cache is not None
+
+        def cached(value: Any, depth: int) -> Any:
+            # depth of the table below the mission table, the text is indented for it
+            return cache.get(value, indent + depth if indent else None)
+
+        def cached_group(group: Dict[str, Any]) -> Any:
+            return cached(group, 7)
+
+        if m["trigrules"].__class__ is dict:
+            m["trigrules"] = {i: cached(rule, 2) for i, rule in m["trigrules"].items()}
+        drawings = m["drawings"]
+        if drawings.__class__ is dict and drawings.get("layers").__class__ is dict:
+            m["drawings"] = dict(drawings, layers={i: cached(layer, 3) for i, layer in drawings["layers"].items()})
+        self._map_groups(m, cached_group)
+
+    def _map_groups(self, m: Dict[str, Any], func: Callable[[Dict[str, Any]], Any]) -> None:
+        """Replaces the groups of the mission table with what func returns for them.
+
+        func needs the table of a group, so the countries are built with all their group
+        tables when the serializer reaches them. The tables of bypassed sections are kept,
+        so they are copied instead of modified.
+        """
+        def country_groups(country: Dict[str, Any]) -> Dict[str, Any]:
+            country = dict(country)
+            for category in self._GROUP_CATEGORIES:
+                if category in country:
+                    groups = {i: group if group.__class__ is lua.Raw else func(group)
+                              for i, group in lua.table_items(country[category]["group"])}
+                    country[category] = dict(country[category], group=groups)
+            return country
+
+        def deferred_groups(build: Callable[[], Dict[str, Any]]) -> lua.Deferred:
+            return lua.Deferred(lambda: country_groups(build()))
+
+        coalitions = {}
+        for name, coalition in m["coalition"].items():
+            countries: Dict[int, Any] = {}
+            for i, country in lua.table_items(coalition.get("country", {})):
+                if isinstance(country, Country):
+                    countries[i] = deferred_groups(country.dict)
+                elif country.__class__ is lua.Deferred:
+                    countries[i] = deferred_groups(country.build)
+                else:
+                    countries[i] = country_groups(country)
+            coalitions[name] = dict(coalition, country=countries)
+        m["coalition"] = coalitions
+
     def sortie_text(self) -> str:
         """Returns the mission sortie text.
 
@@ -501,14 +715,40 @@ class Mission:
         self.pictureFileNameN.append(reskey)
         return reskey
 
+    @property
+    def current_unit_id(self) -> int:
+        """The highest unit id used so far, see :py:attr:`unit_ids`."""
+        return self.unit_ids.current
+
+    @current_unit_id.setter
+    def current_unit_id(self, value: int) -> None:
+        self.unit_ids.current = value
+
+    @property
+    def current_group_id(self) -> int:
+        """The highest group id used so far, see :py:attr:`group_ids`."""
+        return self.group_ids.current
+
+    @current_group_id.setter
+    def current_group_id(self, value: int) -> None:
+        self.group_ids.current = value
+
+    @property
+    def current_dict_id(self) -> int:
+        """The highest dictionary id used so far, see :py:attr:`dict_ids`."""
+        return self.dict_ids.current
+
+    @current_dict_id.setter
+    def current_dict_id(self, value: int) -> None:
+        self.dict_ids.current = value
+
     def next_group_id(self):
         """Get the next free group id
 
         Returns:
             a new group id
         """
-        self.current_group_id += 1
-        return self.current_group_id
+        return self.group_ids.next()
 
     def next_unit_id(self) -> int:
         """Get the next free unit id
@@ -516,8 +756,7 @@ class Mission:
         Returns:
             a new unit id
         """
-        self.current_unit_id += 1
-        return self.current_unit_id
+        return self.unit_ids.next()
 
     def next_dict_id(self):
         """Get the next free dictionary id
@@ -525,8 +764,7 @@ class Mission:
         Returns:
             a new dictionary id
         """
-        self.current_dict_id += 1
-        return self.current_dict_id
+        return self.dict_ids.next()
 
     def eplrs_for(self, group: str) -> Dict[int, int]:
         """Searches all vehicle eplrs using groups and writes them in a mapping
@@ -538,21 +776,58 @@ class Mission:
             a dict mapping groups to used eplrs id
         """
         eplrs_map = {}
+        for search_group in self._eplrs_group_lists(group):
+            for grp in search_group:
+                if grp.points:
+                    eplrs = grp.points[0].find_task(task.EPLRS)
+                    if eplrs:
+                        eplrs_map[grp.id] = eplrs.eplrs
+        return eplrs_map
+
+    def _eplrs_group_lists(self, group: str) -> List[Sequence[unitgroup.Group]]:
+        lists: List[Sequence[unitgroup.Group]] = []
         for col in self.coalition:
-            for c_name, country in self.coalition[col].countries.items():
-                search_group: Sequence[unitgroup.Group] = []
+            for country in self.coalition[col].countries.values():
                 if group == "helicopter":
-                    search_group = country.helicopter_group
+                    lists.append(country.helicopter_group)
                 elif group == "plane":
-                    search_group = country.plane_group
+                    lists.append(country.plane_group)
                 elif group == "vehicle":
-                    search_group = country.vehicle_group
-                for grp in search_group:
-                    if grp.points:
-                        eplrs = grp.points[0].find_task(task.EPLRS)
-                        if eplrs:
-                            eplrs_map[grp.id] = eplrs.eplrs
-        return eplrs_map
+                    lists.append(country.vehicle_group)
+        return lists
+
+    def eplrs_ids(self, group_type: str) -> IdAllocator:
+        """The EPLRS numbers used by the groups of a type.
+
+        Groups appended to the group lists since the last call are looked at,
+        if groups were removed all groups of the list are looked at again. Groups
+        looked at before are looked at again if their first waypoint got or lost
+        tasks, or if they got their first waypoint. The number of a group is
+        released when no group uses it anymore, after the group or its EPLRS
+        task was removed.
+
+        Args:
+            group_type: one of "vehicle", "helicopter" or "plane"
+
+        Returns:
+            the allocator of the group type, it also holds the numbers handed
+            out for groups that were not added yet. These stay used until a
+            group with the number is added and removed again, a number that
+            won't be used after all can be released from the allocator.
+        """
+        group_lists = self._eplrs_group_lists(group_type)
+        allocator, users, seen = self._eplrs.get(group_type) or (IdAllocator(lowest=True), {}, [])
+        if len(seen) != len(group_lists) or any(scan.groups is not groups for scan, groups in zip(seen, group_lists)):
+            # countries or group lists were replaced, the scans of lists that are gone are dropped
+            scans = {id(scan.groups): scan for scan in seen}
+            seen = [scans.pop(id(groups)) if id(groups) in scans else _EplrsScan(groups, allocator, users)
+                    for groups in group_lists]
+            for scan in scans.values():
+                scan.forget()
+        for scan in seen:
+            scan.update()
+        self._eplrs[group_type] = (allocator, users, seen)
+        return allocator
 
     def next_eplrs(self, group_type: str) -> int:
         """Get next eplrs for the given group type.
@@ -561,15 +836,9 @@ class Mission:
             group_type: one of "vehicle", "helicopter" or "plane"
 
         Returns:
-            int: the next eplrs id to use
+            int: the lowest eplrs id no group of the type uses
         """
-        eplrs_usage = self.eplrs_for(group_type)
-        eplrs_id = 1
-        for ep_id in [eplrs_usage[x] for x in eplrs_usage]:
-            if ep_id != eplrs_id:
-                return eplrs_id
-            eplrs_id += 1
-        return eplrs_id
+        return self.eplrs_ids(group_type).next()
 
     def string(self, s: str, lang: str = 'DEFAULT') -> String:
         """Create a new String() object for translation
@@ -627,6 +896,49 @@ class Mission:
         country.add_static_group(sg)
         return sg
 
+    def add_static_groups(self, country, names: Sequence[str],
+                          types: Union[Type[unittype.UnitType], Sequence[Type[unittype.UnitType]]],
+                          positions: Sequence[mapping.Point],
+                          headings: Union[float, Sequence[float]] = 0,
+                          hidden=False, dead=False) -> List[unitgroup.StaticGroup]:
+        """Adds many static groups at once, each like :py:meth:`static_group` would.
+
+        The arguments are columns, the values at the same index make a group.
+        IDs for all groups and objects are reserved at once.
+
+        Args:
+            country(Country): the objects belong too
+            names: names of the groups
+            types: what kind of object for each group, or one type for all
+            positions: where to place the objects
+            headings: heading of each object, or one heading for all
+            hidden: should the objects be hidden on the map
+            dead: should the objects be rendered as dead
+
+        Returns:
+            List[StaticGroup]: the new static groups, in the order of names
+        """
+        count = len(names)
+        types = self._column(types, count, "types")
+        positions = self._column(positions, count, "positions")
+        headings = self._column(headings, count, "headings")
+        group_ids = self.group_ids.reserve(count)
+        unit_ids = self.unit_ids.reserve(count)
+        terrain = self.terrain
+        groups: List[unitgroup.StaticGroup] = []
+        for i, name in enumerate(names):
+            sg = unitgroup.StaticGroup(group_ids[i], name)
+            s = Static(unit_ids[i], name + " object", types[i], terrain)
+            s.position = mapping.Point(positions[i].x, positions[i].y, terrain)
+            s.heading = headings[i]
+            sg.add_unit(s)
+            sg.hidden = hidden
+            sg.dead = dead
+            sg.add_point(StaticPoint(s.position))
+            country.add_static_group(sg)
+            groups.append(sg)
+        return groups
+
     def farp(self,
              country,
              name: str,
@@ -812,6 +1124,74 @@ class Mission:
                                                 position, heading, formation,
                                                 move_formation)
 
+    @staticmethod
+    def _column(values: Any, count: int, label: str) -> Sequence[Any]:
+        """values for count groups, a single value is used for all of them."""
+        if not isinstance(values, Sequence) or isinstance(values, str):
+            return [values] * count
+        if len(values) != count:
+            raise ValueError("{} has {} values for {} groups".format(label, len(values), count))
+        return values
+
+    def add_vehicle_groups(self, country, names: Sequence[str],
+                           types: Union[Type[unittype.VehicleType], Sequence[Type[unittype.VehicleType]]],
+                           positions: Sequence[mapping.Point],
+                           headings: Union[float, Sequence[float]] = 0,
+                           group_size=1,
+                           formation=unitgroup.VehicleGroup.Formation.Line,
+                           move_formation: PointAction = PointAction.OffRoad) -> List[unitgroup.VehicleGroup]:
+        """Adds many vehicle groups at once, each like :py:meth:`vehicle_group` would.
+
+        The arguments are columns, the values at the same index make a group.
+        IDs for all groups and vehicles are reserved at once, EPLRS numbers
+        are taken from the allocator of the vehicle groups without looking
+        at the mission for every group.
+
+        Args:
+            country(Country): which the vehicle groups will belong too
+            names: names of the groups
+            types: type of vehicle of each group, or one type for all
+            positions: :py:class:`dcs.mapping.Point` where each group will be placed
+            headings: initial heading of each group, or one heading for all
+            group_size: how many vehicles to add to each group
+            formation: formation in which the groups should be placed
+            move_formation: formation the groups should use for moving
+
+        Returns:
+            List[VehicleGroup]: the new vehicle groups, in the order of names
+        """
+        count = len(names)
+        types = self._column(types, count, "types")
+        positions = self._column(positions, count, "positions")
+        headings = self._column(headings, count, "headings")
+        group_ids = self.group_ids.reserve(count)
+        unit_ids = iter(self.unit_ids.reserve(count * group_size))
+        eplrs = self.eplrs_ids("vehicle") if any(x.eplrs for x in set(types)) else None
+        terrain = self.terrain
+        groups: List[unitgroup.VehicleGroup] = []
+        for i, name in enumerate(names):
+            _type = types[i]
+            position = positions[i]
+            heading = headings[i]
+            vg = unitgroup.VehicleGroup(group_ids[i], name)
+            for j in range(group_size):
+                v = Vehicle(terrain, next(unit_ids), "{} Unit #{}".format(name, j + 1), _type.id)
+                v.position.x = position.x
+                v.position.y = position.y + j * 20
+                v.heading = heading
+                vg.add_unit(v)
+
+            wp = vg.add_waypoint(vg.units[0].position, move_formation, 0)
+            wp.ETA_locked = True
+            if _type.eplrs and eplrs is not None:
+                wp.tasks.append(task.EPLRS(eplrs.next()))
+
+            vg.formation(formation, heading)
+
+            country.add_vehicle_group(vg)
+            groups.append(vg)
+        return groups
+
     def ship(self, name: str, _type: Type[unittype.ShipType]) -> Ship:
         """Creates a plain ship unit to be added to a group
 
@@ -879,8 +1259,7 @@ class Mission:
                 for i in range(0, len(c.plane_group)):
                     if c.plane_group[i].id == pgroup.id:
                         self.clear_parking_slots(c.plane_group[i])
-                        del c.plane_group[i]
-                        return True
+                        return c.remove_group(c.plane_group[i])
         return False
 
     def clear_parking_slots(self, pgroup: unitgroup.PlaneGroup):
@@ -1901,15 +2280,26 @@ class Mission:
 
                       * 'exact': whole name must match
                       * 'match': part of the name must match
+                      * 'prefix': the name must start with group_name
+                      * 'regex': regular expression that must be found in the name
 
         Returns:
             Group: the group found, otherwise None
         """
-        for k in self.coalition:
-            g = self.coalition[k].find_group(group_name, search)
-            if g:
-                return g
-        return None
+        registry = self._current_registry()
+        return registry.first(registry.groups_by_name(group_name, search))
+
+    def find_groups(self, query: Union[str, Pattern[str]], search: str = "match") -> List[Group]:
+        """Searches all groups with a matching name.
+
+        Args:
+            query: part of the name, prefix or regular expression
+            search: search mode, like for :py:meth:`find_group`
+
+        Returns:
+            the groups found, in the order they were added
+        """
+        return self._current_registry().groups_by_name(query, search)
 
     def find_group_by_id(self, group_id: int) -> Optional[Group]:
         """Searches a group with the given groupId
@@ -1920,11 +2310,51 @@ class Mission:
         Returns:
             Group: the group found, otherwise None
         """
-        for k in self.coalition:
-            g = self.coalition[k].find_group_by_id(group_id)
-            if g is not None:
-                return g
-        return None
+        registry = self._current_registry()
+        return registry.first(registry.groups_by_id(group_id))
+
+    def find_unit(self, unit_name: str) -> Optional[Unit]:
+        """Searches a unit with the given name.
+
+        Args:
+            unit_name: exact name of the unit
+
+        Returns:
+            Unit: the unit found, one of them if several have the name, otherwise None
+        """
+        found = self._current_registry().units_by_name(unit_name)
+        return found[0] if found else None
+
+    def find_units(self, query: Union[str, Pattern[str]], search: str = "match") -> List[Unit]:
+        """Searches all units with a matching name.
+
+        Args:
+            query: part of the name, prefix or regular expression
+            search: search mode, like for :py:meth:`find_group`
+
+        Returns:
+            the units found, in the order they were added
+        """
+        return self._current_registry().units_by_name(query, search)
+
+    def find_unit_by_id(self, unit_id: int) -> Optional[Unit]:
+        """Searches a unit with the given unitId
+
+        Args:
+            unit_id: unit identifier assigned by the mission file
+
+        Returns:
+            Unit: the unit found, otherwise None
+        """
+        found = self._current_registry().units_by_id(unit_id)
+        return found[0] if found else None
+
+    def _current_registry(self) -> Registry:
+        """The registry, rebuilt if the coalitions were replaced since it was built."""
+        coalitions = list(self.coalition.values())
+        if not self.registry.is_current(coalitions):
+            self.registry.rebuild(coalitions)
+        return self.registry
 
     def is_red(self, country: Country) -> bool:
         """Checks if the given country object is part o the red coalition.
@@ -2079,49 +2509,331 @@ class Mission:
             return self.load_file(self.filename)
         raise RuntimeError("Currently no file loaded to reload.")
 
-    def save(self, filename=None):
+    def save(self, filename=None, compact=False, compression=zipfile.ZIP_DEFLATED, compresslevel=None, workers=None):
         """Save the current Mission object to the given file.
 
+        The lua files are streamed into the .miz while they are serialized, the
+        mission text is never held in memory as a whole.
+
+        With workers the entries are serialized and compressed in a thread pool
+        instead and written in the usual order once they are ready. zlib
+        compresses in parallel, lua serialization is bound to one core, but
+        overlaps with the compression of the other entries. Each entry is held
+        in memory until it is written.
+
         Args:
             filename: filepath to save the Mission object
+            compact: write the lua files without any whitespace, this is faster
+                and makes smaller files, DCS reads them just fine
+            compression: zipfile compression method, ``zipfile.ZIP_STORED`` saves
+                fastest
+            compresslevel: compression level, see :py:class:`zipfile.ZipFile`
+            workers: number of threads, for ``ZIP_STORED`` and ``ZIP_DEFLATED``
+
+        With a :py:attr:`fragment_cache` groups, trigger rules and drawing layers
+        that serialize to the same table as on a previous save are not serialized
+        again, their lua text is taken from the cache.
         """
         filename = self.filename if filename is None else filename
         if not filename:
             raise RuntimeError("No filename given.")
         self.filename = filename  # store filename
 
+        indent = None if compact else 1
         theatre = str(self.terrain.name)
-        options = str(self.options)
-        warehouses = str(self.warehouses)
-        mission = str(self)
+        mission = self._save_table(indent)
+
+        # resources still in the loaded .miz are copied from it, overwriting it means
+        # writing to a temporary file first
+        replaced = self.map_resource.kept_in(filename)
+        target = filename
+        if replaced:
+            self.map_resource.extract_unsaved(replaced, ['theatre'])
+            fd, target = tempfile.mkstemp(suffix='.miz', dir=os.path.dirname(os.path.abspath(filename)))
+            os.close(fd)
+
+        try:
+            with zipfile.ZipFile(target, 'w', compression=compression, compresslevel=compresslevel) as zipf:
+                if workers is not None and workers > 1 and compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                    self._save_parallel(zipf, workers, theatre, mission, indent)
+                else:
+                    # theatre
+                    zipf.writestr('theatre', theatre)
+
+                    for name, table in [('options', self.options.dict), ('warehouses', self.warehouses.dict)]:
+                        if name in self.bypassed_files:
+                            zipf.writestr(name, self.bypassed_files[name])
+                        else:
+                            _write_lua(zipf, name, table(), name, indent)
+
+                    # translation files
+                    _write_lua(zipf, 'l10n/DEFAULT/dictionary', self.translation.dict('DEFAULT'), "dictionary", indent)
+
+                    mapresource = self.map_resource.store(zipf, 'DEFAULT')
+                    _write_lua(zipf, 'l10n/DEFAULT/mapResource', mapresource, "mapResource", indent)
+
+                    for unit_type, pages in self.aircraft_kneeboards.items():
+                        directory = f'KNEEBOARD/{unit_type.id}/IMAGES/'
+                        for idx, page in enumerate(pages):
+                            zipf.write(page, arcname=f'{directory}/{page.name}')
+
+                    _write_lua(zipf, 'mission', mission, "mission", indent)
+        except BaseException:
+            if replaced:
+                os.remove(target)
+            raise
+
+        if replaced:
+            os.replace(target, filename)
+            self.map_resource.moved(replaced, filename)
+        if self.fragment_cache is not None:
+            self.fragment_cache.sweep()
+        return True
 
-        with zipfile.ZipFile(filename, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
-            # theatre
-            zipf.writestr('theatre', theatre)
+    def _save_parallel(self, zipf: zipfile.ZipFile, workers: int, theatre: str, mission: Dict[str, Any],
+                       indent: Optional[int]) -> None:
+        """Writes the entries of :py:meth:`save` in the same order, built in a thread pool."""
+        files, mapresource = self.map_resource.stored_files('DEFAULT')
+        kneeboards = []
+        for unit_type, pages in self.aircraft_kneeboards.items():
+            directory = f'KNEEBOARD/{unit_type.id}/IMAGES/'
+            kneeboards += [(str(page), f'{directory}/{page.name}') for page in pages]
+
+        # entries without data are files still in the loaded .miz, they are copied as they are
+        Entry = Tuple[zipfile.ZipInfo, Optional[Callable[[], bytes]]]
+
+        def lua_entry(arcname: str, value: Any, varname: str) -> Entry:
+            zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+            return zinfo, lambda: lua.dumps(value, varname, indent).encode('utf-8')
+
+        archived = {}
+
+        def file_entry(path: str, arcname: str) -> Entry:
+            if path in self.map_resource.archived:
+                archived[arcname] = path
+                return zipfile.ZipInfo(arcname), None
+            return zipfile.ZipInfo.from_file(path, arcname), Path(path).read_bytes
+
+        def bytes_entry(arcname: str, data: bytes) -> Entry:
+            return zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6]), lambda: data
+
+        entries: List[Entry] = [bytes_entry('theatre', theatre.encode())]
+        for name, table in [('options', self.options.dict), ('warehouses', self.warehouses.dict)]:
+            if name in self.bypassed_files:
+                entries.append(bytes_entry(name, self.bypassed_files[name]))
+            else:
+                entries.append(lua_entry(name, table(), name))
+        entries.append(lua_entry('l10n/DEFAULT/dictionary', self.translation.dict('DEFAULT'), "dictionary"))
+        entries += [file_entry(path, arcname) for path, arcname in files]
+        entries.append(lua_entry('l10n/DEFAULT/mapResource', mapresource, "mapResource"))
+        entries += [file_entry(path, arcname) for path, arcname in kneeboards]
+        entries.append(lua_entry('mission', mission, "mission"))
+
+        def build(entry: Entry) -> Optional[bytes]:
+            zinfo, data = entry
+            if data is None:
+                return None
+            zinfo.compress_type = zipf.compression
+            return miz.compressed_entry(zinfo, data(), zipf.compresslevel)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor, contextlib.ExitStack() as stack:
+            archives: Dict[str, zipfile.ZipFile] = {}
+            # start with the mission, the biggest entry, the others are compressed
+            # while it is serialized
+            last = len(entries) - 1
+            futures = {i: executor.submit(build, entries[i]) for i in [last, *range(last)]}
+            for i, (zinfo, _) in enumerate(entries):
+                raw = futures[i].result()
+                # loaded missions keep files like theatre as binary files, store() writes them once as well
+                if zinfo.filename in zipf.NameToInfo:
+                    continue
+                if raw is None:
+                    self.map_resource.write_file(zipf, archived[zinfo.filename], zinfo.filename, stack, archives)
+                else:
+                    miz.write_compressed(zipf, zinfo, raw)
+
+    def save_dir(self, path: Union[str, Path], compact: bool = False) -> List[str]:
+        """Saves the mission unzipped into a directory, e.g. to keep it under version control.
+
+        The directory holds the files of the .miz, :py:func:`dcs.miz.pack` zips them.
+        The countries of each coalition, the trigger tables and the drawings are
+        written to their own files below ``mission.d/`` instead of the mission file.
+        Only files whose content changed are written, files a previous save wrote
+        that the mission no longer has are removed.
 
-            # options
-            zipf.writestr('options', options)
+        Args:
+            path: directory, created if missing
+            compact: write the lua files without any whitespace
 
-            # warehouses
-            zipf.writestr('warehouses', warehouses)
+        Returns:
+            the files that were written or removed, relative to path
+        """
+        directory = Path(path)
+        indent = None if compact else 1
+        mission = self._save_table(indent)
+        parts = self._split_parts(mission)
 
-            # translation files
-            dicttext = lua.dumps(self.translation.dict('DEFAULT'), "dictionary", 1)
-            zipf.writestr('l10n/DEFAULT/dictionary', dicttext)
+        written = set()
+        changed = []
 
-            mapresource = self.map_resource.store(zipf, 'DEFAULT')
-            zipf.writestr('l10n/DEFAULT/mapResource', lua.dumps(mapresource, "mapResource", 1))
+        def write(relpath: str, data: bytes) -> None:
+            written.add(relpath)
+            if miz.write_changed(directory / relpath, data):
+                changed.append(relpath)
 
-            for unit_type, pages in self.aircraft_kneeboards.items():
-                directory = f'KNEEBOARD/{unit_type.id}/IMAGES/'
-                for idx, page in enumerate(pages):
-                    zipf.write(page, arcname=f'{directory}/{page.name}')
+        def write_lua(relpath: str, value: Any, varname: str, level: Optional[int] = indent) -> None:
+            write(relpath, lua.dumps(value, varname, level).encode('utf-8'))
 
-            zipf.writestr('mission', mission)
+        write('theatre', str(self.terrain.name).encode('utf-8'))
+        for name, table in [('options', self.options.dict), ('warehouses', self.warehouses.dict)]:
+            if name in self.bypassed_files:
+                write(name, self.bypassed_files[name])
+            else:
+                write_lua(name, table(), name)
+        write_lua('l10n/DEFAULT/dictionary', self.translation.dict('DEFAULT'), "dictionary")
+
+        files, mapresource = self.map_resource.stored_files('DEFAULT')
+        for unit_type, pages in self.aircraft_kneeboards.items():
+            files += [(str(page), f'KNEEBOARD/{unit_type.id}/IMAGES/{page.name}') for page in pages]
+        with contextlib.ExitStack() as stack:
+            archives: Dict[str, zipfile.ZipFile] = {}
+            for filepath, relpath in files:
+                if relpath in written:
+                    continue
+                written.add(relpath)
+                source = self.map_resource.archived.get(filepath)
+                if source is None:
+                    copied = miz.copy_changed(filepath, directory / relpath)
+                else:
+                    if source[0] not in archives:
+                        archives[source[0]] = stack.enter_context(zipfile.ZipFile(source[0]))
+                    copied = miz.extract_changed(archives[source[0]], source[1], directory / relpath)
+                if copied:
+                    changed.append(relpath)
+        write_lua('l10n/DEFAULT/mapResource', mapresource, "mapResource")
+
+        for keys, value in parts:
+            # indented for its depth in the mission table, so pack() can put it back as it is
+            varname = [x for x in keys if isinstance(x, str)][-1]
+            write_lua(miz.part_path(keys), value, varname, indent + len(keys) if indent else None)
+        write_lua('mission', mission, "mission")
+
+        return changed + miz.remove_stale(directory, written)
 
-        return True
+    @staticmethod
+    def _split_parts(m: Dict[str, Any]) -> List[Tuple[Tuple[Union[str, int], ...], Any]]:
+        """Takes the parts :py:meth:`save_dir` writes to their own files out of the mission table.
+
+        :return: the keys and value of each part
+        """
+        parts: List[Tuple[Tuple[Union[str, int], ...], Any]] = []
+        coalitions = {}
+        for side, coalition in lua.table_items(m["coalition"]):
+            # copied, the tables of bypassed sections are kept by the mission
+            coalition = dict(lua.table_items(coalition))
+            countries = coalition.get("country")
+            if countries:
+                del coalition["country"]
+                parts += [(("coalition", side, "country", i), country) for i, country in lua.table_items(countries)]
+            coalitions[side] = coalition
+        m["coalition"] = coalitions
+        for key in ["trig", "trigrules", "triggers", "drawings"]:
+            if key in m:
+                parts.append(((key,), m.pop(key)))
+        return parts
+
+    def load_dir(self, path: Union[str, Path], **kwargs: Any) -> List[StatusMessage]:
+        """Loads a mission directory written by :py:meth:`save_dir`, replacing all current data.
+
+        The directory is packed into a .miz in the temporary directory of the
+        mission, which then keeps the resource files like a loaded .miz does.
 
-    def dict(self):
+        Args:
+            path: mission directory
+            kwargs: arguments of :py:meth:`load_file`
+
+        Returns:
+            List of LoadStatus objects, might be empty if everything was fine
+        """
+        fd, packed = tempfile.mkstemp(suffix='.miz')
+        os.close(fd)
+        try:
+            miz.pack(path, packed, compression=zipfile.ZIP_STORED)
+            status = self.load_file(packed, **kwargs)
+            tmpdir = self.map_resource.extract_dir()
+            assert tmpdir is not None
+            kept = os.path.join(tmpdir, "mission.miz")
+            shutil.move(packed, kept)
+        except BaseException:
+            if os.path.exists(packed):
+                os.remove(packed)
+            raise
+        for filepath, (archive, name) in list(self.map_resource.archived.items()):
+            if archive == os.path.abspath(packed):
+                self.map_resource.archived[filepath] = (kept, name)
+        self.filename = None
+        return status
+
+    def to_snapshot(self, path: Union[str, Path]) -> None:
+        """Saves the whole object model of the mission, terrain included, to a binary snapshot.
+
+        Restoring it with :py:meth:`from_snapshot` is much faster than loading the
+        .miz again. Snapshots are a cache for the same pydcs version, not a format
+        to exchange missions. Resource files are referred to by their path, they are
+        not part of the snapshot.
+
+        :param path: snapshot file to write
+        """
+        path = Path(path)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._SNAPSHOT_MAGIC + struct.pack("<H", self.SNAPSHOT_VERSION))
+                pickle.dump(self, f, protocol=5)
+            os.replace(tmp, str(path))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def from_snapshot(cls, path: Union[str, Path]) -> "Mission":
+        """Restores a mission saved with :py:meth:`to_snapshot`.
+
+        Snapshots are pickles, only restore the ones you wrote yourself.
+
+        :param path: snapshot file
+        :return: the mission
+        :raises ValueError: if the file is no snapshot or has another format version
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        header_size = len(cls._SNAPSHOT_MAGIC) + 2
+        if not data.startswith(cls._SNAPSHOT_MAGIC) or len(data) < header_size:
+            raise ValueError("{} is not a mission snapshot".format(path))
+        version, = struct.unpack_from("<H", data, len(cls._SNAPSHOT_MAGIC))
+        if version != cls.SNAPSHOT_VERSION:
+            raise ValueError("Snapshot format version {} is not supported, expected {}".format(
+                version, cls.SNAPSHOT_VERSION))
+
+        # a snapshot restores lots of objects without any garbage, the collector
+        # would only walk them over and over
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            mission = pickle.loads(memoryview(data)[header_size:])
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if not isinstance(mission, cls):
+            raise ValueError("{} holds no {}".format(path, cls.__name__))
+        return mission
+
+    def dict(self, deferred=False):
+        """The mission as lua table.
+
+        :param deferred: leave the countries as they are, so :py:func:`dcs.lua.dump`
+            has them write one group at a time
+        """
         m = {
             "start_time": int((self.start_time.hour * 60 * 60) + (self.start_time.minute * 60) + self.start_time.second)
         }
@@ -2169,7 +2881,7 @@ class Mission:
             m["initScript"] = self.init_script
         m["coalition"] = {}
         for col in self.coalition.keys():
-            m["coalition"][col] = self.coalition[col].dict()
+            m["coalition"][col] = self.coalition[col].dict(deferred)
         col_blue = {self.coalition["blue"].country(x).id for x in self.coalition["blue"].countries.keys()}
         col_red = {self.coalition["red"].country(x).id for x in self.coalition["red"].countries.keys()}
         col_neutral = list(Mission._COUNTRY_IDS - col_blue - col_red)
@@ -2189,7 +2901,7 @@ class Mission:
         m["maxDictId"] = self.current_dict_id
         m["forcedOptions"] = self.forced_options.dict()
         m["failures"] = self.failures
-
+        m.update(self.bypassed_sections)
         return m
 
     def __str__(self):
@@ -2200,6 +2912,107 @@ class Mission:
         return repr(rep)
 
 
+class _EplrsScan:
+    """The groups of a group list that were looked at for EPLRS numbers.
+
+    Of each group the task list of its first waypoint is watched, or its
+    waypoint list if it has none, the groups whose list got longer or
+    shorter are looked at again. The groups using each number are counted in
+    users, which the scans of a group type share, a number no group uses
+    anymore is released from the allocator.
+    """
+    def __init__(self, groups: Sequence[unitgroup.Group], allocator: IdAllocator, users: Dict[int, int]) -> None:
+        self.groups = groups
+        self.allocator = allocator
+        self.users = users
+        self.watched: List[list] = []
+        self.lengths: List[int] = []
+        self.numbers: List[Optional[int]] = []
+        self.last: Any = None
+
+    def unchanged(self) -> bool:
+        """If the groups looked at are still at the start of the list."""
+        count = len(self.watched)
+        return len(self.groups) >= count and (count == 0 or self.groups[count - 1] is self.last)
+
+    def update(self) -> None:
+        """Counts the EPLRS numbers of the new groups and the changed ones."""
+        if not self.unchanged():
+            # groups were taken out of the list, all are looked at again
+            self.forget()
+        if list(map(len, self.watched)) != self.lengths:
+            for i, (watched, length) in enumerate(zip(self.watched, self.lengths)):
+                if len(watched) != length:
+                    self._look_at(i)
+        for i in range(len(self.watched), len(self.groups)):
+            self.watched.append([])
+            self.lengths.append(0)
+            self.numbers.append(None)
+            self._look_at(i)
+        if self.groups:
+            self.last = self.groups[-1]
+
+    def forget(self) -> None:
+        """Releases the numbers of all groups looked at."""
+        for number in self.numbers:
+            self._release(number)
+        self.watched = []
+        self.lengths = []
+        self.numbers = []
+        self.last = None
+
+    def _release(self, number: Optional[int]) -> None:
+        if number is None:
+            return
+        self.users[number] -= 1
+        if not self.users[number]:
+            del self.users[number]
+            self.allocator.release(number)
+
+    def _look_at(self, i: int) -> None:
+        group = self.groups[i]
+        number = None
+        if group.points:
+            self.watched[i] = group.points[0].tasks
+            eplrs = group.points[0].find_task(task.EPLRS)
+            if eplrs:
+                number = eplrs.eplrs
+                self.users[number] = self.users.get(number, 0) + 1
+                self.allocator.use(number)
+        else:
+            self.watched[i] = group.points
+        self.lengths[i] = len(self.watched[i])
+        # released after the new one is counted, in case it is the same
+        self._release(self.numbers[i])
+        self.numbers[i] = number
+
+
+class _ExtractedPaths(Dict[str, str]):
+    """Paths of resource files, files still in the loaded .miz are extracted when their path is read.
+
+    :py:class:`MapResource` reads the paths with the methods of dict, so saving
+    does not extract them.
+    """
+    def __init__(self, resources: "MapResource", *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.resources = resources
+
+    def __getitem__(self, key: str) -> str:
+        return self.resources.extract(dict.__getitem__(self, key))
+
+    def get(self, key: str, default: Any = None) -> Any:  # type: ignore[override]
+        return self[key] if key in self else default
+
+    def values(self):
+        for path in dict.values(self):
+            self.resources.extract(path)
+        return super().values()
+
+    def items(self):
+        self.values()
+        return super().items()
+
+
 class MapResource:
     """MapResource is responsibly to manage all additional mission resource files.
 
@@ -2209,21 +3022,108 @@ class MapResource:
         mission(Mission): the mission this MapResource belongs too, needed for dictionary ids
     """
     def __init__(self, mission: Mission):
+        # paths of files still in the loaded .miz exist once they are read from files or binary_files
         self.files: Dict[str, Dict[str, str]] = {}
         self.binary_files: List[Dict[str, str]] = []
         self.added_paths: List[str] = []
+        # files of a loaded .miz that are not extracted yet, the path they are
+        # extracted to -> (path of the .miz, name in the .miz)
+        self.archived: Dict[str, Tuple[str, str]] = {}
         self.mission = mission
 
+    def _defer_extract(self, zipf: zipfile.ZipFile, filepath: str) -> str:
+        """Returns the path zipf.extract() would extract filepath to, without extracting it.
+
+        The file is extracted by :py:meth:`extract` when it is needed, on save it is
+        copied over from the source archive as it is.
+        """
+        zipf.getinfo(filepath)
+        parts = filepath.split('/')
+        sanitized = '\\' in filepath or ':' in filepath or any(x in ('', '.', '..') for x in parts)
+        if self.mission.tmpdir is None or zipf.filename is None or sanitized:
+            # names zipfile changes on extraction, or no archive to come back to
+            return os.path.abspath(zipf.extract(filepath, self.extract_dir()))
+        path = os.path.abspath(os.path.join(self.mission.tmpdir, *parts))
+        self.archived[path] = (os.path.abspath(zipf.filename), filepath)
+        return path
+
+    def extract(self, path: str) -> str:
+        """Makes sure a file of the resource depot exists on disk.
+
+        Files of a loaded mission stay in the .miz until they are needed.
+
+        Args:
+            path: path of a resource or binary file
+
+        Returns:
+            path
+        """
+        source = self.archived.pop(path, None)
+        if source is not None:
+            with zipfile.ZipFile(source[0]) as zipf:
+                zipf.extract(source[1], self.extract_dir())
+        return path
+
+    def extract_dir(self) -> Optional[str]:
+        """The temporary directory of the loaded mission, created when it is first needed."""
+        tmpdir = self.mission.tmpdir
+        if tmpdir is not None:
+            os.makedirs(tmpdir, mode=0o700, exist_ok=True)
+        return tmpdir
+
+    def extract_all(self) -> None:
+        """Extracts all files of the loaded mission that are not on disk yet."""
+        for path in list(self.archived):
+            self.extract(path)
+
+    def kept_in(self, filename: Union[str, Path]) -> Optional[str]:
+        """The path of the loaded .miz with files not extracted yet if it is filename."""
+        for archive in {x[0] for x in self.archived.values()}:
+            try:
+                if os.path.samefile(archive, filename):
+                    return archive
+            except OSError:
+                pass
+        return None
+
+    def extract_unsaved(self, archive: str, written: Sequence[str] = ()) -> None:
+        """Extracts the files of archive that :py:meth:`store` does not write.
+
+        :param archive: path of the loaded .miz
+        :param written: names the mission writes itself before the resources
+        """
+        files, _ = self.stored_files('DEFAULT')
+        stored = {path for path, zippath in files if zippath not in written}
+        for path, (source, _) in list(self.archived.items()):
+            if source == archive and path not in stored:
+                self.extract(path)
+
+    def moved(self, archive: str, filename: Union[str, Path]) -> None:
+        """Points the files kept in archive to filename, which got them on save."""
+        files, _ = self.stored_files('DEFAULT')
+        zippaths = dict(files)
+        target = os.path.abspath(filename)
+        for path, (source, _) in list(self.archived.items()):
+            if source == archive:
+                self.archived[path] = (target, zippaths[path])
+
+    def resource_file(self, resource_key: ResourceKey, lang: str = 'DEFAULT') -> str:
+        """Path of the file of a resource key, extracts it first if needed.
+
+        :param resource_key: key of the resource
+        :param lang: language used for resource
+        :return: absolute path of the file
+        """
+        return self.files[lang][resource_key.key]
+
     def load_from_dict(self, _dict, zipf: zipfile.ZipFile, lang='DEFAULT'):
         _dict = _dict["mapResource"]
-        for key in _dict:
-            filename = _dict[key]
+        for key, filename in lua.table_items(_dict):
             filepath = 'l10n/{lang}/{fn}'.format(lang=lang, fn=filename)
             self.added_paths.append(filepath)
 
             try:
-                extractedpath = zipf.extract(filepath, self.mission.tmpdir)
-                self.add_resource_file(extractedpath, lang, key)
+                self.add_resource_file(self._defer_extract(zipf, filepath), lang, key)
             except KeyError as ke:
                 print(ke, file=sys.stderr)
 
@@ -2233,11 +3133,10 @@ class MapResource:
                 continue
 
             try:
-                extractedpath = zipf.extract(filepath, self.mission.tmpdir)
-                self.binary_files.append({
-                    "path": os.path.abspath(extractedpath),
+                self.binary_files.append(_ExtractedPaths(self, {
+                    "path": self._defer_extract(zipf, filepath),
                     "respath": filepath,
-                })
+                }))
             except KeyError as ke:
                 print(ke, file=sys.stderr)
 
@@ -2255,7 +3154,7 @@ class MapResource:
         abspath = os.path.abspath(extracted_path)
         resource_key = ResourceKey(key) if key else ResourceKey("ResKey_" + str(self.mission.next_dict_id()))
         if lang not in self.files:
-            self.files[lang] = {}
+            self.files[lang] = _ExtractedPaths(self)
         self.files[lang][resource_key.key] = abspath
         return resource_key
 
@@ -2278,29 +3177,58 @@ class MapResource:
         if self.mission.tmpdir is None:
             raise RuntimeError("get_file_path() only works for loaded missions.")
 
-        return self.files[lang][resource_key.key][len(self.mission.tmpdir) + len('/l10n//') + len(lang):]
+        path = dict.__getitem__(self.files[lang], resource_key.key)
+        return path[len(self.mission.tmpdir) + len('/l10n//') + len(lang):]
 
-    def store(self, zipf: zipfile.ZipFile, lang='DEFAULT'):
-        d = {}
+    def stored_files(self, lang='DEFAULT') -> Tuple[List[Tuple[str, str]], Dict[str, str]]:
+        """The files :py:meth:`store` writes.
 
-        for file in self.binary_files:
-            zipf.write(file["path"], file["respath"])
+        :return: the (path, name in zip) pairs of the files in write order and the
+            mapResource table
+        """
+        files = [(dict.__getitem__(file, "path"), file["respath"]) for file in self.binary_files]
+        written = {x[1] for x in files}
+        d = {}
 
         if lang in self.files:
-            for reskey in self.files[lang]:
-                filepath = self.files[lang][reskey]
+            for reskey, filepath in dict.items(self.files[lang]):
                 if os.path.isabs(filepath):
                     nameinzip = os.path.basename(filepath)
                     zippath = "l10n/{lang}/{name}".format(lang=lang, name=nameinzip)
                     # do not write files twice
                     # if a script is called multiple times, a resource key is duplicated for the same file
-                    has_file = [x for x in zipf.filelist if x.filename == zippath]
-                    if not has_file:
-                        zipf.write(filepath, zippath)
+                    if zippath not in written:
+                        files.append((filepath, zippath))
+                        written.add(zippath)
                     d[reskey] = nameinzip
 
+        return files, d
+
+    def store(self, zipf: zipfile.ZipFile, lang='DEFAULT'):
+        files, d = self.stored_files(lang)
+        with contextlib.ExitStack() as stack:
+            archives: Dict[str, zipfile.ZipFile] = {}
+            for filepath, zippath in files:
+                if zippath not in zipf.NameToInfo:
+                    self.write_file(zipf, filepath, zippath, stack, archives)
         return d
 
+    def write_file(self, zipf: zipfile.ZipFile, filepath: str, zippath: str, stack: contextlib.ExitStack,
+                   archives: Dict[str, zipfile.ZipFile]) -> None:
+        """Writes a file to zipf, files still in the loaded .miz are copied without recompressing them.
+
+        :param stack: closes the source archives
+        :param archives: source archives opened so far by their path
+        """
+        source = self.archived.get(filepath)
+        if source is None:
+            zipf.write(filepath, zippath)
+            return
+        archive, name = source
+        if archive not in archives:
+            archives[archive] = stack.enter_context(zipfile.ZipFile(archive))
+        miz.copy_entry(archives[archive], name, zipf, zippath)
+
 
 class OptionsDifficulty:
     def __init__(self):
@@ -2408,6 +3336,16 @@ class OptionsDifficulty:
         }
 
 
+def _write_lua(zipf: zipfile.ZipFile, arcname: str, value: Any, varname: str, indent: Optional[int]) -> None:
+    """Serializes value straight into a new entry of zipf."""
+    zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+    zinfo.compress_type = zipf.compression
+    # like ZipFile.writestr(), ZipFile.open() only takes the level for plain names
+    zinfo._compresslevel = zipf.compresslevel  # type: ignore
+    with zipf.open(zinfo, 'w') as f:
+        lua.dump(value, f, varname, indent)
+
+
 class Options:
     """Should be a representation for the mission options file
     might be removed in the future.
@@ -2421,7 +3359,7 @@ class Options:
         self.difficulty.load_from_dict(d["difficulty"])
         self.options = d
 
-    def __str__(self):
+    def dict(self):
         d = {
             "playerName": self.playerName,
             "difficulty": self.difficulty.dict()
@@ -2429,7 +3367,10 @@ class Options:
         for k in self.options:
             if k not in d:
                 d[k] = self.options[k]
-        return lua.dumps(d, "options", 1)
+        return d
+
+    def __str__(self):
+        return lua.dumps(self.dict(), "options", 1)
 
     def __repr__(self):
         return repr(self.options)
@@ -0,0 +1,472 @@
+"""Helpers to write .miz files, which are plain zip archives.
+
+:py:class:`zipfile.ZipFile` compresses an entry while it is written, so only one
+entry can be compressed at a time. These helpers write entries that were
+compressed beforehand, e.g. by several threads, or copied as they are from
+another archive.
+
+A mission can also be kept as a directory with the files of the .miz, see
+:py:meth:`dcs.mission.Mission.save_dir`, :py:func:`pack` zips it.
+
+:py:class:`MappedZipFile` reads archives through a memory mapping instead.
+"""
+import filecmp
+import io
+import mmap
+import os
+import shutil
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Set, Union
+
+import dcs.lua as lua
+
+# signature and size of the fixed part of a local file header
+_LOCAL_HEADER_MAGIC = b'PK\x03\x04'
+_LOCAL_HEADER_SIZE = 30
+_COPY_CHUNK = 1 << 20
+# private attributes of ZipFile the raw copies rely on, archives without them
+# are read and written through the public methods instead
+_RAW_READ_ATTRS = ('_lock', 'fp')
+_RAW_WRITE_ATTRS = ('_lock', 'fp', '_writing', '_allowZip64', '_seekable', '_didModify', '_writecheck', 'start_dir')
+
+# the parts of the mission table that a mission directory keeps in their own
+# files, below this directory, each file is named by the keys of its part
+PARTS_DIR = "mission.d"
+# the files the last save wrote into a mission directory, one per line
+MANIFEST = ".miz-files"
+# written first by Mission.save, in this order
+_FIRST_ENTRIES = ['theatre', 'options', 'warehouses', 'l10n/DEFAULT/dictionary']
+
+
+def compress(data: bytes, compress_type: int, compresslevel: Optional[int] = None) -> bytes:
+    """Compresses data like :py:class:`zipfile.ZipFile` does for an entry.
+
+    zlib releases the GIL while compressing, so this runs in parallel in threads.
+
+    :param data: entry data
+    :param compress_type: ``zipfile.ZIP_STORED`` or ``zipfile.ZIP_DEFLATED``
+    :param compresslevel: zlib compression level, None for the default
+    :return: the compressed data
+    """
+    if compress_type == zipfile.ZIP_STORED:
+        return data
+    if compress_type == zipfile.ZIP_DEFLATED:
+        level = zlib.Z_DEFAULT_COMPRESSION if compresslevel is None else compresslevel
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush()
+    raise ValueError("Unsupported compression method {}".format(compress_type))
+
+
+def compressed_entry(zinfo: zipfile.ZipInfo, data: bytes, compresslevel: Optional[int] = None) -> bytes:
+    """Compresses data with the method of zinfo and sets its sizes and CRC.
+
+    :return: the compressed data to pass to :py:func:`write_compressed`
+    """
+    raw = compress(data, zinfo.compress_type, compresslevel)
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(raw)
+    zinfo.CRC = zlib.crc32(data)
+    return raw
+
+
+def write_compressed(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, raw: bytes) -> None:
+    """Appends an entry whose data is already compressed to zipf.
+
+    :param zipf: zip file opened for writing
+    :param zinfo: entry with compress_type, file_size, compress_size and CRC set
+    :param raw: compressed data
+    """
+    zinfo.flag_bits = 0
+    if not _has_attrs(zipf, _RAW_WRITE_ATTRS):
+        # writestr compresses the data again
+        data = raw if zinfo.compress_type == zipfile.ZIP_STORED else zlib.decompress(raw, -15)
+        zipf.writestr(zinfo, data)
+        return
+    _append(zipf, zinfo, [raw])
+
+
+def _has_attrs(zipf: zipfile.ZipFile, attrs: Sequence[str]) -> bool:
+    return all(hasattr(zipf, x) for x in attrs)
+
+
+def _raw_chunks(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo) -> Iterator[bytes]:
+    z: Any = zipf
+    fp = z.fp
+    fp.seek(zinfo.header_offset)
+    header = fp.read(_LOCAL_HEADER_SIZE)
+    if len(header) != _LOCAL_HEADER_SIZE or header[:4] != _LOCAL_HEADER_MAGIC:
+        raise zipfile.BadZipFile("Bad magic number for file header of {}".format(zinfo.filename))
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    fp.seek(name_length + extra_length, 1)
+    left = zinfo.compress_size
+    while left > 0:
+        chunk = fp.read(min(left, _COPY_CHUNK))
+        if not chunk:
+            raise EOFError("{} is truncated".format(zinfo.filename))
+        left -= len(chunk)
+        yield chunk
+
+
+def copy_entry(source: zipfile.ZipFile, name: str, zipf: zipfile.ZipFile, arcname: Optional[str] = None) -> None:
+    """Copies an entry of source to zipf without decompressing and compressing it again.
+
+    Entries compressed with another method than the one of zipf are recompressed,
+    streamed from one archive to the other. If the ZipFile internals this relies on
+    are missing, the entry is read and written with :py:meth:`zipfile.ZipFile.writestr`.
+
+    :param source: zip file opened for reading
+    :param name: name of the entry in source
+    :param zipf: zip file opened for writing
+    :param arcname: name of the copy, name by default
+    """
+    info = source.getinfo(name)
+    zinfo = zipfile.ZipInfo(arcname or name, info.date_time)
+    zinfo.external_attr = info.external_attr
+    zinfo.comment = info.comment
+    zinfo.file_size = info.file_size
+    if not _has_attrs(source, _RAW_READ_ATTRS) or not _has_attrs(zipf, _RAW_WRITE_ATTRS):
+        zinfo.compress_type = zipf.compression
+        zipf.writestr(zinfo, source.read(info), compresslevel=zipf.compresslevel)
+        return
+    if info.compress_type != zipf.compression or info.flag_bits & 0x1:
+        zinfo.compress_type = zipf.compression
+        z: Any = zinfo
+        z._compresslevel = zipf.compresslevel
+        with source.open(info) as fsrc, zipf.open(zinfo, 'w') as fdst:
+            shutil.copyfileobj(fsrc, fdst, _COPY_CHUNK)
+        return
+
+    zinfo.compress_type = info.compress_type
+    zinfo.compress_size = info.compress_size
+    zinfo.CRC = info.CRC
+    # keep the compression option bits, the sizes are known so there is no data descriptor
+    zinfo.flag_bits = info.flag_bits & 0x06
+    s: Any = source
+    with s._lock:
+        _append(zipf, zinfo, _raw_chunks(source, info))
+
+
+def _append(zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, chunks: Iterable[bytes]) -> None:
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    # the steps of ZipFile.open(..., 'w') and closing the entry, with the sizes known up front
+    z: Any = zipf
+    with z._lock:
+        if z._writing:
+            raise ValueError("Can't write to the ZIP file while there is another write handle open on it.")
+        if zip64 and not z._allowZip64:
+            raise zipfile.LargeZipFile("Filesize would require ZIP64 extensions")
+        if not zinfo.external_attr:
+            zinfo.external_attr = 0o600 << 16
+        if z._seekable:
+            z.fp.seek(z.start_dir)
+        zinfo.header_offset = z.fp.tell()
+        z._writecheck(zinfo)
+        z._didModify = True
+        z.fp.write(zinfo.FileHeader(zip64))
+        for chunk in chunks:
+            z.fp.write(chunk)
+        z.start_dir = z.fp.tell()
+        z.filelist.append(zinfo)
+        z.NameToInfo[zinfo.filename] = zinfo
+
+
+class _EntryReader(io.RawIOBase):
+    """Reads the data of an entry from a memoryview, inflating deflated data on the way."""
+    def __init__(self, info: zipfile.ZipInfo, data: memoryview) -> None:
+        super().__init__()
+        self.name = info.filename
+        self._data = data
+        self._pos = 0
+        self._left = info.file_size
+        self._crc = 0
+        self._expected_crc = info.CRC
+        self._inflate = zlib.decompressobj(-15) if info.compress_type == zipfile.ZIP_DEFLATED else None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        n = min(len(b), self._left)
+        if n == 0:
+            return 0
+        if self._inflate is None:
+            chunk: Any = self._data[self._pos:self._pos + n]
+            self._pos += n
+        else:
+            chunk = b""
+            while not chunk:
+                source: Any = self._inflate.unconsumed_tail
+                if not source:
+                    source = self._data[self._pos:self._pos + _COPY_CHUNK]
+                    self._pos += len(source)
+                    if not source:
+                        raise EOFError("{} is truncated".format(self.name))
+                chunk = self._inflate.decompress(source, n)
+        n = len(chunk)
+        b[:n] = chunk
+        self._crc = zlib.crc32(chunk, self._crc)
+        self._left -= n
+        if self._left == 0 and self._crc != self._expected_crc:
+            raise zipfile.BadZipFile("Bad CRC-32 for file {!r}".format(self.name))
+        return n
+
+    def close(self) -> None:
+        self._data.release()
+        super().close()
+
+
+class MappedZipFile(zipfile.ZipFile):
+    """A zip file opened for reading that reads its entries through a memory mapping.
+
+    Stored entries are available as memoryviews of the mapping with :py:meth:`view`,
+    without copying them, which :py:func:`dcs.lua.loads` parses as they are.
+    Deflated entries are inflated straight from the mapping, :py:meth:`open` streams
+    them without reading the compressed data first. Encrypted entries and other
+    compression methods are read like :py:class:`zipfile.ZipFile` does.
+
+    The mapping is closed with the zip file, or once the last view of it is gone.
+
+    Args:
+        filename: path of the zip file
+    """
+    def __init__(self, filename: Union[str, "os.PathLike[str]"]) -> None:
+        super().__init__(filename, 'r')
+        self._map: Optional[mmap.mmap] = None
+        try:
+            z: Any = self
+            self._map = mmap.mmap(z.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # e.g. a file that can't be mapped, everything is read from the file then
+            pass
+
+    def _mapped(self, info: zipfile.ZipInfo) -> bool:
+        return (self._map is not None and not info.flag_bits & 0x1
+                and info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED))
+
+    def _getinfo(self, name: Union[str, zipfile.ZipInfo]) -> zipfile.ZipInfo:
+        return name if isinstance(name, zipfile.ZipInfo) else self.getinfo(name)
+
+    def _raw(self, info: zipfile.ZipInfo) -> memoryview:
+        """The compressed data of an entry in the mapping."""
+        assert self._map is not None
+        offset = info.header_offset
+        header = self._map[offset:offset + _LOCAL_HEADER_SIZE]
+        if len(header) != _LOCAL_HEADER_SIZE or header[:4] != _LOCAL_HEADER_MAGIC:
+            raise zipfile.BadZipFile("Bad magic number for file header of {}".format(info.filename))
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        start = offset + _LOCAL_HEADER_SIZE + name_length + extra_length
+        if start + info.compress_size > len(self._map):
+            raise EOFError("{} is truncated".format(info.filename))
+        return memoryview(self._map)[start:start + info.compress_size]
+
+    def _contents(self, info: zipfile.ZipInfo) -> Union[bytes, memoryview]:
+        raw = self._raw(info)
+        if info.compress_type == zipfile.ZIP_STORED:
+            data: Union[bytes, memoryview] = raw
+        else:
+            with raw:
+                # the size is known, so the output is allocated once
+                data = zlib.decompress(raw, -15, max(info.file_size, 1))
+        if zlib.crc32(data) != info.CRC:
+            raise zipfile.BadZipFile("Bad CRC-32 for file {!r}".format(info.filename))
+        return data
+
+    def view(self, name: Union[str, zipfile.ZipInfo]) -> memoryview:
+        """The data of an entry, stored entries without a copy.
+
+        :param name: name or info of the entry
+        :return: a read only view, release it when done so the mapping can be closed
+        """
+        info = self._getinfo(name)
+        if not self._mapped(info):
+            return memoryview(super().read(info))
+        data = self._contents(info)
+        return data if isinstance(data, memoryview) else memoryview(data)
+
+    def read(self, name: Union[str, zipfile.ZipInfo], pwd: Optional[bytes] = None) -> bytes:
+        info = self._getinfo(name)
+        if pwd is not None or not self._mapped(info):
+            return super().read(info, pwd)
+        data = self._contents(info)
+        if isinstance(data, memoryview):
+            with data:
+                return data.tobytes()
+        return data
+
+    def open(self, name: Union[str, zipfile.ZipInfo], mode: Literal['r', 'w'] = 'r', pwd: Optional[bytes] = None,
+             *, force_zip64: bool = False) -> IO[bytes]:
+        if mode == 'r' and pwd is None:
+            info = self._getinfo(name)
+            if self._mapped(info):
+                return io.BufferedReader(_EntryReader(info, self._raw(info)))
+        return super().open(name, mode, pwd, force_zip64=force_zip64)
+
+    def close(self) -> None:
+        super().close()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # views of the mapping are still around, it is unmapped with the last one
+                pass
+            self._map = None
+
+
+def part_path(keys: Sequence[Union[str, int]]) -> str:
+    """The path of a mission table part in a mission directory.
+
+    :param keys: the keys of the part in the mission table
+    """
+    return "/".join([PARTS_DIR] + [str(x) for x in keys]) + ".lua"
+
+
+def _part_keys(relpath: str) -> List[Union[str, int]]:
+    keys = relpath[len(PARTS_DIR) + 1:-len(".lua")].split("/")
+    return [int(x) if x.isdigit() else x for x in keys]
+
+
+def write_changed(path: Path, data: bytes) -> bool:
+    """Writes data to path unless the file already holds it.
+
+    :return: if the file was written
+    """
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return True
+
+
+def copy_changed(source: Union[str, Path], path: Path) -> bool:
+    """Copies a file to path unless the file there has the same content.
+
+    The copy keeps the modification time, so an unchanged file is recognized by
+    its size and time the next time.
+
+    :return: if the file was copied
+    """
+    try:
+        if filecmp.cmp(source, path, shallow=True):
+            return False
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(source, path)
+    return True
+
+
+def extract_changed(zipf: zipfile.ZipFile, name: str, path: Path) -> bool:
+    """Extracts an entry of zipf to path unless the file there has the same size and CRC.
+
+    :return: if the file was written
+    """
+    info = zipf.getinfo(name)
+    try:
+        if path.stat().st_size == info.file_size:
+            crc = 0
+            with path.open('rb') as f:
+                for chunk in iter(lambda: f.read(_COPY_CHUNK), b''):
+                    crc = zlib.crc32(chunk, crc)
+            if crc == info.CRC:
+                return False
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    with zipf.open(info) as fsrc, path.open('wb') as fdst:
+        shutil.copyfileobj(fsrc, fdst, _COPY_CHUNK)
+    return True
+
+
+def remove_stale(directory: Path, written: Set[str]) -> List[str]:
+    """Removes the files the previous save wrote to a mission directory that the last one did not.
+
+    Directories that are empty afterwards are removed as well, the manifest is
+    updated to the written files.
+
+    :param directory: mission directory
+    :param written: paths of the files the last save wrote, relative to directory
+    :return: the removed paths
+    """
+    manifest = directory / MANIFEST
+    try:
+        previous = manifest.read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        previous = []
+    removed = []
+    for relpath in previous:
+        if relpath in written:
+            continue
+        path = directory / relpath
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        removed.append(relpath)
+        parent = path.parent
+        while parent != directory and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+    write_changed(manifest, "".join(x + "\n" for x in sorted(written)).encode('utf-8'))
+    return removed
+
+
+def _is_hidden(relpath: str) -> bool:
+    return any(x.startswith('.') for x in relpath.split('/'))
+
+
+def _mission_entry(directory: Path, parts: List[str]) -> bytes:
+    """The mission entry of a mission directory, with its parts put back in place."""
+    text = (directory / 'mission').read_text(encoding='utf-8')
+    # the parts are written with the whitespace of the mission file, at their depth in it
+    indent = 1 if text.startswith("mission=\n") else None
+    mission = lua.loads(text)["mission"]
+    for relpath in sorted(parts, key=_part_keys):
+        keys = _part_keys(relpath)
+        table = mission
+        for key in keys[:-1]:
+            table = table.setdefault(key, {})
+        part = (directory / relpath).read_text(encoding='utf-8')
+        table[keys[-1]] = lua.Raw(part[part.index('=') + 1:].lstrip())
+    return lua.dumps(mission, "mission", indent).encode('utf-8')
+
+
+def pack(directory: Union[str, Path], filename: Union[str, Path], compression: int = zipfile.ZIP_DEFLATED,
+         compresslevel: Optional[int] = None) -> None:
+    """Zips a mission directory into a .miz.
+
+    The parts of the mission table are put back into the mission entry, a mission
+    directory written by :py:meth:`dcs.mission.Mission.save_dir` gives the same
+    entries as :py:meth:`dcs.mission.Mission.save`. Hidden files like the ones of
+    version control are left out.
+
+    :param directory: mission directory
+    :param filename: the .miz to write
+    :param compression: zipfile compression method
+    :param compresslevel: compression level, see :py:class:`zipfile.ZipFile`
+    """
+    directory = Path(directory)
+    files: Dict[str, Path] = {}
+    parts = []
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            path = Path(root, name)
+            relpath = path.relative_to(directory).as_posix()
+            if _is_hidden(relpath):
+                continue
+            if relpath.startswith(PARTS_DIR + "/"):
+                if relpath.endswith(".lua"):
+                    parts.append(relpath)
+            elif relpath != 'mission':
+                files[relpath] = path
+    if not (directory / 'mission').is_file():
+        raise FileNotFoundError("{} has no mission file".format(directory))
+
+    order = [x for x in _FIRST_ENTRIES if x in files] + [x for x in files if x not in _FIRST_ENTRIES]
+    with zipfile.ZipFile(filename, 'w', compression=compression, compresslevel=compresslevel) as zipf:
+        for relpath in order:
+            zipf.write(files[relpath], relpath)
+        zipf.writestr('mission', _mission_entry(directory, parts))
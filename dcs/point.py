@@ -1,6 +1,7 @@
 import copy
 
 import dcs.task as task
+import dcs.lua as lua
 import dcs.mapping as mapping
 from typing import Any, Dict, List, Optional
 from enum import Enum
@@ -150,9 +151,8 @@ class MovingPoint(StaticPoint):
         self.ETA = d["ETA"]
         self.speed_locked = d["speed_locked"]
         if d.get("task") is not None:
-            task_keys = sorted(d["task"]["params"]["tasks"].keys())
-            for t in task_keys:
-                self.tasks.append(task._create_from_dict(d["task"]["params"]["tasks"][t]))
+            for task_dict in lua.table_values(d["task"]["params"]["tasks"], sort=True):
+                self.tasks.append(task._create_from_dict(task_dict))
         self.airdrome_id = d.get("airdromeId", None)
         self.helipad_id = d.get("helipadId", None)
         self.link_unit = d.get("linkUnit", None)
@@ -189,7 +189,7 @@ class MovingPoint(StaticPoint):
         d["task"] = {
             "id": "ComboTask",
             "params": {
-                "tasks": {i + 1: self.tasks[i].dict() for i in range(0, len(self.tasks))}
+                "tasks": tasks
             }
         }
         if self.airdrome_id is not None:
@@ -0,0 +1,415 @@
+"""Indexes of the groups and units of a mission by their ID and name."""
+from __future__ import annotations
+
+from typing import (TYPE_CHECKING, Any, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Pattern, Sequence,
+                    SupportsIndex, Tuple, TypeVar, Union, overload)
+
+from dcs.search import NameIndex
+
+if TYPE_CHECKING:
+    from dcs.coalition import Coalition
+    from dcs.country import Country
+    from dcs.unit import Unit
+    from dcs.unitgroup import Group
+
+
+def _add(index: Dict[Any, Any], key: Hashable, value: Any) -> None:
+    # a single object per key, a list only for keys that are used more than once
+    entry = index.get(key)
+    if entry is None:
+        index[key] = value
+    elif entry.__class__ is list:
+        entry.append(value)
+    else:
+        index[key] = [entry, value]
+
+
+def _remove(index: Dict[Any, Any], key: Hashable, value: Any) -> bool:
+    entry = index.get(key)
+    if entry is value:
+        del index[key]
+        return True
+    if entry.__class__ is list:
+        for i, x in enumerate(entry):
+            if x is value:
+                del entry[i]
+                if len(entry) == 1:
+                    index[key] = entry[0]
+                return True
+    return False
+
+
+def _entries(index: Dict[Any, Any], key: Hashable) -> List[Any]:
+    entry = index.get(key)
+    if entry is None:
+        return []
+    return list(entry) if entry.__class__ is list else [entry]
+
+
+C = TypeVar("C")
+T = TypeVar("T")
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class TrackedList(List[T]):
+    """A list that counts its changes as changes of the registry it is registered with."""
+    _registry: Optional[Registry] = None
+
+    def _changed(self) -> None:
+        if self._registry is not None:
+            self._registry.changes += 1
+
+    def append(self, value: T) -> None:
+        self._changed()
+        super().append(value)
+
+    def extend(self, values: Iterable[T]) -> None:
+        self._changed()
+        super().extend(values)
+
+    def insert(self, index: SupportsIndex, value: T) -> None:
+        self._changed()
+        super().insert(index, value)
+
+    def remove(self, value: T) -> None:
+        self._changed()
+        super().remove(value)
+
+    def pop(self, index: SupportsIndex = -1) -> T:
+        self._changed()
+        return super().pop(index)
+
+    def clear(self) -> None:
+        self._changed()
+        super().clear()
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        self._changed()
+        super().sort(*args, **kwargs)
+
+    def reverse(self) -> None:
+        self._changed()
+        super().reverse()
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        self._changed()
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index: Any) -> None:
+        self._changed()
+        super().__delitem__(index)
+
+    def __iadd__(self, values: Iterable[T]) -> TrackedList[T]:  # type: ignore[override, misc]
+        self._changed()
+        return super().__iadd__(values)  # type: ignore[return-value]
+
+    def __imul__(self, n: SupportsIndex) -> TrackedList[T]:  # type: ignore[override, misc]
+        self._changed()
+        return super().__imul__(n)  # type: ignore[return-value]
+
+
+class TrackedDict(Dict[K, V]):
+    """A dict that counts its changes like :py:class:`TrackedList`."""
+    _registry: Optional[Registry] = None
+
+    def _changed(self) -> None:
+        if self._registry is not None:
+            self._registry.changes += 1
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._changed()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: K) -> None:
+        self._changed()
+        super().__delitem__(key)
+
+    def pop(self, *args: Any) -> Any:
+        self._changed()
+        return super().pop(*args)
+
+    def popitem(self) -> Tuple[K, V]:
+        self._changed()
+        return super().popitem()
+
+    def setdefault(self, key: K, default: Any = None) -> Any:
+        self._changed()
+        return super().setdefault(key, default)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self._changed()
+        super().update(*args, **kwargs)
+
+    def clear(self) -> None:
+        self._changed()
+        super().clear()
+
+
+class Tracked(Generic[C]):
+    """An attribute that holds a :py:class:`TrackedList` or :py:class:`TrackedDict`.
+
+    Whatever list or dict is assigned is copied into one, and the registry of the
+    one it replaces counts that as a change.
+    """
+    def __init__(self, factory: Callable[[Any], Any]) -> None:
+        self.factory = factory
+        self.attribute = ""
+
+    def __set_name__(self, owner: Any, name: str) -> None:
+        self.attribute = "_" + name
+
+    @overload
+    def __get__(self, obj: None, objtype: Any = None) -> Tracked[C]:
+        ...
+
+    @overload
+    def __get__(self, obj: object, objtype: Any = None) -> C:
+        ...
+
+    def __get__(self, obj: Any, objtype: Any = None) -> Any:
+        if obj is None:
+            return self
+        return obj.__dict__[self.attribute]
+
+    def __set__(self, obj: Any, value: C) -> None:
+        obj.__dict__[self.attribute] = replaced(obj.__dict__.get(self.attribute), value, self.factory)
+
+
+def replaced(old: Any, value: Any, factory: Callable[[Any], Any]) -> Any:
+    """The tracked list or dict to store for value, which replaces old."""
+    if value is old:
+        return old
+    if old is not None and old._registry is not None:
+        old._registry.changes += 1
+        old._registry = None
+    return value if value.__class__ is factory else factory(value)
+
+
+class Registry:
+    """The groups and units of a mission by their ID and name, for lookups in constant time.
+
+    Registered coalitions, countries and groups keep it up to date: adding and
+    removing countries, groups and units with their methods, renaming a group or
+    unit and changing its ID update it.
+
+    The countries of a coalition, the group lists of a country and the unit lists
+    of a group can be changed directly as well. They are :py:class:`TrackedList`
+    and :py:class:`TrackedDict` objects that count each change, the methods above
+    take back the changes they made themselves. A lookup rebuilds the registry if
+    any other change was counted since.
+    """
+    def __init__(self) -> None:
+        self.coalitions: List[Coalition] = []
+        self.countries: List[Country] = []
+        # the country and group list of each registered group
+        self.owners: Dict[Group, Tuple[Country, Sequence[Group]]] = {}
+        # the group of each registered unit
+        self.unit_groups: Dict[Unit, Group] = {}
+        self.group_ids: Dict[int, Any] = {}
+        self.group_names = NameIndex()
+        self.unit_ids: Dict[Any, Any] = {}
+        self.unit_names = NameIndex()
+        # changes of the registered lists and dicts the registry does not know of
+        self.changes = 0
+
+    def rebuild(self, coalitions: Iterable[Coalition]) -> None:
+        """Registers everything in the coalitions, instead of what was registered before."""
+        for coalition in self.coalitions:
+            if coalition._registry is self:
+                coalition._registry = None
+            self._track(coalition.countries, None)
+        for country in self.countries:
+            if country._registry is self:
+                country._registry = None
+            for groups in country.group_lists():
+                self._track(groups, None)
+        for group in self.owners:
+            self._track(group.units, None)
+        self.coalitions = list(coalitions)
+        self.countries = []
+        self.owners = {}
+        self.unit_groups = {}
+        self.group_ids = {}
+        self.group_names = NameIndex()
+        self.unit_ids = {}
+        self.unit_names = NameIndex()
+        for coalition in self.coalitions:
+            coalition._registry = self
+            self._track(coalition.countries, self)
+            for country in coalition.countries.values():
+                self.add_country(country)
+        self.changes = 0
+
+    def is_current(self, coalitions: Sequence[Coalition]) -> bool:
+        """If the registry was built for these coalitions, they can have other groups by now."""
+        return len(coalitions) == len(self.coalitions) and all(a is b for a, b in zip(coalitions, self.coalitions))
+
+    def _track(self, values: Any, registry: Optional[Registry]) -> None:
+        # lists and dicts of another registry are left to it when unregistering
+        if isinstance(values, (TrackedList, TrackedDict)) and (registry is not None or values._registry is self):
+            values._registry = registry
+
+    def _noticed(self, values: Any) -> None:
+        """Takes back the change of a tracked list or dict, done by a method that updates the registry."""
+        if isinstance(values, (TrackedList, TrackedDict)) and values._registry is self:
+            self.changes -= 1
+
+    def add_country(self, country: Country, countries: Optional[Dict[str, Country]] = None) -> None:
+        """Registers a country.
+
+        :param countries: the countries of the coalition the country was just put into
+        """
+        self._noticed(countries)
+        if country._registry is not self:
+            country._registry = self
+            self.countries.append(country)
+        for groups in country.group_lists():
+            self._track(groups, self)
+            for group in groups:
+                self._add_group(country, group, groups)
+
+    def remove_country(self, country: Country, countries: Optional[Dict[str, Country]] = None) -> None:
+        """Unregisters a country.
+
+        :param countries: the countries of the coalition the country was just taken out of
+        """
+        self._noticed(countries)
+        if country._registry is not self:
+            return
+        country._registry = None
+        self.countries = [x for x in self.countries if x is not country]
+        for groups in country.group_lists():
+            self._track(groups, None)
+            for group in groups:
+                self._remove_group(group)
+
+    def add_group(self, country: Country, group: Group, groups: Sequence[Group]) -> None:
+        """Registers a group that was added to one of the group lists of country."""
+        self._noticed(groups)
+        self._add_group(country, group, groups)
+
+    def _add_group(self, country: Country, group: Group, groups: Sequence[Group]) -> None:
+        if group in self.owners:
+            self._remove_group(group)
+        self.owners[group] = (country, groups)
+        group._registry = self
+        self._track(group.units, self)
+        _add(self.group_ids, group.id, group)
+        self.group_names.add(group.name, group)
+        for unit in group.units:
+            self._add_unit(group, unit)
+
+    def remove_group(self, group: Group) -> None:
+        """Unregisters a group that was taken out of its group list."""
+        owner = self.owners.get(group)
+        if owner is not None:
+            self._noticed(owner[1])
+        self._remove_group(group)
+
+    def _remove_group(self, group: Group) -> None:
+        if self.owners.pop(group, None) is None:
+            return
+        group._registry = None
+        self._track(group.units, None)
+        _remove(self.group_ids, group.id, group)
+        self.group_names.remove(group.name, group)
+        for unit in group.units:
+            self._remove_unit(unit)
+
+    def add_unit(self, group: Group, unit: Unit) -> None:
+        """Registers a unit that was added to the units of a group."""
+        if group in self.owners:
+            self._noticed(group.units)
+            self._add_unit(group, unit)
+
+    def _add_unit(self, group: Group, unit: Unit) -> None:
+        unit._registry = self
+        self.unit_groups[unit] = group
+        _add(self.unit_ids, unit.id, unit)
+        self.unit_names.add(unit.name, unit)
+
+    def _remove_unit(self, unit: Unit) -> None:
+        if unit._registry is self:
+            unit._registry = None
+            self.unit_groups.pop(unit, None)
+            _remove(self.unit_ids, unit.id, unit)
+            self.unit_names.remove(unit.name, unit)
+
+    # called by registered groups and units when their name or ID changes
+
+    def group_renamed(self, group: Group, old: str, new: str) -> None:
+        self.group_names.rename(group, old, new)
+
+    def group_renumbered(self, group: Group, old: int, new: int) -> None:
+        if _remove(self.group_ids, old, group):
+            _add(self.group_ids, new, group)
+
+    def unit_renamed(self, unit: Unit, old: str, new: str) -> None:
+        self.unit_names.rename(unit, old, new)
+
+    def unit_renumbered(self, unit: Unit, old: Any, new: Any) -> None:
+        if _remove(self.unit_ids, old, unit):
+            _add(self.unit_ids, new, unit)
+
+    def _find(self, index: str, key: Any, search: str = "exact",
+              accept: Optional[Callable[[Country, Sequence[Group]], bool]] = None) -> List[Any]:
+        if self.changes:
+            self.rebuild(self.coalitions)
+        entries = getattr(self, index)
+        found = entries.search(key, search) if isinstance(entries, NameIndex) else _entries(entries, key)
+        if accept is not None:
+            found = [g for g in found if accept(*self.owners[g])]
+        return found
+
+    def groups_by_id(self, group_id: int,
+                     accept: Optional[Callable[[Country, Sequence[Group]], bool]] = None) -> List[Group]:
+        """The registered groups with an ID, rebuilds a stale registry first.
+
+        :param group_id: group ID
+        :param accept: takes the country and group list of a group, to only return some
+        """
+        return self._find('group_ids', group_id, accept=accept)
+
+    def groups_by_name(self, name: Union[str, Pattern[str]], search: str = "exact",
+                       accept: Optional[Callable[[Country, Sequence[Group]], bool]] = None) -> List[Group]:
+        """The registered groups with a name, like :py:meth:`groups_by_id`.
+
+        :param name: name, or query of the search
+        :param search: search mode, see :py:meth:`dcs.search.NameIndex.search`
+        :return: the groups in the order they were registered
+        """
+        return self._find('group_names', name, search, accept)
+
+    def units_by_id(self, unit_id: Any) -> List[Unit]:
+        """The registered units with an ID, like :py:meth:`groups_by_id`."""
+        return self._find('unit_ids', unit_id)
+
+    def units_by_name(self, name: Union[str, Pattern[str]], search: str = "exact") -> List[Unit]:
+        """The registered units with a name, like :py:meth:`groups_by_name`."""
+        return self._find('unit_names', name, search)
+
+    def first(self, groups: List[Group]) -> Optional[Group]:
+        """The group of groups that comes first when the coalitions are searched one by one.
+
+        That is by coalition, country, category and position in the group list.
+        """
+        if len(groups) <= 1:
+            return groups[0] if groups else None
+
+        countries = {id(country): (i, j) for i, coalition in enumerate(self.coalitions)
+                     for j, country in enumerate(coalition.countries.values())}
+
+        def position(group: Group) -> Tuple[int, int, int, int]:
+            country, owner = self.owners[group]
+            i, j = countries.get(id(country), (len(self.coalitions), 0))
+            category = next(k for k, x in enumerate(country.group_lists()) if x is owner)
+            return i, j, category, self.group_names.position(group)
+
+        return min(groups, key=position)
+
+    def __len__(self) -> int:
+        return len(self.owners)
+
+    def __repr__(self) -> str:
+        return "Registry({} groups, {} units)".format(len(self.owners), len(self.unit_ids))
@@ -0,0 +1,287 @@
+"""Name search over the objects of a mission.
+
+:py:class:`NameIndex` keeps objects by their name and finds them by the whole
+name, a prefix, a substring or a regular expression. Names are indexed by the
+trigrams of their case folded form, a query only looks at the names that have
+all the trigrams of the text it needs.
+"""
+import re
+from typing import Any, Dict, List, Optional, Pattern, Set, Union
+
+# search modes, "match" is a substring, like the find_* methods of the mission
+SEARCH_MODES = ("exact", "match", "prefix", "regex")
+
+# marks the start of a name in its trigrams, so prefixes are substrings
+_START = "\0"
+_GRAM = 3
+# characters that are themselves after a backslash in a pattern
+_ESCAPED_LITERALS = set("\\.^$*+?{}[]|()-/#&~'\"!%,:;<=>@`")
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + _GRAM] for i in range(max(len(text) - _GRAM + 1, 1))}
+
+
+def _skip_group(pattern: str, i: int, opening: str, closing: str) -> int:
+    """The index after the closing bracket of the group that starts at i."""
+    depth = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == opening and (opening != '[' or depth == 0):
+            depth += 1
+        elif c == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _escape_end(pattern: str, i: int) -> int:
+    """The index after the escape sequence that starts with the backslash at i."""
+    i += 1
+    if i >= len(pattern):
+        return i
+    c = pattern[i]
+    lengths = {'x': 2, 'u': 4, 'U': 8}
+    if c in lengths:
+        return i + 1 + lengths[c]
+    if c == 'N' and pattern.startswith('{', i + 1):
+        end = pattern.find('}', i + 2)
+        return len(pattern) if end < 0 else end + 1
+    if c == '0':
+        # octal escape of up to 3 digits
+        end = i + 1
+        while end < i + 3 and end < len(pattern) and pattern[end] in '01234567':
+            end += 1
+        return end
+    if c.isdigit():
+        # octal escape of 3 digits, otherwise a group reference of up to 2
+        if len(pattern) >= i + 3 and all(x in '01234567' for x in pattern[i:i + 3]):
+            return i + 3
+        return i + 2 if i + 1 < len(pattern) and pattern[i + 1].isdigit() else i + 1
+    return i + 1
+
+
+def required_literals(pattern: Union[str, Pattern[str]]) -> List[str]:
+    """Literal texts every match of a regular expression contains.
+
+    Only what is certain is returned: the runs of plain characters outside of
+    groups, classes and repetitions, nothing for patterns with alternatives
+    outside of groups or verbose whitespace. A run at the start of an anchored
+    pattern is prefixed with the start marker of the index.
+
+    :param pattern: regular expression
+    :return: the literal texts, can be empty
+    """
+    compiled = re.compile(pattern)
+    text = compiled.pattern
+    if not isinstance(text, str) or compiled.flags & re.VERBOSE:
+        return []
+    runs: List[str] = []
+    current = ""
+    i = 0
+    if text.startswith('^') or text.startswith('\\A'):
+        current = _START
+        i = 1 if text.startswith('^') else 2
+    while i < len(text):
+        c = text[i]
+        literal = None
+        if c == '\\':
+            if i + 1 < len(text) and text[i + 1] in _ESCAPED_LITERALS:
+                literal = text[i + 1]
+                i += 2
+            else:
+                # a class, a character by its code or a reference, not a plain character
+                i = _escape_end(text, i)
+        elif c == '[':
+            i = _skip_group(text, i, '[', ']')
+        elif c == '(':
+            i = _skip_group(text, i, '(', ')')
+        elif c in '*?{':
+            # the character in front is optional
+            current = current[:-1]
+            i = _skip_group(text, i, '{', '}') if c == '{' else i + 1
+        elif c == '+':
+            runs.append(current)
+            current = ""
+            i += 1
+            continue
+        elif c == '|':
+            # alternatives outside of a group, nothing is certain
+            return []
+        elif c in '.^$':
+            i += 1
+        else:
+            literal = c
+            i += 1
+        if literal is not None and not (i < len(text) and text[i] in '*?{'):
+            current += literal
+        elif literal is None or current:
+            runs.append(current)
+            current = ""
+    runs.append(current)
+    return [x for x in runs if x.strip(_START)]
+
+
+class NameIndex:
+    """Objects by their name, found by the whole name, a prefix, a substring or a regular expression.
+
+    The trigram index is built with the first query that needs it and kept up
+    to date from then on. Results are in the order the objects were added.
+    """
+    def __init__(self) -> None:
+        # a single object per name, a list for names that are used more than once
+        self.entries: Dict[str, Any] = {}
+        self._order: Dict[int, int] = {}
+        self._next = 0
+        self._grams: Optional[Dict[str, Set[str]]] = None
+
+    def add(self, name: str, obj: Any) -> None:
+        entry = self.entries.get(name)
+        if entry is None:
+            self.entries[name] = obj
+            if self._grams is not None:
+                self._index(name)
+        elif entry.__class__ is list:
+            entry.append(obj)
+        else:
+            self.entries[name] = [entry, obj]
+        self._order[id(obj)] = self._next
+        self._next += 1
+
+    def remove(self, name: str, obj: Any) -> bool:
+        """Removes an object that was added with name.
+
+        :return: if it was there
+        """
+        entry = self.entries.get(name)
+        if entry is obj:
+            del self.entries[name]
+            if self._grams is not None:
+                self._unindex(name)
+        elif entry.__class__ is list and any(x is obj for x in entry):
+            entry[:] = [x for x in entry if x is not obj]
+            if len(entry) == 1:
+                self.entries[name] = entry[0]
+        else:
+            return False
+        del self._order[id(obj)]
+        return True
+
+    def rename(self, obj: Any, old: str, new: str) -> None:
+        """Moves an object to its new name, if it was added with the old one."""
+        position = self._order.get(id(obj))
+        if position is not None and self.remove(old, obj):
+            self.add(new, obj)
+            self._order[id(obj)] = position
+
+    def clear(self) -> None:
+        self.entries = {}
+        self._order = {}
+        self._grams = None
+
+    def get(self, name: str) -> List[Any]:
+        """The objects with exactly this name."""
+        entry = self.entries.get(name)
+        if entry is None:
+            return []
+        return list(entry) if entry.__class__ is list else [entry]
+
+    def position(self, obj: Any) -> int:
+        """The number of objects that were added before obj."""
+        return self._order[id(obj)]
+
+    def _index(self, name: str) -> None:
+        assert self._grams is not None
+        for gram in _grams(_START + name.casefold()):
+            names = self._grams.get(gram)
+            if names is None:
+                self._grams[gram] = {name}
+            else:
+                names.add(name)
+
+    def _unindex(self, name: str) -> None:
+        assert self._grams is not None
+        for gram in _grams(_START + name.casefold()):
+            names = self._grams.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._grams[gram]
+
+    def _candidates(self, text: str) -> Set[str]:
+        """The names whose case folded form, with the start marker, may contain text."""
+        if self._grams is None:
+            self._grams = {}
+            for name in self.entries:
+                self._index(name)
+        text = text.casefold()
+        if len(text) >= _GRAM:
+            postings = sorted((self._grams.get(g, set()) for g in _grams(text)), key=len)
+            return postings[0].intersection(*postings[1:]) if postings else set()
+        # too short for a trigram, any trigram containing it will do
+        found: Set[str] = set()
+        for gram, names in self._grams.items():
+            if text in gram:
+                found.update(names)
+        return found
+
+    def _ordered(self, names: Any) -> List[Any]:
+        result = [obj for name in names for obj in self.get(name)]
+        result.sort(key=lambda obj: self._order[id(obj)])
+        return result
+
+    def search(self, query: Union[str, Pattern[str]], search: str = "match") -> List[Any]:
+        """Finds objects by name.
+
+        :param query: text to look for, or regular expression
+        :param search: search mode
+
+            * 'exact': whole name must match
+            * 'match': part of the name must match
+            * 'prefix': the name must start with query
+            * 'regex': ``re.search`` must find query in the name
+
+        :return: objects in the order they were added
+        """
+        if search == "exact":
+            assert isinstance(query, str)
+            return self.get(query)
+        if search == "regex":
+            compiled = re.compile(query)
+            literals = required_literals(compiled)
+            names: Any = self.entries
+            if literals:
+                names = set.intersection(*[self._candidates(x) for x in literals])
+            return self._ordered(x for x in names if compiled.search(x))
+        assert isinstance(query, str)
+        if not query:
+            return self._ordered(self.entries)
+        if search == "match":
+            return self._ordered(x for x in self._candidates(query) if query in x)
+        if search == "prefix":
+            return self._ordered(x for x in self._candidates(_START + query) if x.startswith(query))
+        raise ValueError("Unknown search mode '{}', use one of {}".format(search, ", ".join(SEARCH_MODES)))
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # positions are keyed by object id, which a copy doesn't keep, the
+        # trigrams are built again when needed
+        objects = [obj for entry in self.entries.values() for obj in (entry if entry.__class__ is list else [entry])]
+        return {"entries": self.entries, "positions": [(obj, self._order[id(obj)]) for obj in objects],
+                "next": self._next}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.entries = state["entries"]
+        self._order = {id(obj): position for obj, position in state["positions"]}
+        self._next = state["next"]
+        self._grams = None
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __repr__(self) -> str:
+        return "NameIndex({} objects, {} names)".format(len(self._order), len(self.entries))
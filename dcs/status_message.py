@@ -13,6 +13,7 @@ class MessageType(IntEnum):
     PARKING_SLOTS_FULL = 3
     MISSION_FORMAT_OLD = 4
     AIRFIELD_NONE = 5
+    ID_DUPLICATE = 6
 
 
 class StatusMessage:
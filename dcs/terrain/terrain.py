@@ -15,6 +15,7 @@ from dcs.terrain.projections.transversemercator import TransverseMercator
 import dcs.unittype as unittype
 import dcs.weather as weather
 
+import functools
 import random
 import pickle
 import sys
@@ -476,6 +477,17 @@ class Graph:
         return s
 
 
+@functools.lru_cache(maxsize=None)
+def _transformers(projection: TransverseMercator) -> Tuple[Transformer, Transformer]:
+    """The (to lat/long, from lat/long) transformers of a projection.
+
+    Creating them takes most of the time of creating a terrain, so all terrains
+    with the same projection share them.
+    """
+    crs = projection.to_crs()
+    return Transformer.from_crs(crs, CRS("WGS84")), Transformer.from_crs(CRS("WGS84"), crs)
+
+
 class Terrain:
     city_graph = Graph()  # type: Graph
     temperature = [
@@ -509,12 +521,7 @@ class Terrain:
         self.bullseye_red = {"x": 0.0, "y": 0.0}
         self.airports = {}  # type: Dict[str,Airport]
 
-        self._point_to_ll_transformer = Transformer.from_crs(
-            self.projection_parameters.to_crs(), CRS("WGS84")
-        )
-        self._ll_to_point_transformer = Transformer.from_crs(
-            CRS("WGS84"), self.projection_parameters.to_crs()
-        )
+        self._point_to_ll_transformer, self._ll_to_point_transformer = _transformers(self.projection_parameters)
 
     def __getstate__(self) -> Dict[str, Any]:
         state = self.__dict__.copy()
@@ -527,12 +534,7 @@ class Terrain:
     def __setstate__(self, state: Dict[str, Any]) -> None:
         self.__dict__.update(state)
         # Regenerate any state that was not persisted.
-        self._point_to_ll_transformer = Transformer.from_crs(
-            self.projection_parameters.to_crs(), CRS("WGS84")
-        )
-        self._ll_to_point_transformer = Transformer.from_crs(
-            CRS("WGS84"), self.projection_parameters.to_crs()
-        )
+        self._point_to_ll_transformer, self._ll_to_point_transformer = _transformers(self.projection_parameters)
 
     def weather(self, dt: datetime, weather_: weather.Weather):
         # check if there might be the season for thunderstorms
@@ -593,16 +595,18 @@ class Warehouses:
         self.warehouses: Dict[str, Any] = {}
 
     def load_dict(self, data):
-        for x in data.get("airports", {}):
+        for x, airport_data in lua.table_items(data.get("airports", {})):
             if airport := self.terrain.airport_by_id(x):
-                airport.load_from_dict(data["airports"][x])
+                airport.load_from_dict(airport_data)
             else:
                 logging.error(f"Could not find data for airport with ID '{x}'")
 
-    def __str__(self):
+    def dict(self):
         airports = self.terrain.airports
-        d = {
+        return {
             "warehouses": self.warehouses,
             "airports": {airports[x].id: airports[x].dict() for x in airports}
         }
-        return lua.dumps(d, "warehouses", 1)
+
+    def __str__(self):
+        return lua.dumps(self.dict(), "warehouses", 1)
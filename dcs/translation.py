@@ -1,4 +1,7 @@
-from typing import Dict, List
+import sys
+from typing import Dict, List, Pattern, Union
+
+from dcs.search import NameIndex
 
 
 class String:
@@ -44,6 +47,8 @@ class Translation:
     def __init__(self, _mission):
         self.strings: Dict[str, Dict[str, str]] = {}
         self.mission = _mission
+        # the string ids by their text, per language, once they are searched
+        self._search: Dict[str, NameIndex] = {}
 
     def has_string(self, _id: str, lang: str = 'DEFAULT') -> bool:
         return _id in self.strings[lang]
@@ -51,6 +56,13 @@ class Translation:
     def set_string(self, _id, string, lang='DEFAULT'):
         if lang not in self.strings:
             self.strings[lang] = {}
+        index = self._search.get(lang)
+        if index is not None:
+            # the index holds the ids interned, so the same object is found again
+            _id = sys.intern(_id)
+            if _id in self.strings[lang]:
+                index.remove(self.strings[lang][_id], _id)
+            index.add(string, _id)
         self.strings[lang][_id] = string
         return _id
 
@@ -65,8 +77,37 @@ class Translation:
     def delete_string(self, _id):
         for lang in self.strings:
             if _id in self.strings[lang]:
+                index = self._search.get(lang)
+                if index is not None:
+                    index.remove(self.strings[lang][_id], sys.intern(_id))
                 del self.strings[lang][_id]
 
+    def find_strings(self, query: Union[str, Pattern[str]], search: str = "match",
+                     lang: str = 'DEFAULT') -> List[String]:
+        """Searches the strings of a language by their text.
+
+        The texts are indexed with the first search, later searches only look
+        at the strings that can match.
+
+        Args:
+            query: text to search, or regular expression
+            search: search mode, 'exact', 'match', 'prefix' or 'regex',
+                see :py:meth:`dcs.search.NameIndex.search`
+            lang: language of the strings
+
+        Returns:
+            the strings found, in the order they were set
+        """
+        strings = self.strings.get(lang, {})
+        index = self._search.get(lang)
+        if index is None or len(index) != len(strings):
+            # new, or the strings were changed directly
+            index = NameIndex()
+            for _id, text in strings.items():
+                index.add(text, sys.intern(_id))
+            self._search[lang] = index
+        return [String(x, self) for x in index.search(query, search)]
+
     def languages(self) -> List[str]:
         return list(self.strings.keys())
 
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 import copy
-from typing import TYPE_CHECKING, List, Dict, Any
+import sys
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Pattern, Union
 from enum import Enum, IntEnum
 
+from dcs import lua
+from dcs.ids import IdAllocator
+from dcs.search import NameIndex
+from dcs.status_message import StatusMessage, MessageType, MessageSeverity
 from dcs import mapping
 from dcs import action
 from dcs import condition
@@ -26,6 +31,10 @@ class TriggerZoneType(IntEnum):
 
 
 class TriggerZone:
+    # the name index of the triggers the zone was added to
+    _names: Optional[NameIndex] = None
+    _name: str
+
     def __init__(self, _id, position: mapping.Point, hidden=False, name="", color=None, properties=None, radius=1500):
         self.id = _id
         self.radius = radius
@@ -35,6 +44,17 @@ class TriggerZone:
         self.color = color if color is not None else {1: 1, 2: 1, 3: 1, 4: 0.15}
         self.properties = properties if properties is not None else {}
 
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, name: str) -> None:
+        old = self.__dict__.get('_name')
+        self._name = name
+        if self._names is not None and old is not None:
+            self._names.rename(self, old, name)
+
     def dict(self):
         return {
             "name": self.name,
@@ -95,8 +115,9 @@ class TriggerZoneQuadPoint(TriggerZone):
 class Triggers:
     def __init__(self, terrain: Terrain) -> None:
         self._terrain = terrain
-        self.current_zone_id = 0
+        self.zone_ids = IdAllocator()
         self._zones = []  # type: List[TriggerZone]
+        self._names = NameIndex()
 
     def _make_circular(self, imp_zone) -> TriggerZoneCircular:
         tz = TriggerZoneCircular(
@@ -105,15 +126,14 @@ class Triggers:
             imp_zone["radius"],
             imp_zone["hidden"],
             imp_zone["name"],
-            imp_zone["color"],
-            imp_zone.get("properties", {})
+            lua.table_dict(imp_zone["color"]),
+            lua.table_dict(imp_zone.get("properties", {}))
         )
         return tz
 
     def _make_quad(self, imp_zone) -> TriggerZoneQuadPoint:
         verticies: List[mapping.Point] = []
-        for v_idx in imp_zone["verticies"]:
-            v = imp_zone["verticies"][v_idx]
+        for v in lua.table_values(imp_zone["verticies"]):
             verticies.append(mapping.Point(v["x"],
                                            v["y"],
                                            self._terrain))
@@ -123,16 +143,26 @@ class Triggers:
             verticies,
             imp_zone["hidden"],
             imp_zone["name"],
-            imp_zone["color"],
-            imp_zone.get("properties", {})
+            lua.table_dict(imp_zone["color"]),
+            lua.table_dict(imp_zone.get("properties", {}))
         )
         return tz
 
-    def load_from_dict(self, data: Dict[str, Any]) -> None:
-        self.current_zone_id = 0
+    @property
+    def current_zone_id(self) -> int:
+        """The highest zone id used so far, see :py:attr:`zone_ids`."""
+        return self.zone_ids.current
+
+    @current_zone_id.setter
+    def current_zone_id(self, value: int) -> None:
+        self.zone_ids.current = value
+
+    def load_from_dict(self, data: Dict[str, Any]) -> List[StatusMessage]:
+        status: List[StatusMessage] = []
+        self.zone_ids.clear()
         self._zones = []
-        for x in data["zones"]:
-            imp_zone = data["zones"][x]
+        self._names = NameIndex()
+        for imp_zone in lua.table_values(data["zones"]):
             if "type" in imp_zone:
                 tz_type = TriggerZoneType(imp_zone["type"])
             else:
@@ -144,7 +174,12 @@ class Triggers:
             is_circle = tz_type == TriggerZoneType.Circular
             tz: TriggerZone = self._make_circular(imp_zone) if is_circle else self._make_quad(imp_zone)
             self._zones.append(tz)
-            self.current_zone_id = max(self.current_zone_id, tz.id)
+            self._add_name(tz)
+            if self.zone_ids.use(tz.id):
+                msg = "Trigger zone '{z}' uses zone id {i}, which is already in use".format(z=tz.name, i=tz.id)
+                print("WARN:", msg, file=sys.stderr)
+                status.append(StatusMessage(msg, MessageType.ID_DUPLICATE, MessageSeverity.WARN))
+        return status
 
     def add_triggerzone(self,
                         position: mapping.Point,
@@ -154,10 +189,9 @@ class Triggers:
                         color=None,
                         properties=None
                         ) -> TriggerZoneCircular:
-        self.current_zone_id += 1
-
-        tz = TriggerZoneCircular(self.current_zone_id, position, radius, hidden, name, color, properties)
+        tz = TriggerZoneCircular(self.zone_ids.next(), position, radius, hidden, name, color, properties)
         self._zones.append(tz)
+        self._add_name(tz)
         return tz
 
     def add_triggerzone_quad(self,
@@ -167,18 +201,41 @@ class Triggers:
                              name="",
                              color=None,
                              properties=None) -> TriggerZoneQuadPoint:
-        self.current_zone_id += 1
-        tz = TriggerZoneQuadPoint(self.current_zone_id, position, verticies,
+        tz = TriggerZoneQuadPoint(self.zone_ids.next(), position, verticies,
                                   hidden, name, color, properties)
         self._zones.append(tz)
+        self._add_name(tz)
         return tz
 
+    def _add_name(self, tz: TriggerZone) -> None:
+        self._names.add(tz.name, tz)
+        tz._names = self._names
+
     def clear(self):
         self._zones.clear()
+        self._names = NameIndex()
 
     def zones(self) -> List[TriggerZone]:
         return self._zones
 
+    def find_zones(self, query: Union[str, Pattern[str]], search: str = "match") -> List[TriggerZone]:
+        """Searches the trigger zones by name.
+
+        Zones added with the add methods and renamed zones are indexed as they
+        change, zones put into or removed from :py:meth:`zones` directly are
+        noticed when the number of zones changes.
+
+        :param query: text to search, or regular expression
+        :param search: search mode, 'exact', 'match', 'prefix' or 'regex',
+            see :py:meth:`dcs.search.NameIndex.search`
+        :return: the zones found, in the order they were added
+        """
+        if len(self._names) != len(self._zones):
+            self._names = NameIndex()
+            for tz in self._zones:
+                self._add_name(tz)
+        return self._names.search(query, search)
+
     def dict(self):
         return {
             "zones": {i + 1: self._zones[i].dict() for i in range(0, len(self._zones))}
@@ -213,13 +270,11 @@ class TriggerRule:
     @classmethod
     def create_from_dict(cls, mission, d) -> 'TriggerRule':
         trig = cls(Event(d["eventlist"]), d["comment"])
-        actions = d["actions"]
-        for a in actions:
-            action_ = action.actions_map[actions[a]["predicate"]].create_from_dict(actions[a], mission)
+        for imp_action in lua.table_values(d["actions"]):
+            action_ = action.actions_map[imp_action["predicate"]].create_from_dict(imp_action, mission)
             trig.actions.append(action_)
-        rules = d["rules"]
-        for r in rules:
-            rule = condition.condition_map[rules[r]["predicate"]].create_from_dict(rules[r], mission)
+        for imp_rule in lua.table_values(d["rules"]):
+            rule = condition.condition_map[imp_rule["predicate"]].create_from_dict(imp_rule, mission)
             trig.rules.append(rule)
         return trig
 
@@ -311,11 +366,10 @@ class Rules:
     def __init__(self):
         self.triggers: List[TriggerRule] = []
 
-    def load_from_dict(self, mission, d: Dict[Any, Any]):
+    def load_from_dict(self, mission, d: Union[Dict[Any, Any], List[Any]]):
         self.triggers.clear()
-        sorted_keys = sorted(d.keys())
-        for x in sorted_keys:
-            self.triggers.append(trigger_map[d[x]["predicate"]].create_from_dict(mission, d[x]))
+        for imp_trigger in lua.table_values(d, sort=True):
+            self.triggers.append(trigger_map[imp_trigger["predicate"]].create_from_dict(mission, imp_trigger))
 
     def trig(self):
         d = {}
@@ -9,6 +9,7 @@ from dcs.unittype import UnitType, StaticType, ShipType, VehicleType
 import dcs.mapping as mapping
 
 if TYPE_CHECKING:
+    from dcs.registry import Registry
     from dcs.terrain.terrain import Terrain
 
 
@@ -35,6 +36,11 @@ class Skill(Enum):
 
 
 class Unit:
+    # the registry of the mission the unit was added to, see dcs.registry
+    _registry: Optional[Registry] = None
+    _id: Any
+    _name: str
+
     def __init__(self, _id, terrain: Terrain, name: Optional[str] = None, type="") -> None:
         if type == "":
             breakpoint()
@@ -44,9 +50,29 @@ class Unit:
         self.heading = 0.0
         self.id = _id
         self.skill: Optional[Skill] = Skill.Average
-        self.name: str = name if name else ""
+        self.name = name if name else ""
         self.livery_id: Optional[str] = None
 
+    @property
+    def id(self) -> Any:
+        return self._id
+
+    @id.setter
+    def id(self, _id: Any) -> None:
+        if self._registry is not None:
+            self._registry.unit_renumbered(self, self._id, _id)
+        self._id = _id
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, name: str) -> None:
+        if self._registry is not None:
+            self._registry.unit_renamed(self, self._name, name)
+        self._name = name
+
     def load_from_dict(self, d: Dict[str, Any]) -> None:
         self.position = mapping.Point(d["x"], d["y"], self._terrain)
         self.heading = math.degrees(d["heading"])
@@ -55,6 +81,8 @@ class Unit:
 
     def clone(self, _id):
         new = copy.copy(self)
+        # the clone is registered once it is added to a group
+        new._registry = None
         new.id = _id
         return new
 
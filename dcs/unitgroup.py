@@ -2,7 +2,7 @@ import math
 import random
 import copy
 from enum import Enum
-from typing import Any, Dict, Generic, List, Type, TypeVar, Optional
+from typing import TYPE_CHECKING, Any, Dict, Generic, List, Type, TypeVar, Optional
 from dcs.terrain.terrain import Terrain
 
 from dcs.unit import Unit, Skill, Ship, Vehicle, Static
@@ -13,17 +13,22 @@ from dcs.helicopters import HelicopterType
 from dcs.point import StaticPoint, MovingPoint, PointAction, PointProperties
 from dcs.terrain import Airport, Runway
 from dcs.nav_target_point import NavTargetPoint
+from dcs.registry import TrackedList, replaced
 import dcs.planes as planes
 import dcs.helicopters as helicopters
 import dcs.triggers as triggers
 import dcs.action as action
 import dcs.condition as condition
 import dcs.task as task
+import dcs.lua as lua
 import dcs.mapping as mapping
 import hashlib
 import base64
 import string
 
+if TYPE_CHECKING:
+    from dcs.registry import Registry
+
 PointT = TypeVar("PointT", bound=StaticPoint)
 UnitT = TypeVar("UnitT", bound=Unit)
 FlyingUnitT = TypeVar("FlyingUnitT", bound=FlyingUnit)
@@ -37,6 +42,12 @@ class Group(Generic[UnitT, PointT]):
         Scattered = 4
         Vee = 5
 
+    # the registry of the mission the group was added to, see dcs.registry
+    _registry: Optional["Registry"] = None
+    _id: int
+    _name: str
+    _units: List[UnitT]
+
     def __init__(self, _id: int, name: Optional[str] = None) -> None:
         if not isinstance(_id, int):
             raise TypeError("id must be an integer")
@@ -44,11 +55,39 @@ class Group(Generic[UnitT, PointT]):
         self.hidden = False
         self.hidden_on_planner = False
         self.hidden_on_mfd = False
-        self.units: List[UnitT] = []
+        self.units = []
         self.points: List[PointT] = []
-        self.name: str = name if name is not None else ""
+        self.name = name if name is not None else ""
         self.password: Optional[str] = None
 
+    @property
+    def id(self) -> int:
+        return self._id
+
+    @id.setter
+    def id(self, _id: int) -> None:
+        if self._registry is not None:
+            self._registry.group_renumbered(self, self._id, _id)
+        self._id = _id
+
+    @property
+    def units(self) -> List[UnitT]:
+        return self._units
+
+    @units.setter
+    def units(self, units: List[UnitT]) -> None:
+        self._units = replaced(self.__dict__.get("_units"), units, TrackedList)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, name: str) -> None:
+        if self._registry is not None:
+            self._registry.group_renamed(self, self._name, name)
+        self._name = name
+
     def __str__(self):
         return "Group: " + self.name
 
@@ -60,6 +99,8 @@ class Group(Generic[UnitT, PointT]):
 
     def add_unit(self, unit: UnitT):
         self.units.append(unit)
+        if self._registry is not None:
+            self._registry.add_unit(self, unit)
 
     def add_point(self, point: PointT) -> None:
         self.points.append(point)
@@ -170,16 +211,16 @@ class Group(Generic[UnitT, PointT]):
                 self.units[u_idx].heading = self.units[0].heading
                 u_idx += 1
 
-    def formation(self, _type=Formation.Line, heading=0):
-        form_map = {
-            VehicleGroup.Formation.Line: self.formation_line,
-            VehicleGroup.Formation.Star: self.formation_star,
-            VehicleGroup.Formation.Rectangle: self.formation_rectangle,
-            VehicleGroup.Formation.Scattered: self.formation_scattered,
-            VehicleGroup.Formation.Vee: self.formation_vee
-        }
+    _formations = {
+        Formation.Line: "formation_line",
+        Formation.Star: "formation_star",
+        Formation.Rectangle: "formation_rectangle",
+        Formation.Scattered: "formation_scattered",
+        Formation.Vee: "formation_vee"
+    }
 
-        form_map[_type](heading)
+    def formation(self, _type=Formation.Line, heading=0):
+        getattr(self, self._formations[_type])(heading)
 
         return True
 
@@ -232,6 +273,9 @@ class Group(Generic[UnitT, PointT]):
             d["password"] = self.password
         return d
 
+    def __lua_emit__(self, writer: lua.Writer) -> None:
+        writer.write(self.dict())
+
     def set_password(self, password: str) -> None:
         # see https://www.reddit.com/r/hoggit/comments/uf2sh0/psa_creating_the_new_slot_passwords_outside_of_dcs/
 
@@ -266,8 +310,7 @@ class MovingGroup(Generic[UnitT], Group[UnitT, MovingPoint]):
         self.frequency = d.get("frequency")
         self.task = d.get("task")  # ships don't have a task
         self.spawn_probability = d.get("probability", 1.0)
-        for t in sorted(d.get("tasks", [])):
-            task_dict = d["tasks"][t]
+        for task_dict in lua.table_values(d.get("tasks", {}), sort=True):
             self.tasks.append(task._create_from_dict(task_dict))
 
         self.task_selected = d.get("taskSelected", False)
@@ -389,8 +432,7 @@ class FlyingGroup(Generic[FlyingUnitT], MovingGroup[FlyingUnitT]):
         self.uncontrolled = d["uncontrolled"]
         self.radio_set = d.get("radioSet", False)
         self.nav_target_points = []
-        for n in d.get("NavTargetPoints", []):
-            nav_target_point_dict = d["NavTargetPoints"][n]
+        for nav_target_point_dict in lua.table_values(d.get("NavTargetPoints", {})):
             self.nav_target_points.append(NavTargetPoint.create_from_dict(nav_target_point_dict, terrain))
 
     def add_nav_target_point(self, pos: mapping.Point, text_comment: str):
@@ -107,6 +107,9 @@ class FlyingType(UnitType):
     _payload_cache = None
     _UnitPayloadGlobals = None
 
+    #: Set to a :py:class:`dcs.lua.ParseCache` to reuse parsed payload files across runs.
+    payload_parse_cache: Optional[lua.ParseCache] = None
+
     @classmethod
     def add_to_payload_cache(cls, payload_file: Path):
         if not FlyingType._payload_cache:
@@ -149,7 +152,11 @@ class FlyingType(UnitType):
             for payload_path in payload_dir.glob("*.lua"):
                 if FlyingType._payload_cache[payload_path] == cls.id and payload_path.exists():
                     try:
-                        payload_main = lua.loads(payload_path.read_text(), _globals=FlyingType._UnitPayloadGlobals)
+                        if FlyingType.payload_parse_cache is not None:
+                            payload_main = FlyingType.payload_parse_cache.load_file(
+                                payload_path, _globals=FlyingType._UnitPayloadGlobals)
+                        else:
+                            payload_main = lua.loads(payload_path.read_bytes(), _globals=FlyingType._UnitPayloadGlobals)
                     except SyntaxError:
                         print("Error parsing lua file '{f}'".format(f=payload_path), file=sys.stderr)
                         raise
@@ -4,6 +4,7 @@ import math
 from enum import Enum
 from typing import Any, Dict, List, Optional
 from dcs import mapping, terrain
+import dcs.lua as lua
 
 
 class Wind:
@@ -164,15 +165,14 @@ class Weather:
         self.season_temperature = season.get("temperature", 20)
         self.type_weather = d.get("type_weather", 0)
         self.qnh = d.get("qnh", 760)
-        cyclones = d.get("cyclones", {})
-        for x in cyclones:
+        for cyclone in lua.table_values(d.get("cyclones", {})):
             c = Cyclone()
-            c.centerX = cyclones[x].get("centerX", 0)
-            c.centerZ = cyclones[x].get("centerZ", 0)
-            c.ellipticity = cyclones[x].get("ellipticity", 0)
-            c.pressure_excess = cyclones[x].get("pressure_excess", 0)
-            c.pressure_spread = cyclones[x].get("pressure_spread", 0)
-            c.rotation = cyclones[x].get("rotation", 0)
+            c.centerX = cyclone.get("centerX", 0)
+            c.centerZ = cyclone.get("centerZ", 0)
+            c.ellipticity = cyclone.get("ellipticity", 0)
+            c.pressure_excess = cyclone.get("pressure_excess", 0)
+            c.pressure_spread = cyclone.get("pressure_spread", 0)
+            c.rotation = cyclone.get("rotation", 0)
             self.cyclones.append(c)
         self.name = d.get("name", "Summer, clean sky")
         fog = d.get("fog", {})
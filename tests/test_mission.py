@@ -1,7 +1,12 @@
 import os
+import random
+import re
+import shutil
+import tempfile
 import time
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 import zipfile
 import math
 
@@ -68,6 +73,277 @@ class BasicTests(unittest.TestCase):
         self.assertIsInstance(found_g, dcs.unitgroup.PlaneGroup)
         self.assertEqual(found_g.units[0].unit_type, dcs.planes.A_10C)
 
+    def test_registry(self):
+        m = dcs.mission.Mission()
+        usa = m.country("USA")
+        russia = m.country("Russia")
+        pos = m.terrain.airports["Batumi"].position
+        vg = m.vehicle_group(usa, "Tanks", dcs.vehicles.Armor.M_1_Abrams, pos, group_size=2)
+        sg = m.static_group(russia, "Depot", dcs.statics.Fortification.Cafe, pos)
+        self.assertIs(m.find_group_by_id(vg.id), vg)
+        self.assertIs(m.find_group("Depot"), sg)
+        self.assertIs(m.find_unit(vg.units[1].name), vg.units[1])
+        self.assertIs(m.find_unit_by_id(sg.units[0].id), sg.units[0])
+        self.assertIs(usa.find_vehicle_group("Tanks"), vg)
+        self.assertIsNone(usa.find_static_group("Tanks"))
+        self.assertIsNone(usa.find_group("Depot"))
+        self.assertIs(m.coalition["red"].find_group_by_id(sg.id), sg)
+        self.assertIsNone(m.coalition["blue"].find_group_by_id(sg.id))
+
+        # renames, new IDs and units added later are followed
+        vg.name = "Armor"
+        vg.id = 1000
+        self.assertIsNone(m.find_group("Tanks"))
+        self.assertIs(m.find_group("Armor"), vg)
+        self.assertIs(m.find_group_by_id(1000), vg)
+        unit = dcs.unit.Vehicle(m.terrain, m.next_unit_id(), "Late tank", dcs.vehicles.Armor.M_1_Abrams.id)
+        vg.add_unit(unit)
+        self.assertIs(m.find_unit("Late tank"), unit)
+        unit.name = "Tank 3"
+        self.assertIs(m.find_unit("Tank 3"), unit)
+
+        # the first group of the search order is found for duplicate names
+        other = m.vehicle_group(russia, "Armor", dcs.vehicles.Armor.M_1_Abrams, pos)
+        self.assertIs(m.find_group("Armor"), vg)
+        self.assertTrue(usa.remove_group(vg))
+        self.assertIs(m.find_group("Armor"), other)
+        self.assertIsNone(m.find_unit("Tank 3"))
+
+        # groups put into the lists directly and replaced coalitions are noticed
+        usa.vehicle_group.append(vg)
+        self.assertIs(m.find_group_by_id(1000), vg)
+        self.assertIs(usa.find_group_by_id(1000), vg)
+        blue = m.coalition["blue"].remove_country("USA")
+        self.assertIsNone(m.find_group_by_id(1000))
+        self.assertIs(blue.find_group_by_id(1000), vg)
+        m.coalition["blue"] = dcs.coalition.Coalition("blue")
+        m.coalition["blue"].add_country(blue)
+        self.assertIs(m.find_group("Armor"), vg)
+
+        # the public lists changed directly, with the same number of groups and units
+        m = dcs.mission.Mission()
+        usa = m.country("USA")
+        g1 = m.vehicle_group(usa, "A", dcs.vehicles.Armor.M_1_Abrams, pos, group_size=2)
+        g2 = m.vehicle_group(usa, "B", dcs.vehicles.Armor.M_1_Abrams, pos)
+        self.assertIs(m.find_group("A"), g1)
+        g3 = dcs.unitgroup.VehicleGroup(m.next_group_id(), "C")
+        usa.vehicle_group.remove(g1)
+        usa.vehicle_group.append(g3)
+        self.assertIsNone(m.find_group("A"))
+        self.assertIsNone(m.find_group_by_id(g1.id))
+        self.assertIs(m.find_group("C"), g3)
+        self.assertEqual(m.find_groups("", "prefix"), [g2, g3])
+        usa.vehicle_group[0] = g1
+        self.assertIsNone(m.find_group("B"))
+        self.assertIs(m.find_group("A"), g1)
+        tank = g1.units.pop()
+        self.assertIsNone(m.find_unit(tank.name))
+        self.assertIsNone(m.find_unit_by_id(tank.id))
+        g3.units.append(tank)
+        self.assertIs(m.find_unit(tank.name), tank)
+        self.assertIs(m.find_group_by_id(g3.id), g3)
+
+        # lookups only rebuild the registry after a direct change, they don't compare the lists
+        with patch.object(dcs.registry.Registry, "rebuild", autospec=True,
+                          side_effect=dcs.registry.Registry.rebuild) as rebuild, \
+                patch.object(dcs.country.Country, "group_lists", autospec=True,
+                             side_effect=dcs.country.Country.group_lists) as group_lists:
+            g4 = m.vehicle_group(usa, "D", dcs.vehicles.Armor.M_1_Abrams, pos, group_size=2)
+            g4.add_unit(dcs.unit.Vehicle(m.terrain, m.next_unit_id(), "D 3", dcs.vehicles.Armor.M_1_Abrams.id))
+            self.assertTrue(usa.remove_group(g3))
+            group_lists.reset_mock()
+            for _ in range(3):
+                self.assertIs(m.find_group("D"), g4)
+                self.assertIs(m.find_unit("D 3"), g4.units[2])
+                self.assertEqual(m.find_groups("C"), [])
+                self.assertEqual(m.find_units("missing"), [])
+            self.assertEqual(group_lists.call_count, 0)
+            self.assertEqual(rebuild.call_count, 0)
+            g4.units[2], g1.units[0] = g1.units[0], g4.units[2]
+            usa.ship_group = [g3]
+            self.assertIs(m.find_group("C"), g3)
+            self.assertIs(m.find_units("D 3")[0], g1.units[0])
+            self.assertEqual(rebuild.call_count, 1)
+            usa.ship_group.pop()
+            self.assertIsNone(m.find_group("C"))
+            self.assertEqual(rebuild.call_count, 2)
+
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/big-formation.miz')
+        groups = [g for c in m.coalition.values() for country in c.countries.values()
+                  for groups in country.group_lists() for g in groups]
+        self.assertTrue(groups)
+        for group in groups:
+            self.assertIs(m.find_group_by_id(group.id), group)
+            self.assertIs(m.find_group(group.name), group)
+            self.assertIs(m.find_unit_by_id(group.units[0].id), group.units[0])
+
+    def test_search(self):
+        m = dcs.mission.Mission()
+        usa = m.country("USA")
+        pos = m.terrain.airports["Batumi"].position
+        groups = [m.vehicle_group(usa, "Armor {}".format(i), dcs.vehicles.Armor.M_1_Abrams, pos) for i in range(12)]
+        sam = m.vehicle_group(usa, "SAM Site", dcs.vehicles.AirDefence.Vulcan, pos)
+        self.assertEqual(m.find_groups("Armor 1"), [groups[1], groups[10], groups[11]])
+        self.assertEqual(m.find_groups("armor 1"), [])
+        self.assertEqual(m.find_groups("Arm", "prefix"), groups)
+        self.assertEqual(m.find_groups("SAM", "prefix"), [sam])
+        self.assertEqual(m.find_groups("Site", "prefix"), [])
+        self.assertEqual(m.find_groups(r"^Armor \d$", "regex"), groups[:10])
+        self.assertEqual(m.find_groups("e", "match"), [sam])
+        self.assertIs(m.find_group("Armor 1", "prefix"), groups[1])
+        self.assertEqual(m.find_units("SAM Site", "prefix"), sam.units)
+        with self.assertRaises(ValueError):
+            m.find_groups("Armor", "fuzzy")
+        sam.name = "Air Defence"
+        self.assertEqual(m.find_groups("SAM"), [])
+        self.assertEqual(m.find_groups("Defence"), [sam])
+
+        self.assertEqual(dcs.search.required_literals(r"^Zone\.(a|b)+ 1"), ["\0Zone.", " 1"])
+        self.assertEqual(dcs.search.required_literals("Zone|Area"), [])
+
+        # characters given by their code are not taken for the digits after the escape
+        index = dcs.search.NameIndex()
+        names = ["Alpha", "alpha", "41lpha", "101lpha", "Café", "Cafe 1", "A\x07b", "xx"]
+        for name in names:
+            index.add(name, name)
+        for query in [r"\x41lpha", r"\101lpha", r"Caf\u00e9", r"Caf\U000000e9", r"Caf\N{LATIN SMALL LETTER E WITH ACUTE}",
+                      r"A\07b", r"A\0b", r"\d+lpha", r"(a)\1", r"Cafe\s\d"]:
+            self.assertEqual(index.search(query, "regex"), [x for x in names if re.search(query, x)], query)
+
+        zones = [m.triggers.add_triggerzone(pos, name="Zone {}".format(i)) for i in range(5)]
+        self.assertEqual(m.triggers.find_zones("Zone", "prefix"), zones)
+        zones[2].name = "Spawn"
+        self.assertEqual(m.triggers.find_zones("Zone [13]", "regex"), [zones[1], zones[3]])
+        self.assertEqual(m.triggers.find_zones("(?i)spawn|zone 3", "regex"), [zones[2], zones[3]])
+        m.triggers.zones().remove(zones[0])
+        self.assertEqual(m.triggers.find_zones("Zone"), [zones[1], zones[3], zones[4]])
+
+        layer = m.drawings.get_layer(dcs.drawing.drawings.StandardLayer.Blue)
+        circle = layer.add_circle(pos, 1000)
+        circle.name = "FLOT circle"
+        self.assertEqual(m.drawings.find_drawings("FLOT"), [circle])
+        line = layer.add_line_segment(pos, pos.point_from_heading(0, 1000))
+        line.name = "FLOT line"
+        self.assertEqual(m.drawings.find_drawings("FLOT", "prefix"), [circle, line])
+        circle.name = "Target"
+        self.assertEqual(m.drawings.find_drawings("FLOT"), [line])
+        layer.remove_drawing(line)
+        self.assertEqual(m.drawings.find_drawings("FLOT"), [])
+
+        briefing = m.string("Attack the bridge at dawn")
+        m.string("Return to base")
+        self.assertEqual([x.id for x in m.translation.find_strings("bridge")], [briefing.id])
+        briefing.set("Attack the depot")
+        self.assertEqual(m.translation.find_strings("bridge"), [])
+        self.assertEqual([x.id for x in m.translation.find_strings("Attack", "prefix")], [briefing.id])
+
+    def test_id_allocation(self):
+        ids = dcs.ids.IdAllocator()
+        self.assertFalse(ids.use(5))
+        self.assertTrue(ids.use(5))
+        self.assertEqual(ids.next(), 6)
+        self.assertFalse(ids.use(8))
+        self.assertEqual(ids.reserve(3), range(9, 12))
+        self.assertEqual(ids.next(), 12)
+        self.assertEqual(len(ids), 7)
+        pool = dcs.ids.IdAllocator(lowest=True)
+        pool.use(1)
+        pool.use(3)
+        self.assertEqual(pool.next(), 2)
+        self.assertEqual(pool.reserve(2), range(4, 6))
+        self.assertTrue(pool.release(2))
+        self.assertFalse(pool.release(2))
+        self.assertTrue(pool.release(4))
+        self.assertEqual(pool.next(), 2)
+        self.assertEqual(pool.reserve(2), range(6, 8))
+        self.assertEqual(pool.next(), 4)
+
+        m = dcs.mission.Mission()
+        usa = m.country("USA")
+        pos = m.terrain.airports["Batumi"].position
+        groups = [m.vehicle_group(usa, "Armor {}".format(i), dcs.vehicles.Armor.M_1_Abrams, pos) for i in range(3)]
+        self.assertEqual([g.points[0].find_task(dcs.task.EPLRS).eplrs for g in groups], [1, 2, 3])
+        usa.remove_group(groups[1])
+        self.assertEqual(m.next_eplrs("vehicle"), 2)
+        self.assertEqual(m.next_eplrs("vehicle"), 4)
+        self.assertEqual(m.next_eplrs("plane"), 1)
+
+        groups[2].id = groups[0].id
+        groups[2].units[0].id = groups[0].units[0].id
+        zone = m.triggers.add_triggerzone(pos, name="Zone")
+        m.triggers.add_triggerzone(pos, name="Copy").id = zone.id
+        os.makedirs('missions', exist_ok=True)
+        m.save('missions/duplicate-ids.miz')
+        m = dcs.mission.Mission()
+        status = m.load_file('missions/duplicate-ids.miz')
+        duplicates = [x for x in status if x.type == dcs.status_message.MessageType.ID_DUPLICATE]
+        self.assertEqual(len(duplicates), 3)
+        self.assertEqual(m.next_group_id(), groups[0].id + 1)
+        self.assertNotIn(m.next_unit_id(), [u.id for c in m.coalition.values() for country in c.countries.values()
+                                             for g in country.vehicle_group for u in g.units])
+        self.assertEqual(m.triggers.add_triggerzone(pos).id, zone.id + 1)
+
+        # EPLRS tasks added to groups that were looked at already
+        m = dcs.mission.Mission()
+        usa = m.country("USA")
+        m.vehicle_group(usa, "Armor", dcs.vehicles.Armor.M_1_Abrams, pos)
+        plain = m.vehicle_group(usa, "Trucks", dcs.vehicles.Unarmed.M_818, pos)
+        empty = m.vehicle_group(usa, "No route", dcs.vehicles.Unarmed.M_818, pos)
+        empty.points.clear()
+        self.assertIsNone(plain.points[0].find_task(dcs.task.EPLRS))
+        self.assertEqual(m.next_eplrs("vehicle"), 2)
+        plain.points[0].tasks.append(dcs.task.EPLRS(3))
+        empty.add_waypoint(pos).tasks.append(dcs.task.EPLRS(4))
+        self.assertEqual(m.next_eplrs("vehicle"), 5)
+
+        # numbers of removed groups and tasks are given back, handed out ones are kept
+        m = dcs.mission.Mission()
+        usa = m.country("USA")
+        groups = [m.vehicle_group(usa, "Armor {}".format(i), dcs.vehicles.Armor.M_1_Abrams, pos) for i in range(3)]
+        pending = m.next_eplrs("vehicle")
+        self.assertEqual(pending, 4)
+        usa.remove_group(groups[1])
+        again = m.vehicle_group(usa, "Again", dcs.vehicles.Armor.M_1_Abrams, pos)
+        self.assertEqual(again.points[0].find_task(dcs.task.EPLRS).eplrs, 2)
+        tasks = groups[0].points[0].tasks
+        tasks.remove(groups[0].points[0].find_task(dcs.task.EPLRS))
+        self.assertEqual(m.next_eplrs("vehicle"), 1)
+        usa.vehicle_group.remove(groups[2])
+        self.assertEqual(m.next_eplrs("vehicle"), 3)
+        m.eplrs_ids("vehicle").release(pending)
+        self.assertEqual(m.next_eplrs("vehicle"), 4)
+
+    def test_bulk_groups(self):
+        def generate(bulk):
+            m = dcs.mission.Mission()
+            usa = m.country("USA")
+            center = m.terrain.airports["Batumi"].position
+            names = ["Group {}".format(i) for i in range(20)]
+            positions = [center.point_from_heading(i * 18, 500) for i in range(20)]
+            types = [dcs.vehicles.Armor.M_1_Abrams, dcs.vehicles.Unarmed.M_818] * 10
+            if bulk:
+                groups = m.add_vehicle_groups(usa, names, types, positions, 45, group_size=3,
+                                              formation=dcs.unitgroup.VehicleGroup.Formation.Rectangle)
+                groups += m.add_static_groups(usa, ["Static " + x for x in names], dcs.statics.Fortification.Cafe,
+                                              positions, list(range(20)), hidden=True)
+            else:
+                groups = [m.vehicle_group(usa, name, t, pos, 45, group_size=3,
+                                          formation=dcs.unitgroup.VehicleGroup.Formation.Rectangle)
+                          for name, t, pos in zip(names, types, positions)]
+                groups += [m.static_group(usa, "Static " + name, dcs.statics.Fortification.Cafe, pos, i, hidden=True)
+                           for i, (name, pos) in enumerate(zip(names, positions))]
+            return m, groups
+
+        m, groups = generate(True)
+        self.assertEqual(m.dict(), generate(False)[0].dict())
+        self.assertEqual(len(groups), 40)
+        self.assertIs(m.find_group("Group 7"), groups[7])
+        self.assertEqual(m.next_unit_id(), 20 * 3 + 20 + 1)
+        with self.assertRaises(ValueError):
+            m.add_static_groups(m.country("USA"), ["A", "B"], dcs.statics.Fortification.Cafe,
+                                [m.terrain.airports["Batumi"].position])
+
     def test_basic_mission(self) -> None:
         m = dcs.mission.Mission()
         assert isinstance(m.terrain, Caucasus)
@@ -462,6 +738,329 @@ class BasicTests(unittest.TestCase):
 
         self._assert_prepared_mission_load(m)
 
+    def test_load_with_parse_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = dcs.lua.ParseCache(tmpdir)
+            for _ in range(2):
+                m = dcs.mission.Mission()
+                m.load_file('tests/loadtest.miz', parse_cache=cache)
+                self._assert_prepared_mission_load(m)
+            self.assertEqual(cache.misses, cache.hits)
+            self.assertGreater(cache.hits, 0)
+
+    def test_load_parallel(self):
+        m = dcs.mission.Mission()
+        m.PARALLEL_PARSE_SIZE = 1 << 16
+        m.load_file('tests/missions/TTI_GC_SC_1.68a.miz', workers=2)
+
+        m2 = dcs.mission.Mission()
+        m2.load_file('tests/missions/TTI_GC_SC_1.68a.miz', workers=1)
+        self.assertEqual(str(m), str(m2))
+
+    def test_load_compact(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/loadtest.miz', compact=True)
+        self._assert_prepared_mission_load(m)
+
+        m2 = dcs.mission.Mission()
+        m2.load_file('tests/loadtest.miz')
+        self.assertEqual(str(m), str(m2))
+
+    def test_load_compact_zone_conditions(self):
+        m = dcs.mission.Mission()
+        zone = m.triggers.add_triggerzone(m.terrain.airports["Batumi"].position, name="Target")
+        rule = dcs.triggers.TriggerOnce(comment="hits")
+        rule.add_condition(dcs.condition.BombInZone({1: 4, 2: 5}, 2, zone.id))
+        rule.add_condition(dcs.condition.MissileInZone({1: 4, 2: 7, 3: 8}, 1, zone.id))
+        rule.add_action(dcs.action.MessageToAll(m.string("hit")))
+        m.triggerrules.triggers.append(rule)
+        os.makedirs('missions', exist_ok=True)
+        m.save('missions/zone_conditions.miz')
+
+        m2 = dcs.mission.Mission()
+        m2.load_file('missions/zone_conditions.miz', compact=True)
+        conditions = m2.triggerrules.triggers[0].rules
+        self.assertEqual(conditions[0].params[0], "4.5")
+        self.assertEqual(conditions[1].params[0], "4.7.8")
+        m3 = dcs.mission.Mission()
+        m3.load_file('missions/zone_conditions.miz')
+        self.assertEqual(dcs.lua.dumps(m2.dict(), "mission", 1), dcs.lua.dumps(m3.dict(), "mission", 1))
+
+    def test_save_compact(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/loadtest.miz')
+        m.save('missions/loadtest_pretty.miz')
+        m.save('missions/loadtest_compact.miz', compact=True)
+        self.assertLess(os.path.getsize('missions/loadtest_compact.miz'), os.path.getsize('missions/loadtest_pretty.miz'))
+
+        m2 = dcs.mission.Mission()
+        m2.load_file('missions/loadtest_compact.miz')
+        self._assert_prepared_mission_load(m2)
+        self.assertEqual(str(m), str(m2))
+        self.assertEqual(str(m.options), str(m2.options))
+        self.assertEqual(str(m.warehouses), str(m2.warehouses))
+
+    def test_save_stored(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/loadtest.miz')
+        m.save('missions/loadtest_stored.miz', compression=zipfile.ZIP_STORED)
+
+        with zipfile.ZipFile('missions/loadtest_stored.miz') as miz:
+            self.assertEqual({x.compress_type for x in miz.infolist()}, {zipfile.ZIP_STORED})
+            self.assertEqual(miz.read('mission').decode(), str(m))
+            self.assertEqual(miz.read('options').decode(), str(m.options))
+            self.assertEqual(miz.read('warehouses').decode(), str(m.warehouses))
+
+    def test_save_workers(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/a_out_picture.miz')
+        m.save('missions/a_out_picture_serial.miz')
+        m.save('missions/a_out_picture_workers.miz', workers=4)
+
+        with zipfile.ZipFile('missions/a_out_picture_serial.miz') as serial, \
+                zipfile.ZipFile('missions/a_out_picture_workers.miz') as parallel:
+            self.assertIsNone(parallel.testzip())
+            self.assertEqual(serial.namelist(), parallel.namelist())
+            for name in serial.namelist():
+                self.assertEqual(serial.read(name), parallel.read(name))
+
+    def test_resources_not_extracted(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/LUNA.miz')
+        self.assertFalse(os.path.exists(m.tmpdir))
+        m.save('missions/LUNA_raw.miz')
+        m.save('missions/LUNA_raw_workers.miz', workers=2)
+        self.assertFalse(os.path.exists(m.tmpdir))
+
+        with zipfile.ZipFile('tests/missions/LUNA.miz') as source:
+            for saved in ['missions/LUNA_raw.miz', 'missions/LUNA_raw_workers.miz']:
+                with zipfile.ZipFile(saved) as miz:
+                    self.assertIsNone(miz.testzip())
+                    for name in ['l10n/DEFAULT/gudok.wav', 'l10n/DEFAULT/LUNA.jpg', 'l10n/DEFAULT/KC1.jpg']:
+                        self.assertEqual(miz.getinfo(name).compress_size, source.getinfo(name).compress_size)
+                        self.assertEqual(miz.read(name), source.read(name))
+
+            reskey = m.map_resource.get_resource_keys()[0]
+            path = m.map_resource.resource_file(reskey)
+            self.assertEqual(Path(path).read_bytes(),
+                             source.read('l10n/DEFAULT/' + m.map_resource.get_file_path(reskey)))
+
+    def test_resource_paths_extracted_on_access(self):
+        for filename in ['tests/missions/LUNA.miz', 'tests/loadtest.miz']:
+            m = dcs.mission.Mission()
+            m.load_file(filename)
+            files = m.map_resource.files.get('DEFAULT', {})
+            with zipfile.ZipFile(filename) as source:
+                for reskey, path in files.items():
+                    with open(path, 'rb') as f:
+                        self.assertEqual(f.read(), source.read('l10n/DEFAULT/' + os.path.basename(path)))
+                    self.assertEqual(files[reskey], path)
+                for file in m.map_resource.binary_files:
+                    with open(file["path"], 'rb') as f:
+                        self.assertEqual(f.read(), source.read(file["respath"]))
+            self.assertEqual(m.map_resource.archived, {})
+
+    def test_save_over_loaded(self):
+        os.makedirs('missions', exist_ok=True)
+        shutil.copy('tests/missions/LUNA.miz', 'missions/LUNA_over.miz')
+        with zipfile.ZipFile('missions/LUNA_over.miz') as source:
+            resources = {name: source.read(name) for name in source.namelist() if name.startswith('l10n/DEFAULT/')}
+
+        m = dcs.mission.Mission()
+        m.load_file('missions/LUNA_over.miz')
+        m.save()
+        m.save(compression=zipfile.ZIP_STORED)
+
+        with zipfile.ZipFile('missions/LUNA_over.miz') as miz:
+            self.assertEqual({x.compress_type for x in miz.infolist()}, {zipfile.ZIP_STORED})
+            for name in ['l10n/DEFAULT/gudok.wav', 'l10n/DEFAULT/LUNA.jpg', 'l10n/DEFAULT/KC1.jpg']:
+                self.assertEqual(miz.read(name), resources[name])
+        m.map_resource.extract_all()
+        for path in m.map_resource.files['DEFAULT'].values():
+            self.assertEqual(Path(path).read_bytes(), resources['l10n/DEFAULT/' + os.path.basename(path)])
+
+    def test_load_sections(self):
+        for filename in ['tests/loadtest.miz', 'tests/missions/Draw_tool_test.miz', 'tests/missions/LUNA.miz']:
+            full = dcs.mission.Mission()
+            full.load_file(filename)
+            m = dcs.mission.Mission()
+            m.load_file(filename, sections=Mission.SECTIONS)
+            self.assertEqual(str(m), str(full))
+            self.assertEqual(m.bypassed_sections, {})
+
+        with self.assertRaises(ValueError):
+            dcs.mission.Mission().load_file('tests/loadtest.miz', sections=["units"])
+
+    def test_load_sections_save(self):
+        full = dcs.mission.Mission()
+        full.load_file('tests/missions/Draw_tool_test.miz')
+
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/Draw_tool_test.miz', sections=["weather"])
+        self.assertEqual(len(m.drawings.layers[0].objects), 0)
+        self.assertIsNone(m.find_group("Aerial-1"))
+        m.weather.wind_at_ground.speed = 7
+        full.weather.wind_at_ground.speed = 7
+        m.save('missions/Draw_tool_test_sections.miz', workers=2)
+        m.save('missions/Draw_tool_test_sections.miz')
+
+        reloaded = dcs.mission.Mission()
+        reloaded.load_file('missions/Draw_tool_test_sections.miz')
+        self.assertEqual(str(reloaded), str(full))
+        with zipfile.ZipFile('tests/missions/Draw_tool_test.miz') as source, \
+                zipfile.ZipFile('missions/Draw_tool_test_sections.miz') as saved:
+            self.assertEqual(saved.read('options'), source.read('options'))
+            self.assertEqual(saved.read('warehouses'), source.read('warehouses'))
+
+    def test_snapshot(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/TTI_GC_SC_1.68a.miz')
+        os.makedirs('missions', exist_ok=True)
+        m.to_snapshot('missions/TTI_GC_SC_1.68a.snapshot')
+
+        r = dcs.mission.Mission.from_snapshot('missions/TTI_GC_SC_1.68a.snapshot')
+        self.assertEqual(str(r), str(m))
+        self.assertEqual(r.translation.dict('DEFAULT'), m.translation.dict('DEFAULT'))
+        self.assertIs(r.map.position._terrain, r.terrain)
+        for name, airport in m.terrain.airports.items():
+            self.assertEqual([x.unit_id for x in r.terrain.airports[name].parking_slots],
+                             [x.unit_id for x in airport.parking_slots])
+        self.assertEqual(r.current_unit_id, m.current_unit_id)
+        self.assertTrue(any(x.unit_id is not None for a in r.terrain.airports.values() for x in a.parking_slots))
+        self.assertEqual(r.terrain.airports["Batumi"].position.latlng().lat,
+                         m.terrain.airports["Batumi"].position.latlng().lat)
+
+        Path('missions/not_a.snapshot').write_bytes(b"mission = {}")
+        with self.assertRaises(ValueError):
+            dcs.mission.Mission.from_snapshot('missions/not_a.snapshot')
+
+    def test_keep_source(self):
+        def groups_of(mission):
+            return [g for c in mission.coalition.values() for country in c.countries.values()
+                    for g in country.vehicle_group + country.plane_group + country.static_group]
+
+        with zipfile.ZipFile('tests/missions/big-formation.miz') as miz:
+            source = miz.read('mission').decode()
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/big-formation.miz', keep_source=True)
+        groups = groups_of(m)
+        self.assertGreater(len(m.source_tables), len(groups))
+
+        groups[0].name = "Edited"
+        m.save('missions/big-formation_source.miz')
+        with zipfile.ZipFile('missions/big-formation_source.miz') as miz:
+            saved = miz.read('mission').decode()
+        # dict() is the plain table, only saving uses the source
+        plain = dcs.mission.Mission()
+        plain.load_file('tests/missions/big-formation.miz')
+        groups_of(plain)[0].name = "Edited"
+        self.assertEqual(m.dict(), plain.dict())
+
+        # all unchanged groups are copied from the source, the edited one is not
+        texts = {g.id: source.encode()[start:end].decode()
+                 for g in groups for _, start, end in [m.source_tables.tables[("group", g.id)]]}
+        self.assertNotIn(texts.pop(groups[0].id), saved)
+        self.assertEqual(len(texts), len(groups) - 1)
+        for text in texts.values():
+            self.assertIn(text, saved)
+
+        # the same as editing a fully loaded mission
+        full = dcs.mission.Mission()
+        full.load_file('tests/missions/big-formation.miz')
+        groups_of(full)[0].name = "Edited"
+        r = dcs.mission.Mission()
+        r.load_file('missions/big-formation_source.miz')
+        self.assertEqual(str(r), str(full))
+
+    def test_fragment_cache(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/big-formation.miz')
+        m.triggerrules.triggers.append(dcs.triggers.TriggerOnce(comment="rule"))
+        group = m.country("Combined Joint Task Forces Blue").plane_group[0]
+
+        def saved(compact):
+            m.save('missions/big-formation_cached.miz', compact=compact)
+            with zipfile.ZipFile('missions/big-formation_cached.miz') as miz:
+                return miz.read('mission')
+
+        expected = [saved(False), saved(True)]
+        m.fragment_cache = dcs.lua.FragmentCache()
+        self.assertEqual([saved(False), saved(False), saved(True)], [expected[0], *expected])
+        self.assertGreater(m.fragment_cache.hits, 0)
+
+        # only the moved group is serialized again
+        saved(False)
+        misses = m.fragment_cache.misses
+        group.units[0].position = group.units[0].position.point_from_heading(90, 100)
+        cached = saved(False)
+        self.assertEqual(m.fragment_cache.misses, misses + 1)
+        m.fragment_cache = None
+        self.assertEqual(cached, saved(False))
+        self.assertNotEqual(cached, expected[0])
+
+    def test_save_dir(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/a_out_picture.miz')
+        directory = Path('missions/a_out_picture')
+        shutil.rmtree(directory, ignore_errors=True)
+        changed = m.save_dir(directory)
+        self.assertIn('l10n/DEFAULT/basic_flight_training_700x1000.jpg', changed)
+        self.assertTrue((directory / 'mission.d' / 'coalition' / 'blue' / 'country' / '1.lua').is_file())
+        self.assertTrue((directory / 'mission.d' / 'drawings.lua').is_file())
+        self.assertEqual(m.save_dir(directory), [])
+
+        # pack() gives the entries save() writes
+        m.save('missions/a_out_picture_saved.miz')
+        dcs.miz.pack(directory, 'missions/a_out_picture_packed.miz')
+        with zipfile.ZipFile('missions/a_out_picture_saved.miz') as saved, \
+                zipfile.ZipFile('missions/a_out_picture_packed.miz') as packed:
+            self.assertEqual(sorted(saved.namelist()), sorted(packed.namelist()))
+            for name in saved.namelist():
+                self.assertEqual(saved.read(name), packed.read(name), name)
+
+        # only the files of changed parts are written
+        country = m.country(dcs.countries.USA.name)
+        m.vehicle_group(country, "new", dcs.vehicles.Armor.M_1_Abrams, list(m.terrain.airports.values())[0].position)
+        changed = m.save_dir(directory)
+        self.assertEqual(len(changed), 1)
+        self.assertTrue(changed[0].startswith('mission.d/coalition/'))
+
+        d = dcs.mission.Mission()
+        d.load_dir(directory)
+        self.assertEqual(str(d.find_group("new").units[0].type), dcs.vehicles.Armor.M_1_Abrams.id)
+        self.assertEqual(len(d.map_resource.get_resource_keys()), len(m.map_resource.get_resource_keys()))
+
+        # files of parts the mission no longer has are removed
+        count = len(m.coalition["blue"].countries)
+        m.coalition["blue"].remove_country(dcs.countries.USA.name)
+        m.save_dir(directory)
+        self.assertFalse((directory / 'mission.d' / 'coalition' / 'blue' / 'country' / '{}.lua'.format(count)).exists())
+        self.assertTrue((directory / 'mission.d' / 'coalition' / 'blue' / 'country' / '{}.lua'.format(count - 1)).exists())
+
+    def test_mapped_zip_file(self):
+        m = dcs.mission.Mission()
+        m.load_file('tests/missions/a_out_picture.miz')
+        m.save('missions/a_out_picture_stored.miz', compression=zipfile.ZIP_STORED)
+        for filename in ['tests/missions/a_out_picture.miz', 'missions/a_out_picture_stored.miz']:
+            with zipfile.ZipFile(filename) as zipf, dcs.miz.MappedZipFile(filename) as mapped:
+                for name in zipf.namelist():
+                    data = zipf.read(name)
+                    self.assertEqual(mapped.read(name), data, name)
+                    with mapped.view(name) as view:
+                        self.assertEqual(view, data, name)
+                    with mapped.open(name) as f:
+                        self.assertEqual(f.read(1000) + f.read(), data, name)
+
+        # the mapping stays valid for views that outlive the zip file
+        with dcs.miz.MappedZipFile('missions/a_out_picture_stored.miz') as mapped:
+            view = mapped.view('mission')
+        self.assertTrue(view.tobytes().startswith(b'mission'))
+        view.release()
+
+        d = dcs.mission.Mission()
+        d.load_file('missions/a_out_picture_stored.miz', parse_cache=dcs.lua.ParseCache('missions/parse_cache'))
+        self.assertEqual(len(d.map_resource.get_resource_keys()), len(m.map_resource.get_resource_keys()))
+
     def test_load_test_missions(self):
         def current_milli_time():
             return int(round(time.time() * 1000))
@@ -494,6 +1093,38 @@ class BasicTests(unittest.TestCase):
         msgs = m.load_file(save_path)
         self.assertEqual(0, len(msgs))
 
+    def test_onboard_number_allocation(self):
+        def numbers(seed):
+            country = dcs.countries.USA()
+            country.rng = random.Random(seed)
+            self.assertFalse(country.reserve_onboard_num("100"))
+            return country, [country.next_onboard_num() for _ in range(989)]
+
+        country, tails = numbers(1)
+        self.assertEqual(tails, numbers(1)[1])
+        self.assertNotEqual(tails, numbers(2)[1])
+        self.assertEqual(sorted(tails + ["100"]), ["{:03}".format(x) for x in range(10, 1000)])
+        self.assertIn(country.next_onboard_num(), tails + ["100"])
+        self.assertTrue(country.reserve_onboard_num("100"))
+        country.release_onboard_num("555")
+        self.assertEqual(country.next_onboard_num(), "555")
+        country.reset_onboard_numbers()
+        self.assertEqual(len(country.unused_onboard_numbers), 990)
+
+        country.rng = random.Random(1)
+        callnames = ["Hawg", "Pig"]
+        callsigns = [country.next_callsign_category("Air", callnames) for _ in range(9 * 10)]
+        self.assertEqual(len(set(callsigns)), len(callsigns))
+        self.assertTrue(all(1 <= nr <= 9 for _, nr in callsigns))
+        self.assertEqual({x for x, _ in callsigns if x in callnames}, set(callnames))
+        country.release_callsign(*callsigns[0])
+        self.assertNotIn(callsigns[0][1], country.callsign_numbers[callsigns[0][0]])
+        # fully booked callsigns start over
+        available = country.callsign["Air"] + callnames
+        for _ in range(9 * len(available)):
+            country.next_callsign_category("Air", callnames)
+        self.assertLess(sum(len(x) for x in country.callsign_numbers.values()), 9 * len(available))
+
     def test_kneeboard(self):
         m = dcs.mission.Mission()
         # Kneeboards need to be images for DCS, but we don't care in the test.
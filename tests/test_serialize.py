@@ -1,5 +1,10 @@
+import io
+import re
 import unittest
-from dcs.lua.serialize import dumps
+import zipfile
+from dcs.lua.serialize import dumps, dump, Deferred, Raw, Writer
+from dcs.lua.source import FragmentCache, fingerprint
+from dcs.task import Targets
 
 class TestLuaSerialize(unittest.TestCase):
 
@@ -23,3 +28,117 @@ class TestLuaSerialize(unittest.TestCase):
         dumped = dumps(original, 'v')
 
         self.assertEqual('v={[1]=1,[10]=3,[3]=2,["x"]=4}', dumped)
+
+    def test_tables_in_lists(self):
+        # earlier versions started a table in a list on the line of its key, now it starts
+        # on the next line like in a dict, so compact loads save the same text as full ones
+        original = {"units": [{"x": 1, "tasks": [{"id": "A"}, [1, 2], []]}, {"x": 2}], "y": {1: [3]}}
+        as_dicts = {"units": {1: {"x": 1, "tasks": {1: {"id": "A"}, 2: {1: 1, 2: 2}, 3: {}}}, 2: {"x": 2}},
+                    "y": {1: {1: 3}}}
+        baseline = ('m=\n{\n\t["units"]=\n\t{\n\t\t[1]=\t\t{\n\t\t\t["tasks"]=\n\t\t\t{\n'
+                    '\t\t\t\t[1]=\t\t\t\t{\n\t\t\t\t\t["id"]="A"\n\t\t\t\t},\n'
+                    '\t\t\t\t[2]=\t\t\t\t{\n\t\t\t\t\t[1]=1,\n\t\t\t\t\t[2]=2\n\t\t\t\t},\n'
+                    '\t\t\t\t[3]=\t\t\t\t{\n\t\t\t\t}\n\t\t\t},\n\t\t\t["x"]=1\n\t\t},\n'
+                    '\t\t[2]=\t\t{\n\t\t\t["x"]=2\n\t\t}\n\t},\n'
+                    '\t["y"]=\n\t{\n\t\t[1]=\n\t\t{\n\t\t\t[1]=3\n\t\t}\n\t}\n}')
+        expected = re.sub(r"\]=(\t+)\{", "]=\n\\1{", baseline)
+        self.assertNotEqual(expected, baseline)
+        self.assertEqual(dumps(original, 'm', 1), expected)
+        self.assertEqual(dumps(as_dicts, 'm', 1), expected)
+        out = io.StringIO()
+        dump(original, out, 'm', 1)
+        self.assertEqual(out.getvalue(), expected)
+        self.assertEqual(dumps({"l": [Raw("{}")]}, 'm', 1), 'm=\n{\n\t["l"]=\n\t{\n\t\t[1]=\n\t\t{}\n\t}\n}')
+        # dicts of dicts are written exactly as before
+        self.assertEqual(dumps({"y": {1: {1: 3}}}, 'm', 1), 'm=\n{\n\t["y"]=\n\t{\n\t\t[1]=\n\t\t{\n\t\t\t[1]=3\n\t\t}\n\t}\n}')
+
+    def test_dump_matches_dumps(self):
+        original = {"a": {1: {"x": 1.5, "y": "\"q\"\n"}, 2: [True, None, {}]}, "b": [], 3: "é"}
+
+        for indent in (None, 0, 1, 2):
+            expected = dumps(original, 'v', indent)
+
+            text = io.StringIO()
+            dump(original, text, 'v', indent)
+            self.assertEqual(expected, text.getvalue())
+
+            data = io.BytesIO()
+            dump(original, data, 'v', indent)
+            self.assertEqual(expected.encode('utf-8'), data.getvalue())
+
+    def test_dump_to_zip(self):
+        original = {i: {"name": "unit {}".format(i), "x": i * 0.5} for i in range(1, 5000)}
+
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, 'w') as zipf:
+            with zipf.open('mission', 'w') as f:
+                dump(original, f, 'mission', 1)
+        with zipfile.ZipFile(data) as zipf:
+            self.assertEqual(dumps(original, 'mission', 1), zipf.read('mission').decode('utf-8'))
+
+    def test_deferred(self):
+        built = []
+
+        def country(i):
+            def build():
+                built.append(i)
+                return {"id": i, "units": [1, 2]}
+            return Deferred(build)
+
+        original = {"country": {1: country(1), 2: country(2)}, "n": Deferred(lambda: 5)}
+        expected = {"country": {1: {"id": 1, "units": [1, 2]}, 2: {"id": 2, "units": [1, 2]}}, "n": 5}
+        self.assertEqual(dumps(original, 'm', 1), dumps(expected, 'm', 1))
+        self.assertEqual(dumps(Deferred(lambda: original)), dumps(expected))
+        self.assertEqual(built, [1, 2, 1, 2])
+
+    def test_emit(self):
+        class Emitter:
+            def __init__(self, n):
+                self.n = n
+                self.emitted = 0
+
+            def __lua_emit__(self, writer: Writer):
+                self.emitted += 1
+                writer.write({"n": self.n, "child": Emitter(self.n + 1) if self.n < 3 else Deferred(lambda: "leaf")})
+
+        expected = {"n": 1, "child": {"n": 2, "child": {"n": 3, "child": "leaf"}}}
+        emitter = Emitter(1)
+        self.assertEqual(dumps({1: emitter}, 'm', 1), dumps({1: expected}, 'm', 1))
+        self.assertEqual(dumps(emitter), dumps(expected))
+        self.assertEqual(emitter.emitted, 2)
+
+        class Silent:
+            def __lua_emit__(self, writer):
+                pass
+
+        with self.assertRaises(ValueError):
+            dumps({"a": Silent()})
+
+    def test_raw(self):
+        original = {"a": {1: {"x": 1}}, "b": 2}
+        source = dumps(original, 'm', 1)
+        raw = {"a": {1: Raw('{\n\t\t\t["x"]=1\n\t\t}')}, "b": Raw("2")}
+        self.assertEqual(dumps(raw, 'm', 1), source)
+        self.assertEqual(dumps({"a": Raw("{1,2}")}), '{["a"]={1,2}}')
+        self.assertEqual(dumps(Raw("{}"), 'm'), 'm={}')
+
+    def test_fragment_cache(self):
+        cache = FragmentCache()
+        table = {"a": {1: {"x": 1}}, "b": Targets.All.Air}
+        source = dumps({"t": table}, 'm', 1)
+        self.assertEqual(dumps({"t": cache.get(table, 2)}, 'm', 1), source)
+        self.assertEqual(dumps({"t": cache.get(dict(table), 2)}, 'm', 1), source)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(dumps({"t": cache.get(table)}), dumps({"t": table}))
+        self.assertEqual(len(cache), 2)
+
+        # entries that were not used since the last sweep are dropped
+        self.assertEqual(cache.sweep(), 0)
+        cache.get(table, 2)
+        self.assertEqual(cache.sweep(), 1)
+        self.assertEqual(len(cache), 1)
+
+        # values written by their string have a fingerprint as well
+        self.assertIsNotNone(fingerprint(table))
+        self.assertNotEqual(fingerprint(table), fingerprint(dict(table, b=Targets.All.Air.Planes)))
+        self.assertIsNone(fingerprint({"a": Deferred(dict)}))
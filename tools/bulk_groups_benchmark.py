@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""
+Benchmarks adding many groups one call at a time against the bulk methods.
+
+Each case adds the same groups to a new mission, once with a call per group
+and once with a single Mission.add_vehicle_groups/add_static_groups call, e.g.
+
+    python tools/bulk_groups_benchmark.py --groups 5000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs  # noqa: E402
+
+
+def columns(m: dcs.Mission, groups: int):
+    center = m.terrain.airports["Kutaisi"].position
+    names = ["group {}".format(i) for i in range(groups)]
+    positions = [center.point_from_heading(i % 360, 100 + i * 10) for i in range(groups)]
+    headings = [(i * 7) % 360 for i in range(groups)]
+    return names, positions, headings
+
+
+def per_call_vehicles(m, country, names, positions, headings, size):
+    for i in range(len(names)):
+        m.vehicle_group(country, names[i], dcs.vehicles.Armor.M_1_Abrams, positions[i], headings[i], group_size=size)
+
+
+def bulk_vehicles(m, country, names, positions, headings, size):
+    m.add_vehicle_groups(country, names, dcs.vehicles.Armor.M_1_Abrams, positions, headings, group_size=size)
+
+
+def per_call_statics(m, country, names, positions, headings, size):
+    for i in range(len(names)):
+        m.static_group(country, names[i], dcs.statics.Fortification.Cafe, positions[i], headings[i])
+
+
+def bulk_statics(m, country, names, positions, headings, size):
+    m.add_static_groups(country, names, dcs.statics.Fortification.Cafe, positions, headings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=5000)
+
+    args = parser.parse_args()
+    cases = [
+        ("vehicles, 1 per group", per_call_vehicles, bulk_vehicles, 1),
+        ("vehicles, 4 per group", per_call_vehicles, bulk_vehicles, 4),
+        ("statics", per_call_statics, bulk_statics, 1),
+    ]
+    for label, per_call, bulk, size in cases:
+        for name, add in (("per call", per_call), ("bulk", bulk)):
+            m = dcs.Mission(dcs.terrain.Caucasus())
+            country = m.country(dcs.countries.USA.name)
+            names, positions, headings = columns(m, args.groups)
+            # the missions of earlier cases are not collected while this one is timed
+            gc.collect()
+            start = time.perf_counter()
+            add(m, country, names, positions, headings, size)
+            elapsed = time.perf_counter() - start
+            print("{:<36s} {:>9.3f}s {:>10.0f} groups/s".format("{}, {}".format(label, name), elapsed,
+                                                               args.groups / elapsed))
+
+
+if __name__ == "__main__":
+    main()
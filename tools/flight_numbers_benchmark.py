@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""
+Benchmarks tail number and callsign allocation for generated flights.
+
+Flights of four are added in the air, then all tail numbers are assigned again
+with Mission.reassign_onboard_numbers, e.g.
+
+    python tools/flight_numbers_benchmark.py --flights 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flights", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=20000)
+
+    args = parser.parse_args()
+    m = dcs.Mission(dcs.terrain.Caucasus())
+    countries = [m.country(x.name) for x in [dcs.countries.USA, dcs.countries.Germany, dcs.countries.Russia]]
+    position = m.terrain.airports["Kutaisi"].position
+
+    start = time.perf_counter()
+    for i in range(args.flights):
+        country = countries[i % len(countries)]
+        aircraft = dcs.planes.Su_27 if country.name == dcs.countries.Russia.name else dcs.planes.F_15C
+        m.flight_group_inflight(country, "flight {}".format(i), aircraft, position, 6000, group_size=4)
+    elapsed = time.perf_counter() - start
+    print("{:<32s} {:>9.3f}s {:>9.1f}us/flight".format("add flights", elapsed, elapsed / args.flights * 1e6))
+
+    start = time.perf_counter()
+    m.reassign_onboard_numbers()
+    elapsed = time.perf_counter() - start
+    print("{:<32s} {:>9.3f}s {:>9.1f}us/flight".format("reassign_onboard_numbers", elapsed,
+                                                      elapsed / args.flights * 1e6))
+
+    country = dcs.countries.USA()
+    calls = [
+        ("next_onboard_num", lambda: country.next_onboard_num()),
+        ("next_callsign_category", lambda: country.next_callsign_category("Air", ["Hawg", "Pig"])),
+    ]
+    for label, call in calls:
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            call()
+        elapsed = time.perf_counter() - start
+        print("{:<32s} {:>9.3f}s {:>9.1f}us/call".format(label, elapsed, elapsed / args.calls * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+"""
+Benchmarks group lookups by name and ID on a generated mission.
+
+Vehicle groups are spread over a couple of countries, then looked up in random
+order through the mission and their country, e.g.
+
+    python tools/group_lookup_benchmark.py --groups 10000 --lookups 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs  # noqa: E402
+
+
+def generate(groups: int) -> dcs.Mission:
+    m = dcs.Mission(dcs.terrain.Caucasus())
+    countries = [m.country(x.name) for x in [dcs.countries.USA, dcs.countries.Germany, dcs.countries.Russia,
+                                             dcs.countries.Ukraine]]
+    center = m.terrain.airports["Kutaisi"].position
+    for i in range(groups):
+        m.vehicle_group(countries[i % len(countries)], "vehicle {}".format(i), dcs.vehicles.Armor.M_1_Abrams,
+                        center.random_point_within(200000), group_size=2)
+    return m
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=5000)
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    m = generate(args.groups)
+    print("{:<32s} {:>9.3f}s".format("generate {} groups".format(args.groups), time.perf_counter() - start))
+
+    rnd = random.Random(1)
+    groups = [g for c in m.coalition.values() for country in c.countries.values() for g in country.vehicle_group]
+    countries = {g: country for c in m.coalition.values() for country in c.countries.values()
+                 for g in country.vehicle_group}
+    picks = [rnd.choice(groups) for _ in range(args.lookups)]
+    lookups = [
+        ("Mission.find_group", lambda g: m.find_group(g.name)),
+        ("Mission.find_group_by_id", lambda g: m.find_group_by_id(g.id)),
+        ("Country.find_vehicle_group", lambda g: countries[g].find_vehicle_group(g.name)),
+        ("Mission.find_group, missing", lambda g: m.find_group(g.name + " missing")),
+    ]
+    for label, lookup in lookups:
+        start = time.perf_counter()
+        for group in picks:
+            lookup(group)
+        elapsed = time.perf_counter() - start
+        print("{:<32s} {:>9.3f}s {:>9.1f}us/lookup".format(label, elapsed, elapsed / len(picks) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
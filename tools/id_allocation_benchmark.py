@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+"""
+Benchmarks generating vehicle groups that need IDs and EPLRS numbers.
+
+Groups of an EPLRS vehicle type are added in batches, the time per group of
+each batch shows if it grows with the size of the mission, e.g.
+
+    python tools/id_allocation_benchmark.py --groups 5000 --batches 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=5000)
+    parser.add_argument("--batches", type=int, default=5)
+
+    args = parser.parse_args()
+    m = dcs.Mission(dcs.terrain.Caucasus())
+    usa = m.country(dcs.countries.USA.name)
+    position = m.terrain.airports["Kutaisi"].position
+    batch = args.groups // args.batches
+    total = 0.0
+    for i in range(args.batches):
+        start = time.perf_counter()
+        for j in range(batch):
+            m.vehicle_group(usa, "vehicle {}-{}".format(i, j), dcs.vehicles.Armor.M_1_Abrams, position)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print("{:<32s} {:>9.3f}s {:>9.1f}us/group".format(
+            "groups {}-{}".format(i * batch, (i + 1) * batch), elapsed, elapsed / batch * 1e6))
+    print("{:<32s} {:>9.3f}s".format("total", total))
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        m.next_eplrs("vehicle")
+    elapsed = time.perf_counter() - start
+    print("{:<32s} {:>9.3f}s {:>9.1f}us/call".format("next_eplrs", elapsed, elapsed / 1000 * 1e6))
+
+
+if __name__ == "__main__":
+    main()
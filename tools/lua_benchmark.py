@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+Benchmarks the lua table parser on the lua entries of .miz files.
+
+By default all missions in tests/missions are used. Pass --baseline with a git
+revision to time the parser of that revision side by side, e.g.
+
+    python tools/lua_benchmark.py --baseline HEAD~1
+"""
+import argparse
+import glob
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs.lua  # noqa: E402
+
+LUA_ENTRIES = ['mission', 'options', 'warehouses', 'l10n/DEFAULT/dictionary', 'l10n/DEFAULT/mapResource']
+
+
+def load_baseline(revision: str):
+    source = subprocess.check_output(['git', 'show', revision + ':dcs/lua/parse.py'])
+    tmp = tempfile.NamedTemporaryFile('wb', suffix='.py', delete=False)
+    with tmp:
+        tmp.write(source)
+    spec = importlib.util.spec_from_file_location('baseline_parse', tmp.name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    os.unlink(tmp.name)
+    return module.loads
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("missions", nargs="*")
+    parser.add_argument("--baseline", help="git revision to compare against")
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    missions = args.missions or sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'tests', 'missions', '*.miz')))
+    baseline = load_baseline(args.baseline) if args.baseline else None
+
+    total, total_baseline, total_size = 0.0, 0.0, 0
+    print("{:<45s} {:>10s} {:>10s} {:>10s}".format("mission", "size", "current", "baseline"))
+    for path in missions:
+        with zipfile.ZipFile(path) as miz:
+            texts = [miz.read(x).decode() for x in LUA_ENTRIES if x in miz.namelist()]
+        size = sum(len(x) for x in texts)
+        current = sum(best_of(args.repeat, dcs.lua.loads, x) for x in texts)
+        line = "{:<45s} {:>10d} {:>9.4f}s".format(os.path.basename(path)[:45], size, current)
+        if baseline:
+            before = sum(best_of(args.repeat, baseline, x) for x in texts)
+            total_baseline += before
+            line += " {:>9.4f}s".format(before)
+        print(line)
+        total += current
+        total_size += size
+
+    line = "{:<45s} {:>10d} {:>9.4f}s".format("total", total_size, total)
+    if baseline:
+        line += " {:>9.4f}s  ({:.1f}x)".format(total_baseline, total_baseline / total)
+    print(line)
+
+
+if __name__ == "__main__":
+    main()
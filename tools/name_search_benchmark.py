@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""
+Benchmarks name searches over groups, units and trigger zones of a generated mission.
+
+Each search is run through the indexes and as a linear scan over all names,
+the way the find methods did it before, e.g.
+
+    python tools/name_search_benchmark.py --groups 5000 --zones 5000 --queries 500
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs  # noqa: E402
+
+
+def generate(groups: int, zones: int) -> dcs.Mission:
+    m = dcs.Mission(dcs.terrain.Caucasus())
+    countries = [m.country(x.name) for x in [dcs.countries.USA, dcs.countries.Germany, dcs.countries.Russia,
+                                             dcs.countries.Ukraine]]
+    center = m.terrain.airports["Kutaisi"].position
+    kinds = ["Armor", "SAM", "Supply", "Artillery", "Recon"]
+    for i in range(groups):
+        m.vehicle_group(countries[i % len(countries)], "{} {}".format(kinds[i % len(kinds)], i),
+                        dcs.vehicles.Armor.M_1_Abrams, center.random_point_within(200000), group_size=2)
+    for i in range(zones):
+        m.triggers.add_triggerzone(center.random_point_within(200000), name="{} zone {}".format(kinds[i % 5], i))
+    return m
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=5000)
+    parser.add_argument("--zones", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    m = generate(args.groups, args.zones)
+    print("{:<36s} {:>9.3f}s".format("generate", time.perf_counter() - start))
+
+    rnd = random.Random(1)
+    numbers = [str(rnd.randrange(args.groups)) for _ in range(args.queries)]
+    groups = [g for c in m.coalition.values() for country in c.countries.values()
+              for gl in country.group_lists() for g in gl]
+    units = [u for g in groups for u in g.units]
+    zones = m.triggers.zones()
+
+    def scan(objects, pred):
+        return [x for x in objects if pred(x.name)]
+
+    searches = [
+        ("groups, match", lambda q: m.find_groups(q + "1"),
+         lambda q: scan(groups, lambda n: q + "1" in n)),
+        ("groups, prefix", lambda q: m.find_groups("SAM " + q, "prefix"),
+         lambda q: scan(groups, lambda n: n.startswith("SAM " + q))),
+        ("units, match", lambda q: m.find_units(q + "-1"),
+         lambda q: scan(units, lambda n: q + "-1" in n)),
+        ("zones, regex", lambda q: m.triggers.find_zones(r"^Recon zone {}\d?$".format(q), "regex"),
+         lambda q: scan(zones, re.compile(r"^Recon zone {}\d?$".format(q)).search)),
+    ]
+    for label, indexed, linear in searches:
+        # the first search builds the trigram index
+        start = time.perf_counter()
+        indexed(numbers[0])
+        first = time.perf_counter() - start
+        for name, search in (("index", indexed), ("scan", linear)):
+            start = time.perf_counter()
+            for q in numbers:
+                search(q)
+            elapsed = time.perf_counter() - start
+            print("{:<36s} {:>9.3f}s {:>9.1f}us/query".format("{}, {}".format(label, name), elapsed,
+                                                              elapsed / len(numbers) * 1e6))
+        print("{:<36s} {:>9.3f}s".format("{}, building the index".format(label), first))
+
+
+if __name__ == "__main__":
+    main()
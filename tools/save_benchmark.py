@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""
+Benchmarks Mission.save on a mission with many resource files and kneeboard pages.
+
+The mission is loaded and gets generated lua scripts and kneeboard images added,
+then it is saved serially and with a thread pool, e.g.
+
+    python tools/save_benchmark.py --scripts 40 --pages 40 --workers 2 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs  # noqa: E402
+
+
+def best_of(repeat, func, *args, **kwargs):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mission", nargs="?",
+                        default=os.path.join(os.path.dirname(__file__), '..', 'tests', 'missions', 'TTI_GC_SC_1.68a.miz'))
+    parser.add_argument("--scripts", type=int, default=40, help="number of 512 KiB lua scripts to add")
+    parser.add_argument("--pages", type=int, default=40, help="number of 256 KiB kneeboard pages to add")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    tmpdir = Path(tempfile.mkdtemp())
+    rnd = random.Random(1)
+
+    m = dcs.Mission()
+    m.load_file(args.mission)
+    for i in range(args.scripts):
+        path = tmpdir / "script{}.lua".format(i)
+        lines = ('local v{} = {}\n'.format(j, rnd.random()) for j in range(20000))
+        path.write_text(''.join(lines)[:512 << 10])
+        m.map_resource.add_resource_file(path)
+    for i in range(args.pages):
+        path = tmpdir / "page{}.png".format(i)
+        path.write_bytes(rnd.getrandbits(8 << 18).to_bytes(256 << 10, "little"))
+        m.add_aircraft_kneeboard(dcs.planes.F_16C_50, path)
+
+    out = str(tmpdir / "out.miz")
+    print("{:<24s} {:>10s} {:>12s}".format("save", "time", "size"))
+    for label, kwargs in [("serial", {})] + [("workers={}".format(w), {"workers": w}) for w in args.workers] + [
+            ("serial, ZIP_STORED", {"compression": zipfile.ZIP_STORED})]:
+        t = best_of(args.repeat, m.save, out, **kwargs)
+        print("{:<24s} {:>9.3f}s {:>12d}".format(label, t, os.path.getsize(out)))
+
+
+if __name__ == "__main__":
+    main()
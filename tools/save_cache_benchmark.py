@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""
+Benchmarks consecutive saves of a generated mission with and without a fragment cache.
+
+A mission with vehicle groups, flights, trigger rules and drawings is generated,
+then saved a number of times, moving one vehicle group between the saves, e.g.
+
+    python tools/save_cache_benchmark.py --groups 2000 --saves 10
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs  # noqa: E402
+from dcs.drawing import LineStyle, Rgba  # noqa: E402
+from dcs.drawing.drawings import StandardLayer  # noqa: E402
+
+
+def generate(groups: int) -> dcs.Mission:
+    rnd = random.Random(1)
+    m = dcs.Mission(dcs.terrain.Caucasus())
+    usa = m.country(dcs.countries.USA.name)
+    russia = m.country(dcs.countries.Russia.name)
+    center = m.terrain.airports["Kutaisi"].position
+    layer = m.drawings.get_layer(StandardLayer.Blue)
+    for i in range(groups):
+        country = usa if i % 2 else russia
+        pos = center.random_point_within(200000)
+        if i % 5:
+            group = m.vehicle_group(country, "vehicle {}".format(i), dcs.vehicles.Armor.M_1_Abrams, pos,
+                                    group_size=4)
+            for _ in range(3):
+                group.add_waypoint(pos.random_point_within(20000))
+        else:
+            group = m.flight_group_inflight(country, "flight {}".format(i), dcs.planes.F_16C_50, pos, 6000,
+                                            group_size=2)
+            for _ in range(4):
+                group.add_waypoint(pos.random_point_within(80000), 6000)
+        if i % 10 == 0:
+            rule = dcs.triggers.TriggerOnce(comment="rule {}".format(i))
+            rule.add_condition(dcs.condition.TimeAfter(rnd.randrange(60, 3600)))
+            rule.add_action(dcs.action.MessageToAll(m.string("message {}".format(i)), 10))
+            m.triggerrules.triggers.append(rule)
+            layer.add_line_segment(pos, pos.random_point_within(5000), color=Rgba(255, 0, 0, 255),
+                                   line_style=LineStyle.Solid)
+    return m
+
+
+def saves(m: dcs.Mission, filename: str, count: int, **kwargs) -> List[float]:
+    groups = [g for c in m.coalition.values() for country in c.countries.values() for g in country.vehicle_group]
+    rnd = random.Random(2)
+    times = []
+    for _ in range(count):
+        group = rnd.choice(groups)
+        for unit in group.units:
+            unit.position = unit.position.point_from_heading(90, 100)
+        start = time.perf_counter()
+        m.save(filename, **kwargs)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--saves", type=int, default=10)
+
+    args = parser.parse_args()
+    filename = os.path.join(tempfile.mkdtemp(), "out.miz")
+    m = generate(args.groups)
+    print("{:<32s} {:>10s} {:>10s} {:>10s}".format("saves", "total", "first", "fastest"))
+    for compression in [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED]:
+        label = "" if compression == zipfile.ZIP_DEFLATED else ", ZIP_STORED"
+        for cache in [None, dcs.lua.FragmentCache()]:
+            m.fragment_cache = cache
+            times = saves(m, filename, args.saves, compression=compression)
+            print("{:<32s} {:>9.3f}s {:>9.3f}s {:>9.3f}s".format(
+                ("fragment cache" if cache is not None else "no cache") + label, sum(times), times[0], min(times)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+"""
+Compares loading missions with Mission.load_file to restoring them from a snapshot.
+
+Each mission is loaded once, written to a snapshot, then both are timed, e.g.
+
+    python tools/snapshot_benchmark.py tests/missions/*.miz
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import dcs  # noqa: E402
+
+
+def best_of(repeat, func, *args, **kwargs):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load(filename):
+    dcs.Mission().load_file(filename)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("missions", nargs="*",
+                        default=sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'tests', '**', '*.miz'),
+                                                 recursive=True)))
+    parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    tmpdir = tempfile.mkdtemp()
+    snapshot = os.path.join(tmpdir, "mission.snapshot")
+    print("{:<48s} {:>10s} {:>10s} {:>8s} {:>10s}".format("mission", "load_file", "snapshot", "speedup", "size"))
+    total_load = total_snapshot = 0.0
+    for filename in args.missions:
+        m = dcs.Mission()
+        m.load_file(filename)
+        m.to_snapshot(snapshot)
+        t_load = best_of(args.repeat, load, filename)
+        t_snapshot = best_of(args.repeat, dcs.Mission.from_snapshot, snapshot)
+        total_load += t_load
+        total_snapshot += t_snapshot
+        print("{:<48s} {:>9.4f}s {:>9.4f}s {:>7.1f}x {:>10d}".format(
+            os.path.basename(filename), t_load, t_snapshot, t_load / t_snapshot, os.path.getsize(snapshot)))
+    print("{:<48s} {:>9.4f}s {:>9.4f}s {:>7.1f}x".format("total", total_load, total_snapshot, total_load / total_snapshot))
+
+
+if __name__ == "__main__":
+    main()